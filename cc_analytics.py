@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 会话用量统计
+逐行流式解析Claude Code会话文件中的token用量，按项目、模型、日期和配置汇总。
+每个文件记录已解析到的字节偏移，之后只解析新追加的行；大量数据时使用进程池解析。
+"""
+
+import bisect
+import json
+import os
+import threading
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+STATE_VERSION = 1
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+GROUP_FIELDS = ("project", "model", "day", "config")
+
+UNKNOWN_CONFIG = "(未记录)"
+
+CHUNK_BYTES = 32 * 1024 * 1024           # 单个解析任务处理的字节数
+POOL_THRESHOLD_BYTES = 16 * 1024 * 1024  # 待解析数据超过该值时才启动进程池
+
+
+def utc_timestamp():
+    """与Claude Code会话文件相同格式的UTC时间戳"""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def record_switch(history_file, config_name):
+    """向切换历史追加一条记录"""
+    try:
+        Path(history_file).parent.mkdir(exist_ok=True)
+        with open(history_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"timestamp": utc_timestamp(), "config": config_name}, ensure_ascii=False) + "\n")
+    except (IOError, OSError) as e:
+        print(f"记录配置切换历史失败: {e}")
+
+
+def load_switch_history(history_file):
+    """读取切换历史，返回按时间排序的(时间戳列表, 配置名称列表)"""
+    records = []
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    records.append((data["timestamp"], data["config"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except (IOError, OSError):
+        pass
+    records.sort()
+    return [timestamp for timestamp, _ in records], [config for _, config in records]
+
+
+def _local_day(timestamp, cache):
+    """把UTC时间戳转换为本地日期（按分钟缓存转换结果）"""
+    minute = timestamp[:16]
+    day = cache.get(minute)
+    if day is None:
+        try:
+            moment = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            day = moment.astimezone().strftime("%Y-%m-%d")
+        except ValueError:
+            day = timestamp[:10]
+        cache[minute] = day
+    return day
+
+
+def parse_usage_range(path, start, end, project, history_times, history_configs):
+    """解析文件[start, end)区间内开始的完整行（在进程池中运行）
+
+    区间开头不完整的行属于上一个区间，跨越区间末尾的行由本区间读完；
+    文件末尾尚未写完的行不解析，留到下次。同一条消息被拆成多行写入时只统计一次。
+
+    Returns:
+        dict: {"usage": {分组键: [输入, 输出, 缓存写入, 缓存读取, 消息数]},
+               "first": 区间第一条消息(消息ID, 分组键, 用量) 或None,
+               "last_id": 最后一条消息ID, "offset": 已解析到的字节偏移}
+    """
+    with open(path, 'rb') as f:
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+        return parse_usage_lines(f, f.tell(), end, project, history_times, history_configs)
+
+
+def parse_usage_lines(f, offset, end, project, history_times, history_configs):
+    """从二进制流f的当前位置（文件偏移offset）逐行解析，直到越过end
+
+    Returns:
+        dict: 同 parse_usage_range
+    """
+    usage = {}
+    first = None
+    last_id = None
+    day_cache = {}
+
+    while offset < end:
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            break
+        offset += len(line)
+        # 没有usage字段的行不做JSON解码
+        if b'"usage"' not in line:
+            continue
+        try:
+            data = json.loads(line)
+        except (ValueError, UnicodeDecodeError):
+            continue
+        message = data.get("message") if isinstance(data, dict) else None
+        if not isinstance(message, dict) or not isinstance(message.get("usage"), dict):
+            continue
+        model = message.get("model") or "unknown"
+        if model == "<synthetic>":
+            continue
+
+        message_id = message.get("id") or data.get("requestId")
+        if message_id and message_id == last_id:
+            continue
+        last_id = message_id
+
+        timestamp = data.get("timestamp") or ""
+        index = bisect.bisect_right(history_times, timestamp) - 1
+        config = history_configs[index] if index >= 0 else UNKNOWN_CONFIG
+        key = "\t".join((data.get("cwd") or project, model, _local_day(timestamp, day_cache), config))
+
+        values = [int(message["usage"].get(field) or 0) for field in USAGE_FIELDS] + [1]
+        if first is None:
+            first = (message_id, key, list(values))
+        totals = usage.get(key)
+        if totals is None:
+            usage[key] = values
+        else:
+            for i, value in enumerate(values):
+                totals[i] += value
+
+    return {"usage": usage, "first": first, "last_id": last_id, "offset": offset}
+
+
+def parse_archived_usage(archive, project_name, session_name, start, end, history_times, history_configs):
+    """解析已归档会话[start, end)区间的用量（zip成员不能随机访问，跳过已解析的部分）"""
+    with archive.open_session(project_name, session_name) as f:
+        remaining = start
+        while remaining > 0:
+            skipped = len(f.read(min(remaining, 1024 * 1024)))
+            if not skipped:
+                break
+            remaining -= skipped
+        return parse_usage_lines(f, start, end, project_name, history_times, history_configs)
+
+
+def _add_usage(target, key, values, sign=1):
+    """把用量累加到target[key]"""
+    totals = target.setdefault(key, [0] * len(values))
+    for i, value in enumerate(values):
+        totals[i] += sign * value
+
+
+class UsageAnalytics:
+    """会话token用量统计
+
+    每个会话文件保存已解析的字节偏移和该文件的分组用量，
+    文件被截断或重写时重新解析，已删除文件的用量保留在统计中。
+    已归档的会话以原路径记录，只有尚未解析完的部分才从归档中解压读取。
+    """
+
+    def __init__(self, projects_dir=None, state_file=None, history_file=None,
+                 max_workers=None, chunk_bytes=CHUNK_BYTES, pool_threshold=POOL_THRESHOLD_BYTES, archive=None):
+        claude_dir = Path.home() / ".claude"
+        self.projects_dir = Path(projects_dir) if projects_dir else claude_dir / "projects"
+        self.state_file = Path(state_file) if state_file else claude_dir / "cc_apiswitch_usage.json"
+        self.history_file = Path(history_file) if history_file else claude_dir / "cc_apiswitch_switch_history.jsonl"
+        self.max_workers = max_workers
+        self.chunk_bytes = max(1024 * 1024, int(chunk_bytes))
+        self.pool_threshold = int(pool_threshold)
+        self.archive = archive  # SessionArchive，为None时不读取归档
+
+        self._loaded = False
+        self._files = {}  # 会话文件路径 -> {"offset", "size", "mtime", "last_id", "usage"}
+        self._lock = threading.Lock()
+        self.last_update_stats = {}
+
+    def _load(self):
+        """加载解析状态（只在首次使用时读取磁盘）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                self._files = data.get("files", {})
+        except (json.JSONDecodeError, IOError, OSError, AttributeError):
+            pass
+
+    def _save(self):
+        """原子写入解析状态"""
+        try:
+            self.state_file.parent.mkdir(exist_ok=True)
+            temp_file = self.state_file.with_suffix(".tmp")
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"version": STATE_VERSION, "files": self._files}, f, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+        except (IOError, OSError):
+            pass
+
+    def _list_session_files(self):
+        """列出所有会话文件，返回[(路径, 项目目录名, stat)]"""
+        session_files = []
+        try:
+            with os.scandir(self.projects_dir) as projects:
+                project_dirs = [entry for entry in projects if entry.is_dir() and not entry.name.startswith('.')]
+        except OSError:
+            return session_files
+
+        for project_dir in project_dirs:
+            try:
+                with os.scandir(project_dir.path) as it:
+                    for entry in it:
+                        if entry.name.endswith(".jsonl") and entry.is_file():
+                            session_files.append((entry.path, project_dir.name, entry.stat()))
+            except OSError:
+                continue
+        return session_files
+
+    @staticmethod
+    def _task_result(func, *args):
+        """获取解析任务结果，文件读取失败（如解析期间被删除）返回None"""
+        try:
+            return func(*args)
+        except (IOError, OSError, zipfile.BadZipFile, KeyError) as e:
+            print(f"解析会话文件失败: {e}")
+            return None
+
+    def update(self, cancel_token=None):
+        """解析所有会话文件新追加的内容（阻塞，应在后台线程调用）
+
+        cancel_token 取消后不再解析剩余区间，已解析的部分照常保存，其余留到下次。
+
+        Returns:
+            dict: {"files": 会话文件数, "parsed_files": 有新内容的文件数, "parsed_bytes": 解析字节数}
+        """
+        def cancelled():
+            return cancel_token is not None and cancel_token.cancelled
+
+        with self._lock:
+            self._load()
+            history_times, history_configs = load_switch_history(self.history_file)
+
+            tasks = []  # (路径, 起始偏移, 结束偏移, 项目)
+            session_files = self._list_session_files()
+            for path, project, stat in session_files:
+                state = self._files.get(path)
+                if state is None or stat.st_size < state["offset"]:
+                    # 新文件或文件被截断重写，从头解析
+                    state = {"offset": 0, "size": 0, "mtime": 0, "last_id": None, "usage": {}}
+                    self._files[path] = state
+                state["size"], state["mtime"] = stat.st_size, stat.st_mtime
+                for start in range(state["offset"], stat.st_size, self.chunk_bytes):
+                    tasks.append((path, start, min(start + self.chunk_bytes, stat.st_size), project))
+
+            parsed_bytes = sum(end - start for _, start, end, _ in tasks)
+            args = [(path, start, end, project, history_times, history_configs)
+                    for path, start, end, project in tasks]
+            if parsed_bytes >= self.pool_threshold and len(tasks) > 1:
+                # 进程池模块导入较慢，只在需要时导入（命令行切换配置时会导入本模块记录切换历史）
+                from concurrent.futures import CancelledError, ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = [executor.submit(parse_usage_range, *task) for task in args]
+                    unregister = (cancel_token.on_cancel(lambda: [future.cancel() for future in futures])
+                                  if cancel_token is not None else lambda: None)
+                    results = []
+                    for future in futures:
+                        try:
+                            results.append(self._task_result(future.result))
+                        except CancelledError:
+                            results.append(None)
+                    unregister()
+            else:
+                results = [None if cancelled() else self._task_result(parse_usage_range, *task) for task in args]
+
+            # 已归档但尚未解析完的会话，在当前进程中解压读取
+            live_paths = {path for path, _, _ in session_files}
+            for project, session_name, entry in (self.archive.iter_archived() if self.archive else ()):
+                if cancelled():
+                    break
+                path = os.path.join(str(self.projects_dir), project, session_name)
+                state = self._files.get(path)
+                if path in live_paths or (state is not None and state["offset"] >= entry["size"]):
+                    continue
+                if state is None:
+                    state = {"offset": 0, "size": 0, "mtime": 0, "last_id": None, "usage": {}}
+                    self._files[path] = state
+                state["size"], state["mtime"] = entry["size"], entry["mtime"]
+                tasks.append((path, state["offset"], entry["size"], project))
+                parsed_bytes += entry["size"] - state["offset"]
+                results.append(self._task_result(parse_archived_usage, self.archive, project, session_name,
+                                                 state["offset"], entry["size"], history_times, history_configs))
+
+            # 按文件内顺序合并各区间的结果，某个区间失败时该文件后续区间留到下次解析
+            failed = set()
+            for (path, _, _, _), result in zip(tasks, results):
+                if path in failed:
+                    continue
+                if result is None:
+                    failed.add(path)
+                    continue
+                state = self._files[path]
+                first = result["first"]
+                if first and first[0] and first[0] == state["last_id"]:
+                    # 同一条消息跨区间重复写入，去掉重复统计
+                    _add_usage(result["usage"], first[1], first[2], -1)
+                    if not any(result["usage"][first[1]]):
+                        del result["usage"][first[1]]
+                for key, values in result["usage"].items():
+                    _add_usage(state["usage"], key, values)
+                state["offset"] = max(state["offset"], result["offset"])
+                if result["last_id"] is not None:
+                    state["last_id"] = result["last_id"]
+
+            if tasks:
+                self._save()
+            self.last_update_stats = {"files": len(session_files), "parsed_files": len({task[0] for task in tasks}),
+                                      "parsed_bytes": parsed_bytes}
+            return dict(self.last_update_stats)
+
+    def summarize(self, group_by=("config",), since_day=None):
+        """按指定维度汇总用量
+
+        Args:
+            group_by (tuple): GROUP_FIELDS中的字段组合
+            since_day (str): 只统计该日期(YYYY-MM-DD)及之后的用量
+
+        Returns:
+            list: [{分组字段..., input_tokens, output_tokens, cache_creation_input_tokens,
+                    cache_read_input_tokens, messages}]，按总token数倒序
+        """
+        positions = [GROUP_FIELDS.index(field) for field in group_by]
+        groups = {}
+        with self._lock:
+            self._load()
+            for state in self._files.values():
+                for key, values in state["usage"].items():
+                    parts = key.split("\t")
+                    if since_day and parts[2] < since_day:
+                        continue
+                    _add_usage(groups, tuple(parts[i] for i in positions), values)
+
+        rows = []
+        for group, values in groups.items():
+            row = dict(zip(group_by, group))
+            row.update(zip(USAGE_FIELDS, values))
+            row["messages"] = values[len(USAGE_FIELDS)]
+            rows.append(row)
+        rows.sort(key=lambda row: sum(row[field] for field in USAGE_FIELDS), reverse=True)
+        return rows
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 会话归档（冷存储）
+把较旧的Claude Code会话文件压缩进每个项目一个的zip归档，并保存元数据副本（sidecar），
+项目扫描和会话读取无需解压即可看到已归档的会话。
+Claude Code本身只读取原会话文件，已归档的会话要先恢复（restore_project）才能用 --resume 继续。
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+
+SIDECAR_VERSION = 1
+
+
+def file_crc32(path, chunk_size=1024 * 1024):
+    """计算文件内容的CRC32（与zip成员的CRC相同算法）"""
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+class SessionArchive:
+    """按项目归档会话文件
+
+    归档目录中每个项目对应 <项目目录名>.zip 和 <项目目录名>.json，
+    json中保存每个已归档会话的索引条目（与ProjectIndex的条目格式相同）。
+    """
+
+    def __init__(self, archive_dir=None, compresslevel=6):
+        self.archive_dir = Path(archive_dir) if archive_dir else Path.home() / ".claude" / "cc_apiswitch_archive"
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._metadata_cache = {}  # 项目目录名 -> (sidecar修改时间, 会话名 -> 条目)
+
+    def archive_path(self, project_name):
+        """项目的zip归档路径"""
+        return self.archive_dir / f"{project_name}.zip"
+
+    def sidecar_path(self, project_name):
+        """项目的元数据副本路径"""
+        return self.archive_dir / f"{project_name}.json"
+
+    def load_metadata(self, project_name):
+        """读取项目已归档会话的元数据，返回{会话文件名: 条目}（按修改时间缓存）"""
+        sidecar = self.sidecar_path(project_name)
+        try:
+            mtime = sidecar.stat().st_mtime_ns
+        except OSError:
+            return {}
+
+        with self._lock:
+            cached = self._metadata_cache.get(project_name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            sessions = data.get("sessions", {}) if data.get("version") == SIDECAR_VERSION else {}
+        except (json.JSONDecodeError, IOError, OSError, AttributeError):
+            sessions = {}
+
+        with self._lock:
+            self._metadata_cache[project_name] = (mtime, sessions)
+        return sessions
+
+    def _save_metadata(self, project_name, sessions):
+        """原子写入项目的元数据副本"""
+        sidecar = self.sidecar_path(project_name)
+        temp_file = sidecar.with_suffix(".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": SIDECAR_VERSION, "sessions": sessions}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, sidecar)
+
+    def _remove_members(self, project_name, names):
+        """从项目的zip归档中移除指定成员（重写归档，没有剩余成员时删除归档）"""
+        archive_path = self.archive_path(project_name)
+        temp_path = archive_path.with_suffix(".tmp")
+        remaining = 0
+        with zipfile.ZipFile(archive_path, 'r') as source, \
+                zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as target:
+            for info in source.infolist():
+                if info.filename in names:
+                    continue
+                member = zipfile.ZipInfo(info.filename, info.date_time)
+                member.compress_type = zipfile.ZIP_DEFLATED
+                member.file_size = info.file_size
+                with source.open(info, 'r') as src, target.open(member, 'w') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                remaining += 1
+        if remaining:
+            with open(temp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(temp_path, archive_path)
+        else:
+            os.remove(temp_path)
+            os.remove(archive_path)
+
+    def iter_archived(self):
+        """遍历所有已归档会话，生成(项目目录名, 会话文件名, 条目)"""
+        try:
+            sidecars = sorted(self.archive_dir.glob("*.json"))
+        except OSError:
+            return
+        for sidecar in sidecars:
+            project_name = sidecar.stem
+            for session_name, entry in self.load_metadata(project_name).items():
+                yield project_name, session_name, entry
+
+    @contextmanager
+    def open_session(self, project_name, session_name):
+        """以二进制流打开已归档的会话（按需解压单个会话）"""
+        with zipfile.ZipFile(self.archive_path(project_name), 'r') as archive:
+            with archive.open(session_name, 'r') as f:
+                yield f
+
+    def restore_project(self, project_dir, session_names=None):
+        """把已归档的会话解压回项目目录并从归档中移除，恢复后Claude Code可以再次看到这些会话
+
+        原文件已存在（归档后又被写入）时以原文件为准，只移除归档中的副本。
+
+        Args:
+            project_dir (str): ~/.claude/projects 下的项目目录
+            session_names (iterable): 要恢复的会话文件名，None表示该项目的全部归档会话
+
+        Returns:
+            int: 恢复的会话数
+        """
+        project_name = os.path.basename(project_dir)
+        sessions = dict(self.load_metadata(project_name))
+        names = [name for name in sessions if session_names is None or name in session_names]
+        archive_path = self.archive_path(project_name)
+        if not names or not archive_path.exists():
+            return 0
+
+        restored = 0
+        os.makedirs(project_dir, exist_ok=True)
+        with zipfile.ZipFile(archive_path, 'r') as archive:
+            members = set(archive.namelist())
+            for name in names:
+                path = os.path.join(project_dir, name)
+                if name not in members or os.path.exists(path):
+                    continue
+                temp_path = path + ".restore"
+                with archive.open(name, 'r') as src, open(temp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                # 保留原修改时间，项目索引和会话排序不受恢复影响
+                mtime = sessions[name].get("mtime")
+                if mtime:
+                    os.utime(temp_path, (mtime, mtime))
+                os.replace(temp_path, path)
+                restored += 1
+
+        # 原文件都已落盘后再更新元数据和归档
+        for name in names:
+            sessions.pop(name, None)
+        if sessions:
+            self._save_metadata(project_name, sessions)
+        else:
+            os.remove(self.sidecar_path(project_name))
+        self._remove_members(project_name, set(names))
+        return restored
+
+    def archive_project(self, project_dir, entries, max_age_seconds, now=None, cancel_token=None):
+        """归档项目目录中超过max_age_seconds未修改的会话
+
+        先写入并校验zip成员（CRC与原文件一致）、保存元数据副本，最后才删除原文件；
+        归档过程中被修改的会话保留原文件，并从zip中移除过期的副本，下次重新归档。
+
+        Args:
+            project_dir (str): ~/.claude/projects 下的项目目录
+            entries (dict): 会话文件路径 -> 项目索引条目
+            max_age_seconds (float): 会话最后修改时间距今超过该值才归档
+            cancel_token (CancelToken): 取消后不再写入新的会话，已写入的会话照常校验
+
+        Returns:
+            dict: {"sessions": 归档会话数, "original_bytes": 原始字节数, "archived_bytes": 压缩后字节数}
+        """
+        now = time.time() if now is None else now
+        stats = {"sessions": 0, "original_bytes": 0, "archived_bytes": 0}
+        candidates = [(path, entry) for path, entry in entries.items()
+                      if now - entry["mtime"] > max_age_seconds and os.path.isfile(path)]
+        if not candidates:
+            return stats
+
+        project_name = os.path.basename(project_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = self.archive_path(project_name)
+        sessions = dict(self.load_metadata(project_name))
+
+        written = []  # (原文件路径, 成员名, 条目, 压缩后大小, 成员CRC)
+        stale = []  # 与原文件不一致的成员名（保留原文件后从zip中移除，下次重新归档）
+        with zipfile.ZipFile(archive_path, 'a', zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as archive:
+            existing = {info.filename: info for info in archive.infolist()}
+            for path, entry in candidates:
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+                session_name = os.path.basename(path)
+                info = existing.get(session_name)
+                if info is not None:
+                    # 上次归档在删除原文件前中断，内容一致（大小和CRC相同）时直接删除原文件
+                    if info.file_size == entry["size"] and file_crc32(path) == info.CRC:
+                        written.append((path, session_name, entry, info.compress_size, info.CRC))
+                    elif session_name not in sessions:
+                        # 之前归档时会话被修改而保留了原文件，zip中是过期的副本
+                        stale.append(session_name)
+                    else:
+                        print(f"归档中已存在内容不同的同名会话，跳过: {path}")
+                    continue
+                archive.write(path, arcname=session_name)
+                info = archive.getinfo(session_name)
+                written.append((path, session_name, entry, info.compress_size, info.CRC))
+
+        with open(archive_path, 'rb+') as f:
+            os.fsync(f.fileno())
+
+        # 读取校验新写入的成员（zipfile在读完时检查CRC）
+        verified = []
+        with zipfile.ZipFile(archive_path, 'r') as archive:
+            for path, session_name, entry, compress_size, crc in written:
+                try:
+                    with archive.open(session_name, 'r') as f:
+                        size = 0
+                        while True:
+                            chunk = f.read(1024 * 1024)
+                            if not chunk:
+                                break
+                            size += len(chunk)
+                except (zipfile.BadZipFile, IOError, OSError) as e:
+                    print(f"归档校验失败，保留原文件: {path}: {e}")
+                    stale.append(session_name)
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if size != entry["size"] or stat.st_size != entry["size"] or stat.st_mtime != entry["mtime"]:
+                    print(f"会话在归档期间被修改，保留原文件: {path}")
+                    stale.append(session_name)
+                    continue
+                verified.append((path, session_name, entry, compress_size, crc))
+
+        if not verified:
+            self._remove_stale(project_name, stale)
+            return stats
+
+        for path, session_name, entry, compress_size, crc in verified:
+            sessions[session_name] = dict(entry, archived=True, compressed_size=compress_size,
+                                          archived_at=now)
+        self._save_metadata(project_name, sessions)
+
+        kept = []
+        for path, session_name, entry, compress_size, crc in verified:
+            # 删除前再确认原文件没有被修改，内容仍与zip成员一致
+            try:
+                stat = os.stat(path)
+                unchanged = (stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]
+                             and file_crc32(path) == crc)
+            except OSError:
+                continue
+            if not unchanged:
+                print(f"会话在归档期间被修改，保留原文件: {path}")
+                kept.append(session_name)
+                stale.append(session_name)
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"删除已归档的会话失败: {path}: {e}")
+                kept.append(session_name)
+                continue
+            stats["sessions"] += 1
+            stats["original_bytes"] += entry["size"]
+            stats["archived_bytes"] += compress_size
+
+        if kept:
+            # 保留原文件的会话不记为已归档
+            for session_name in kept:
+                sessions.pop(session_name, None)
+            self._save_metadata(project_name, sessions)
+        self._remove_stale(project_name, stale)
+        return stats
+
+    def _remove_stale(self, project_name, names):
+        """移除保留了原文件的会话在zip中的过期副本，失败时下次归档再处理"""
+        if not names:
+            return
+        try:
+            self._remove_members(project_name, set(names))
+        except (IOError, OSError, zipfile.BadZipFile) as e:
+            print(f"移除过期的归档副本失败: {e}")
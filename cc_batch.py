@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 并发批量测试引擎
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+
+class BatchTestEngine:
+    """并发批量测试引擎
+
+    使用有界线程池并发测试多个配置，同时限制每个主机的并发数，
+    每个配置测试完成后立即通过回调返回结果。
+    """
+
+    def __init__(self, config_manager, max_workers=8, per_host_limit=2):
+        self.config_manager = config_manager
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+
+    def _get_host_semaphore(self, host):
+        """获取主机对应的并发信号量"""
+        with self._host_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    @staticmethod
+    def get_host(config):
+        """提取配置的主机名，用于按主机限流"""
+        try:
+            return urlparse(config.get("ANTHROPIC_BASE_URL", "")).netloc.lower()
+        except ValueError:
+            return ""
+
+    def _interleave_by_host(self, config_ids):
+        """按主机轮转排列任务，避免工作线程集中阻塞在同一主机上，返回[(id, 主机)]"""
+        groups = OrderedDict()
+        for config_id in config_ids:
+            config = self.config_manager.get_config(config_id)
+            if config is not None:
+                host = self.get_host(config)
+                groups.setdefault(host, []).append((config_id, host))
+
+        ordered = []
+        queues = list(groups.values())
+        while queues:
+            for queue in queues:
+                ordered.append(queue.pop(0))
+            queues = [queue for queue in queues if queue]
+        return ordered
+
+    def _test_one(self, config_id, host, question, stream, cancel_token):
+        """在主机并发限制内测试单个配置"""
+        with self._get_host_semaphore(host):
+            if cancel_token is not None and cancel_token.cancelled:
+                return False, "测试已取消", {}
+            return self.config_manager.test_config(config_id, question, stream=stream, cancel_token=cancel_token)
+
+    def run(self, config_ids, on_result=None, question=None, stream=False, cancel_token=None):
+        """并发测试指定的配置（阻塞直到全部完成，应在后台线程调用）
+
+        Args:
+            config_ids (list): 要测试的配置id
+            on_result (callable): 每个配置完成时回调 on_result(config_id, success, message, data)
+            question (str): 测试问题，None时按测试模式使用默认问题
+            stream (bool): 是否使用流式测试
+            cancel_token (CancelToken): 取消后尚未开始的测试直接返回"测试已取消"，进行中的请求被中止
+
+        Returns:
+            dict: 配置id -> (success, message, data)
+        """
+        ordered = self._interleave_by_host(config_ids)
+        results = {}
+        if not ordered:
+            return results
+
+        workers = min(self.max_workers, len(ordered))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-test") as executor:
+            futures = {
+                executor.submit(self._test_one, config_id, host, question, stream, cancel_token): config_id
+                for config_id, host in ordered
+            }
+            # 取消时丢弃尚未开始的测试，线程池只需等待被中止的进行中请求
+            unregister = (cancel_token.on_cancel(lambda: [future.cancel() for future in futures])
+                          if cancel_token is not None else lambda: None)
+            for future in as_completed(futures):
+                config_id = futures[future]
+                try:
+                    success, message, data = future.result()
+                except CancelledError:
+                    success, message, data = False, "测试已取消", {}
+                except Exception as e:
+                    success, message, data = False, f"测试失败: {str(e)}", {}
+
+                results[config_id] = (success, message, data)
+                if on_result:
+                    on_result(config_id, success, message, data)
+            unregister()
+
+        return results
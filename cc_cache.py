@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 响应缓存
+按规范化请求体+模型做内容寻址的磁盘缓存，仅缓存temperature为0的确定性请求
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from cc_persist import WriteBehindJSONFile
+
+
+# 不参与缓存键计算的请求字段（与生成结果无关）
+IGNORED_REQUEST_FIELDS = ("metadata",)
+
+
+class ResponseCache:
+    """磁盘响应缓存
+
+    每个条目保存状态码、响应头和原始响应字节（SSE响应保留原始事件帧），
+    按最近访问时间进行LRU淘汰，总大小不超过max_bytes，超过ttl秒的条目过期。
+    索引（含命中时更新的访问时间）延迟合并写入。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=200 * 1024 * 1024, ttl=24 * 3600, on_change=None):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".claude" / "cc_apiswitch_cache"
+        self.index_file = self.cache_dir / "index.json"
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl)
+        self.on_change = on_change
+
+        self._lock = threading.Lock()
+        self._index = {}  # 缓存键 -> 条目元数据
+        self._total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._index_writer = WriteBehindJSONFile(self.index_file, self._index_snapshot, delay=1.0)
+        self._load_index()
+
+    def _load_index(self):
+        """加载缓存索引，丢弃缺失数据文件的条目"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (json.JSONDecodeError, IOError, OSError):
+            index = {}
+
+        for key, entry in index.items():
+            if isinstance(entry, dict) and self._data_path(key).exists():
+                self._index[key] = entry
+                self._total_bytes += entry.get("size", 0)
+
+    def _index_snapshot(self):
+        """缓存索引的副本（供延迟写入）"""
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._index.items()}
+
+    def flush(self):
+        """立即写入尚未保存的索引"""
+        return self._index_writer.flush()
+
+    def _data_path(self, key):
+        """缓存条目的数据文件路径"""
+        return self.cache_dir / f"{key}.bin"
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change(self.get_stats())
+
+    @staticmethod
+    def make_key(method, path, body):
+        """计算请求的缓存键，请求不可缓存时返回None
+
+        只缓存 POST /v1/messages 且显式指定 temperature 为0的请求。
+        """
+        if method != "POST" or path.split("?", 1)[0] != "/v1/messages" or not body:
+            return None
+        try:
+            payload = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(payload, dict) or payload.get("temperature") != 0:
+            return None
+
+        normalized = {key: value for key, value in payload.items() if key not in IGNORED_REQUEST_FIELDS}
+        canonical = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        digest = hashlib.sha256()
+        digest.update(str(payload.get("model", "")).encode('utf-8'))
+        digest.update(b"\n")
+        digest.update(canonical.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """读取缓存条目，返回(状态码, 响应头, 响应体)，未命中返回None"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and time.time() - entry["created"] > self.ttl:
+                self._remove(key)
+                self._index_writer.mark_dirty()
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+            else:
+                # 命中也要记录访问时间，淘汰按最近访问而不是写入顺序
+                entry["last_access"] = time.time()
+                self._index_writer.mark_dirty()
+
+        if entry is None:
+            self._notify()
+            return None
+
+        try:
+            data = self._data_path(key).read_bytes()
+        except (IOError, OSError):
+            with self._lock:
+                self._remove(key)
+                self.stats["misses"] += 1
+            self._index_writer.mark_dirty()
+            self._notify()
+            return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+        self._notify()
+        return entry["status"], entry["headers"], data
+
+    def put(self, key, status, headers, data):
+        """写入缓存条目并按LRU淘汰超出容量的条目"""
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        temp_file = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 每次写入使用独立的临时文件，同一个键的并发写入不会互相覆盖
+            fd, temp_file = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        except (IOError, OSError):
+            self._discard_temp(temp_file)
+            return
+
+        now = time.time()
+        with self._lock:
+            # 在锁内替换数据文件，保证数据文件与索引中的大小一致
+            try:
+                os.replace(temp_file, self._data_path(key))
+            except OSError:
+                self._discard_temp(temp_file)
+                return
+            if key in self._index:
+                self._total_bytes -= self._index[key].get("size", 0)
+            self._index[key] = {"status": status, "headers": headers, "size": size,
+                                "created": now, "last_access": now}
+            self._total_bytes += size
+            self.stats["stores"] += 1
+            self._evict(now)
+        self._index_writer.mark_dirty()
+        self._notify()
+
+    @staticmethod
+    def _discard_temp(temp_file):
+        if temp_file is None:
+            return
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+
+    def _remove(self, key):
+        """删除缓存条目（调用方持有锁）"""
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.get("size", 0)
+        try:
+            self._data_path(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self, now):
+        """淘汰过期条目，再按最近访问时间淘汰直到不超过容量（调用方持有锁）"""
+        for key in [key for key, entry in self._index.items() if now - entry["created"] > self.ttl]:
+            self._remove(key)
+            self.stats["evictions"] += 1
+
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self._index, key=lambda key: self._index[key]["last_access"]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+        self._index_writer.mark_dirty()
+        self._notify()
+
+    def get_stats(self):
+        """缓存统计: 命中/未命中/写入/淘汰次数、条目数和总字节数"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._total_bytes
+        return stats
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 命令行
+与图形界面共用配置管理器，不导入wx，可在没有显示器的服务器和脚本中切换配置。
+网络等较重的模块只在需要的子命令中导入。
+
+用法:
+    python cc_cli.py list [--json]
+    python cc_cli.py switch <配置> [--env user|system]
+    python cc_cli.py test <配置> [--stream]
+    python cc_cli.py batch-test [配置 ...] [--stream]
+    python cc_cli.py stats [配置 ...] [--hours 24] [--json]
+    python cc_cli.py export [-o 文件] [--redact]
+
+<配置> 可以是配置名称、配置id或list中显示的序号。
+"""
+
+import argparse
+import json
+import sys
+
+from cc_config import SimpleConfigManager
+
+
+def resolve_config(manager, target):
+    """按名称、id或序号（从1开始）查找配置，返回配置id或None"""
+    config_id = manager.store.find_id(target)
+    if config_id is not None:
+        return config_id
+    if manager.get_config(target) is not None:
+        return target
+    if target.isdigit():
+        ids = manager.store.ids()
+        position = int(target)
+        if 1 <= position <= len(ids):
+            return ids[position - 1]
+    return None
+
+
+def _require_config(manager, target):
+    config_id = resolve_config(manager, target)
+    if config_id is None:
+        print(f"配置不存在: {target}", file=sys.stderr)
+    return config_id
+
+
+def _format_latency(config):
+    total = (config.get("latency") or {}).get("total_ms")
+    return f"{total:.0f}ms" if total is not None else ""
+
+
+def cmd_list(manager, args):
+    """列出所有配置，活跃配置前标记*"""
+    configs = manager.get_all_configs()
+    active_id = manager.get_active_id()
+    if args.json:
+        print(json.dumps([{
+            "position": position,
+            "id": config["id"],
+            "name": config["name"],
+            "active": config["id"] == active_id,
+            "base_url": config.get("ANTHROPIC_BASE_URL", ""),
+            "model": config.get("default_model", ""),
+            "test_status": config.get("test_status", "未测试"),
+            "test_time": config.get("test_time", ""),
+            "total_ms": (config.get("latency") or {}).get("total_ms"),
+        } for position, config in enumerate(configs, 1)], ensure_ascii=False, indent=2))
+        return 0
+
+    if not configs:
+        print("没有配置")
+        return 0
+    for position, config in enumerate(configs, 1):
+        marker = "*" if config["id"] == active_id else " "
+        print(f"{marker} {position:>3}  {config['name']}  {config.get('default_model', '')}  "
+              f"{config.get('test_status', '未测试')} {config.get('test_time', '')} {_format_latency(config)}".rstrip())
+    return 0
+
+
+def cmd_switch(manager, args):
+    """切换Claude配置，可选同时设置环境变量"""
+    config_id = _require_config(manager, args.config)
+    if config_id is None:
+        return 1
+    success, message = manager.switch_config(config_id)
+    print(message)
+    if success and args.env:
+        env_success, env_message = manager.set_environment_variables(config_id, args.env)
+        print(env_message)
+        success = env_success
+    return 0 if success else 1
+
+
+def cmd_test(manager, args):
+    """测试单个配置"""
+    config_id = _require_config(manager, args.config)
+    if config_id is None:
+        return 1
+    success, message, data = manager.test_config(config_id, question=args.question, stream=args.stream)
+    config = manager.get_config(config_id)
+    print(f"{config['name']}: {config.get('test_status')} {_format_latency(config)} {config.get('test_message', '')}")
+    return 0 if success else 1
+
+
+def cmd_batch_test(manager, args):
+    """并发测试多个配置（默认全部）"""
+    from cc_batch import BatchTestEngine
+
+    if args.configs:
+        config_ids = []
+        for target in args.configs:
+            config_id = _require_config(manager, target)
+            if config_id is None:
+                return 1
+            config_ids.append(config_id)
+    else:
+        config_ids = manager.store.ids()
+    if not config_ids:
+        print("没有配置可测试")
+        return 0
+
+    engine = BatchTestEngine(
+        manager,
+        max_workers=args.workers or manager.get_setting("batch_max_workers"),
+        per_host_limit=manager.get_setting("batch_per_host_limit"))
+    total = len(config_ids)
+    completed = []
+
+    def on_result(config_id, success, message, data):
+        completed.append(config_id)
+        config = manager.get_config(config_id) or {"name": config_id}
+        print(f"[{len(completed)}/{total}] {config['name']}: {config.get('test_status', '')} "
+              f"{_format_latency(config)} {message if not success else ''}".rstrip(), flush=True)
+
+    results = engine.run(config_ids, on_result=on_result, stream=args.stream)
+    passed = sum(1 for success, _, _ in results.values() if success)
+    print(f"通过 {passed}/{total}")
+    return 0 if passed == total else 1
+
+
+def cmd_stats(manager, args):
+    """按测试历史统计各配置的可用率、平均/P95耗时和错误分布"""
+    config_ids = []
+    for target in args.configs:
+        config_id = _require_config(manager, target)
+        if config_id is None:
+            return 1
+        config_ids.append(config_id)
+    stats = manager.get_test_stats(hours=args.hours, config_ids=config_ids or None)
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+
+    if not stats:
+        print("没有测试历史")
+        return 0
+    for config_id, result in stats.items():
+        config = manager.get_config(config_id) or {"name": config_id}
+        mean = f"{result['mean_ms']:.0f}ms" if result["mean_ms"] is not None else "-"
+        p95 = f"{result['p95_ms']:.0f}ms" if result["p95_ms"] is not None else "-"
+        print(f"{config['name']}  可用率 {result['uptime']:.1f}% ({result['ok']}/{result['total']})  "
+              f"平均 {mean}  P95 {p95}")
+        for error, count in sorted(result["errors"].items(), key=lambda item: -item[1]):
+            print(f"    {count:>4}  {error}")
+    return 0
+
+
+def cmd_export(manager, args):
+    """导出配置文件内容（JSON）"""
+    data = manager.store.to_json_data()
+    if args.redact:
+        for config in data["configs"]:
+            token = config.get("ANTHROPIC_AUTH_TOKEN", "")
+            config["ANTHROPIC_AUTH_TOKEN"] = f"{token[:6]}..." if token else ""
+        if data["settings"].get("proxy_auth_token"):
+            data["settings"]["proxy_auth_token"] = "..."
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if args.output:
+        from cc_persist import atomic_write_text
+        atomic_write_text(args.output, text + "\n")
+        print(f"已导出 {len(data['configs'])} 个配置到 {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cc_cli", description="CC-APISwitch 命令行")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="列出所有配置")
+    list_parser.add_argument("--json", action="store_true", help="以JSON输出")
+    list_parser.set_defaults(func=cmd_list)
+
+    switch_parser = subparsers.add_parser("switch", help="切换Claude配置")
+    switch_parser.add_argument("config", help="配置名称、id或序号")
+    switch_parser.add_argument("--env", choices=["user", "system"], help="同时设置用户或系统环境变量（Windows）")
+    switch_parser.set_defaults(func=cmd_switch)
+
+    test_parser = subparsers.add_parser("test", help="测试单个配置")
+    test_parser.add_argument("config", help="配置名称、id或序号")
+    test_parser.add_argument("--stream", action="store_true", help="使用流式(SSE)测试")
+    test_parser.add_argument("--question", help="测试问题")
+    test_parser.set_defaults(func=cmd_test)
+
+    batch_parser = subparsers.add_parser("batch-test", help="并发测试多个配置（默认全部）")
+    batch_parser.add_argument("configs", nargs="*", help="配置名称、id或序号")
+    batch_parser.add_argument("--stream", action="store_true", help="使用流式(SSE)测试")
+    batch_parser.add_argument("--workers", type=int, help="并发数（默认使用设置 batch_max_workers）")
+    batch_parser.set_defaults(func=cmd_batch_test)
+
+    stats_parser = subparsers.add_parser("stats", help="统计测试历史（可用率、耗时、错误分布）")
+    stats_parser.add_argument("configs", nargs="*", help="配置名称、id或序号（默认全部）")
+    stats_parser.add_argument("--hours", type=float, default=24, help="统计最近多少小时，0表示全部历史")
+    stats_parser.add_argument("--json", action="store_true", help="以JSON输出")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    export_parser = subparsers.add_parser("export", help="导出配置（JSON）")
+    export_parser.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    export_parser.add_argument("--redact", action="store_true", help="隐藏认证令牌")
+    export_parser.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manager = SimpleConfigManager()
+    try:
+        return args.func(manager, args)
+    finally:
+        manager.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
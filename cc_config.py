@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 配置管理
+不依赖wx的配置管理器，图形界面和命令行共用。
+模块加载时只导入标准库和配置存储，网络、注册表、项目索引等在第一次使用时导入。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from cc_persist import WriteBehindJSONFile
+from cc_store import ConfigStore
+
+
+class SimpleConfigManager:
+    """API配置管理器"""
+
+    # 可在配置文件 settings 中覆盖的默认设置
+    DEFAULT_SETTINGS = {
+        "batch_max_workers": 8,     # 批量测试全局并发数
+        "batch_per_host_limit": 2,  # 批量测试单个主机并发数
+        "http_pool_size": 4,        # 每个基础URL保持的空闲连接数
+        "http_idle_timeout": 60,    # 空闲连接回收时间（秒）
+        "monitor_enabled": False,           # 是否启用后台健康监控
+        "monitor_healthy_interval": 300,    # 健康配置的探测周期（秒）
+        "monitor_failure_interval": 15,     # 失败配置的初始探测周期（秒），按指数退避
+        "monitor_max_workers": 4,           # 后台监控并发探测数
+        "auto_switch_enabled": False,       # 是否自动切换到最快的健康配置
+        "auto_switch_threshold_ms": 5000,   # 当前配置服务耗时超过该值时切换
+        "auto_switch_margin": 0.2,          # 目标配置至少要比当前配置快的比例
+        "auto_switch_confirmations": 2,     # 连续几次评估都更快才切换
+        "auto_switch_set_env": False,       # 自动切换时同时设置用户环境变量
+        "proxy_enabled": False,             # 是否启用本地故障转移代理
+        "proxy_port": 15721,                # 本地代理端口
+        "proxy_auth_token": "",             # 本地代理令牌，首次使用时随机生成
+        "proxy_max_attempts": 3,            # 单个请求最多尝试的配置数
+        "proxy_timeout": 300,               # 代理上游请求超时（秒）
+        "proxy_balance_policy": "active",   # 代理负载均衡策略，见 LoadBalancer.POLICIES
+        "proxy_hedge_enabled": False,       # 是否启用对冲请求
+        "proxy_hedge_percentile": 95,       # 首选上游超过其首字节时间该百分位仍未响应时对冲
+        "proxy_hedge_budget": 0.1,          # 对冲产生的额外请求占总请求数的上限比例
+        "proxy_hedge_min_delay_ms": 500,    # 对冲延迟下限（毫秒）
+        "proxy_hedge_default_delay_ms": 1000,  # 没有首字节时间样本和测试记录时的对冲延迟（毫秒）
+        "cache_enabled": False,             # 代理是否缓存temperature为0的确定性请求
+        "cache_max_mb": 200,                # 响应缓存总大小上限（MB）
+        "cache_ttl_hours": 24,              # 响应缓存过期时间（小时）
+        "project_watch_poll_interval": 5,   # 无inotify时轮询项目目录的周期（秒）
+        "archive_after_days": 30,           # 冷存储超过该天数未修改的会话
+        "journal_retention_days": 30,       # 测试历史保留天数
+        "journal_max_mb": 20,               # 测试历史文件大小上限（MB）
+        "ui_update_hz": 15,                 # 后台结果合并更新界面的最高频率（次/秒）
+        "test_connect_timeout": 5,          # 测试请求建立连接的超时（秒）
+        "test_read_timeout": 15,            # 测试请求等待响应数据的超时（秒）
+        "job_max_workers": 4,               # 同时运行的后台任务数
+    }
+
+    # 流式测试需要足够多的输出Token才能测出解码速度
+    STREAM_TEST_QUESTION = "请从1数到50，用逗号分隔，不要输出其他内容"
+
+    def __init__(self):
+        self.claude_dir = Path.home() / ".claude"
+        self.settings_file = self.claude_dir / "settings.json"
+
+        # 优先使用新的配置文件名，如果不存在则尝试旧文件名
+        self.configs_file = self.claude_dir / "cc_apiswitch_configs.json"
+        old_configs_file = self.claude_dir / "cc_switcher_configs.json"
+
+        # 如果新文件不存在但旧文件存在，则迁移配置
+        if not self.configs_file.exists() and old_configs_file.exists():
+            import shutil
+            try:
+                shutil.copy2(old_configs_file, self.configs_file)
+                print(f"已迁移配置文件: {old_configs_file} -> {self.configs_file}")
+            except Exception as e:
+                print(f"迁移配置文件失败: {e}")
+                # 如果迁移失败，继续使用旧文件
+                self.configs_file = old_configs_file
+
+        self.configs_data = self.load_configs_data()
+        # 配置修改先在内存中合并，0.5秒内的多次保存只写一次文件
+        self.config_writer = WriteBehindJSONFile(self.configs_file, lambda: self.store.to_json_data(), delay=0.5, indent=2)
+        # 所有配置读写都通过线程安全的存储，按稳定id访问
+        self.store = ConfigStore(self.configs_data, on_change=self.save_configs_data)
+        self.proxy_url = ""  # 本地代理运行时，Claude配置指向代理地址
+        # 配置切换历史，用量统计据此把会话用量归属到当时的活跃配置
+        self.switch_history_file = self.claude_dir / "cc_apiswitch_switch_history.jsonl"
+        if not self.switch_history_file.exists() and self.store.active_name:
+            from cc_analytics import record_switch
+            record_switch(self.switch_history_file, self.store.active_name)
+
+        # 测试历史、延迟序列、项目索引、用量统计和连接池在第一次使用时才创建，
+        # 命令行切换配置等只读写配置文件的操作不需要加载它们
+        self._components = {}
+        self._components_lock = threading.RLock()  # 组件创建时可能需要其他组件
+
+    def _component(self, name, factory):
+        """获取按需创建的组件（线程安全，只创建一次，工厂函数中可获取其他组件）"""
+        component = self._components.get(name)
+        if component is None:
+            with self._components_lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = factory()
+        return component
+
+    @property
+    def test_journal(self):
+        """测试历史：每次测试结果追加到日志，配置中只保存最近一次结果"""
+        def create():
+            from cc_journal import TestJournal
+            return TestJournal(self.claude_dir / "cc_apiswitch_test_journal.jsonl",
+                               retention_days=self.get_setting("journal_retention_days"),
+                               max_bytes=int(self.get_setting("journal_max_mb") * 1024 * 1024))
+        return self._component("test_journal", create)
+
+    @property
+    def latency_series(self):
+        """测试通过时的耗时按多分辨率保存，用于显示延迟趋势"""
+        def create():
+            from cc_timeseries import LatencyTimeSeriesStore
+            return LatencyTimeSeriesStore(self.claude_dir / "cc_apiswitch_latency.json")
+        return self._component("latency_series", create)
+
+    @property
+    def session_archive(self):
+        def create():
+            from cc_archive import SessionArchive
+            return SessionArchive(self.claude_dir / "cc_apiswitch_archive")
+        return self._component("session_archive", create)
+
+    @property
+    def project_index(self):
+        def create():
+            from cc_projects import ProjectIndex
+            return ProjectIndex(self.claude_dir / "projects",
+                                self.claude_dir / "cc_apiswitch_project_index.json",
+                                archive=self.session_archive)
+        return self._component("project_index", create)
+
+    @property
+    def usage_analytics(self):
+        def create():
+            from cc_analytics import UsageAnalytics
+            return UsageAnalytics(self.claude_dir / "projects",
+                                  self.claude_dir / "cc_apiswitch_usage.json",
+                                  self.switch_history_file,
+                                  archive=self.session_archive)
+        return self._component("usage_analytics", create)
+
+    @property
+    def http_pool(self):
+        def create():
+            from cc_http import get_pool_manager
+            http_pool = get_pool_manager()
+            http_pool.configure(
+                pool_size=self.get_setting("http_pool_size"),
+                idle_timeout=self.get_setting("http_idle_timeout"))
+            return http_pool
+        return self._component("http_pool", create)
+
+    def load_configs_data(self):
+        """从JSON文件加载配置"""
+        default_data = {"configs": [], "active_config": None, "version": "1.0", "settings": {}}
+
+        if not self.configs_file.exists():
+            return default_data
+
+        try:
+            with open(self.configs_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                for key in default_data:
+                    if key not in data:
+                        data[key] = default_data[key]
+                return data
+        except (json.JSONDecodeError, IOError):
+            return default_data
+
+    def save_configs_data(self):
+        """保存配置到JSON文件（延迟合并写入）"""
+        self.config_writer.mark_dirty()
+
+    def flush(self):
+        """立即写入尚未保存的配置和延迟序列"""
+        latency_series = self._components.get("latency_series")
+        if latency_series is not None:
+            latency_series.flush()
+        return self.config_writer.flush()
+
+    def get_setting(self, key, default=None):
+        """获取设置项，未设置时使用默认值"""
+        if default is None:
+            default = self.DEFAULT_SETTINGS.get(key)
+        return self.store.get_setting(key, default)
+
+    def set_setting(self, key, value):
+        """保存设置项"""
+        self.store.set_setting(key, value)
+
+    def get_proxy_token(self):
+        """本地代理令牌（每个安装随机生成一次，保存在设置中）"""
+        token = self.get_setting("proxy_auth_token")
+        if not token:
+            import secrets
+            token = secrets.token_urlsafe(32)
+            self.set_setting("proxy_auth_token", token)
+        return token
+
+    def get_all_configs(self):
+        """获取所有配置（副本，每个配置带有稳定的"id"）"""
+        return self.store.snapshot()
+
+    def get_config(self, config_id):
+        """按id获取配置副本，不存在时返回None"""
+        return self.store.get(config_id)
+
+    def get_active_id(self):
+        """获取活跃配置id，没有时返回None"""
+        return self.store.active_id
+
+    def add_config(self, name, base_url, auth_token, model, note=""):
+        """添加新配置"""
+        new_config = {
+            "name": name,
+            "ANTHROPIC_BASE_URL": base_url,
+            "ANTHROPIC_AUTH_TOKEN": auth_token,
+            "default_model": model,
+            "note": note,
+            "test_status": "未测试",
+            "test_time": "",
+            "test_message": ""
+        }
+
+        success, message, _ = self.store.add(new_config)
+        return success, message
+
+    def update_config(self, config_id, name, base_url, auth_token, model, note=""):
+        """更新配置"""
+        return self.store.update(config_id, {
+            "name": name,
+            "ANTHROPIC_BASE_URL": base_url,
+            "ANTHROPIC_AUTH_TOKEN": auth_token,
+            "default_model": model,
+            "note": note
+        })
+
+    def delete_config(self, config_id):
+        """删除配置"""
+        if not self.store.delete([config_id]):
+            return False, "配置不存在"
+        self.latency_series.remove([config_id])
+        return True, "配置删除成功"
+
+    def delete_configs(self, config_ids):
+        """批量删除配置，返回删除的配置名称列表"""
+        deleted = self.store.delete(config_ids)
+        self.latency_series.remove(config_ids)
+        return deleted
+
+    def move_configs(self, config_ids, offset):
+        """上移(offset=-1)或下移(offset=1)配置，返回移动的配置名称列表"""
+        return self.store.move(config_ids, offset)
+
+    def switch_config(self, config_id):
+        """切换配置"""
+        config = self.store.get(config_id)
+        if config is None:
+            return False, "配置不存在"
+
+        try:
+            settings_content = {
+                "ANTHROPIC_BASE_URL": config["ANTHROPIC_BASE_URL"],
+                "ANTHROPIC_AUTH_TOKEN": config["ANTHROPIC_AUTH_TOKEN"],
+                "default_model": config["default_model"]
+            }
+            if self.proxy_url:
+                # 代理模式下Claude始终指向本地代理，由代理转发到活跃配置
+                settings_content["ANTHROPIC_BASE_URL"] = self.proxy_url
+                settings_content["ANTHROPIC_AUTH_TOKEN"] = self.get_proxy_token()
+
+            self.claude_dir.mkdir(exist_ok=True)
+            with open(self.settings_file, 'w', encoding='utf-8') as f:
+                json.dump(settings_content, f, indent=2)
+
+            if self.store.set_active(config_id):
+                from cc_analytics import record_switch
+                record_switch(self.switch_history_file, config["name"])
+
+            return True, f"已切换到配置 {config['name']}"
+        except Exception as e:
+            return False, f"切换失败: {str(e)}"
+
+    def set_environment_variables(self, config_id, scope="user"):
+        """设置环境变量"""
+        config = self.store.get(config_id)
+        if config is None:
+            return False, "配置不存在"
+
+        try:
+            import winreg
+
+            base_url = config["ANTHROPIC_BASE_URL"]
+            auth_token = config["ANTHROPIC_AUTH_TOKEN"]
+            model = config.get("default_model", "claude-sonnet-4-20250514")
+
+            # 设置当前进程环境变量
+            os.environ["ANTHROPIC_BASE_URL"] = base_url
+            os.environ["ANTHROPIC_AUTH_TOKEN"] = auth_token
+            os.environ["ANTHROPIC_MODEL"] = model
+
+            # 根据scope选择注册表位置
+            if scope == "system":
+                # 系统环境变量需要管理员权限
+                try:
+                    key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, "SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Environment", 0, winreg.KEY_ALL_ACCESS)
+                    scope_name = "系统"
+                except PermissionError:
+                    return False, "设置系统环境变量需要管理员权限，请以管理员身份运行程序"
+            else:
+                # 用户环境变量
+                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_ALL_ACCESS)
+                scope_name = "用户"
+
+            # 设置注册表环境变量
+            winreg.SetValueEx(key, "ANTHROPIC_BASE_URL", 0, winreg.REG_SZ, base_url)
+            winreg.SetValueEx(key, "ANTHROPIC_AUTH_TOKEN", 0, winreg.REG_SZ, auth_token)
+            winreg.SetValueEx(key, "ANTHROPIC_MODEL", 0, winreg.REG_SZ, model)
+            winreg.CloseKey(key)
+
+            # 通知系统环境变量已更改
+            import ctypes
+            HWND_BROADCAST = 0xFFFF
+            WM_SETTINGCHANGE = 0x1A
+            SMTO_ABORTIFHUNG = 0x0002
+            result = ctypes.c_long()
+            ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, ctypes.byref(result))
+
+            return True, f"{scope_name}环境变量已设置为: {config['name']}"
+        except Exception as e:
+            return False, f"设置失败: {str(e)}"
+
+    def test_config(self, config_id, question=None, stream=False, cancel_token=None):
+        """测试单个配置
+
+        测试结果按id写回配置，测试期间配置被移动或删除也不会写错位置。
+
+        Args:
+            config_id (str): 配置id
+            question (str): 测试问题，默认按测试模式选择
+            stream (bool): 是否使用流式(SSE)测试，记录首Token时间和解码速度
+            cancel_token (CancelToken): 取消时中止进行中的请求，结果不写回配置
+        """
+        config = self.store.get(config_id)
+        if config is None:
+            return False, "配置不存在", {}
+        if question is None:
+            question = self.STREAM_TEST_QUESTION if stream else "1+2=?"
+        if cancel_token is None:
+            return self._test_request(config_id, config, question, stream)
+
+        from cc_http import abort_connection
+
+        # 取消时中止正在使用的连接，阻塞的读写立即返回
+        connections = []
+
+        def on_connection(conn):
+            connections.append(conn)
+            if cancel_token.cancelled:
+                abort_connection(conn)
+
+        unregister = cancel_token.on_cancel(lambda: [abort_connection(conn) for conn in connections])
+        try:
+            result = self._test_request(config_id, config, question, stream,
+                                        on_connection=on_connection, cancel_token=cancel_token)
+        finally:
+            unregister()
+        if cancel_token.cancelled:
+            return False, "测试已取消", {}
+        return result
+
+    def _test_request(self, config_id, config, question, stream, on_connection=None, cancel_token=None):
+        """发送测试请求并记录结果（已取消的测试不记录）"""
+        try:
+            headers = {
+                "content-type": "application/json",
+                "anthropic-version": "2023-06-01",
+                "x-api-key": config["ANTHROPIC_AUTH_TOKEN"],
+                "user-agent": "claude-cli/1.0.115 (external, cli)"
+            }
+
+            data = {
+                "model": config["default_model"],
+                "max_tokens": 200 if stream else 100,
+                "messages": [{"role": "user", "content": question}]
+            }
+            if stream:
+                data["stream"] = True
+
+            url = f"{config['ANTHROPIC_BASE_URL'].rstrip('/')}/v1/messages"
+            response = self.http_pool.request(
+                "POST", url, body=json.dumps(data), headers=headers,
+                timeout=self.get_setting("test_connect_timeout"),
+                read_timeout=self.get_setting("test_read_timeout"),
+                on_connection=on_connection)
+            connection_label = "复用连接" if response.reused else "新建连接"
+
+            current_time = time.strftime("%H:%M:%S")
+
+            if response.status_code == 200:
+                result = {}
+                if stream:
+                    answer, stream_metrics = self._read_stream_response(response)
+                    result["stream_metrics"] = stream_metrics
+                    mode_label = "流式"
+                else:
+                    response_data = json.loads(response.read().decode('utf-8'))
+                    answer = response_data.get("content", [{}])[0].get("text", "")
+                    mode_label = ""
+
+                # 流式和非流式的耗时不可比，记录测试模式供自动切换按模式比较
+                latency = response.latency_record()
+                latency["stream"] = bool(stream)
+                result.update({
+                    "test_status": "通过",
+                    "test_time": current_time,
+                    "test_message": f"[{mode_label}{connection_label}] Q:{question} A:{answer[:30]}...",
+                    "test_connection": response.connection_state,
+                    "latency": latency
+                })
+                self._record_test(config_id, result, cancel_token)
+                return True, "测试成功", {"answer": answer, "connection": response.connection_state,
+                                      "stream_metrics": result.get("stream_metrics")}
+
+            else:
+                body = response.read()
+                error_msg = f"HTTP {response.status_code}"
+                try:
+                    error_data = json.loads(body.decode('utf-8'))
+                    error_msg = error_data.get("error", {}).get("message", error_msg)
+                except:
+                    pass
+
+                self._record_test(config_id, {
+                    "test_status": "失败",
+                    "test_time": current_time,
+                    "test_message": f"[{connection_label}] {error_msg}",
+                    "test_connection": response.connection_state,
+                    "latency": response.latency_record()
+                }, cancel_token)
+                return False, error_msg, {"connection": response.connection_state}
+
+        except TimeoutError:
+            self._record_test(config_id, {
+                "test_status": "超时",
+                "test_time": time.strftime("%H:%M:%S"),
+                "test_message": "请求超时",
+                "latency": {}
+            }, cancel_token)
+            return False, "请求超时", {}
+
+        except Exception as e:
+            self._record_test(config_id, {
+                "test_status": "错误",
+                "test_time": time.strftime("%H:%M:%S"),
+                "test_message": str(e),
+                "latency": {}
+            }, cancel_token)
+            return False, f"测试失败: {str(e)}", {}
+
+    def _record_test(self, config_id, result, cancel_token=None):
+        """保存测试结果到配置，并追加到测试历史"""
+        if cancel_token is not None and cancel_token.cancelled:
+            return
+        self.store.update(config_id, result)
+        message = result.get("test_message", "")
+        if message.startswith("["):
+            # 去掉连接方式前缀，相同错误在统计中合并
+            message = message.split("] ", 1)[-1]
+        total_ms = (result.get("latency") or {}).get("total_ms")
+        self.test_journal.append(config_id, result["test_status"], total_ms, message)
+        if result["test_status"] == "通过" and total_ms is not None:
+            self.latency_series.add(config_id, total_ms)
+
+    def get_test_stats(self, hours=24, config_ids=None):
+        """最近hours小时内各配置的可用率、平均/P95耗时和错误分布，见 TestJournal.stats"""
+        since = time.time() - hours * 3600 if hours else None
+        return self.test_journal.stats(since=since, config_ids=config_ids)
+
+    def _read_stream_response(self, response):
+        """读取SSE流式响应，返回(回答文本, 流式指标)
+
+        指标: ttft_ms 首Token时间，itl_ms 平均Token间隔，
+        tokens_per_sec 首Token之后的解码速度，output_tokens 输出Token数
+        """
+        answer_parts = []
+        token_times = []
+        output_tokens = None
+
+        from cc_http import iter_sse_events
+
+        try:
+            for event, payload in iter_sse_events(response.iter_lines()):
+                if not payload:
+                    continue
+                try:
+                    message = json.loads(payload)
+                except json.JSONDecodeError:
+                    continue
+
+                kind = message.get("type", event)
+                if kind == "content_block_delta":
+                    token_times.append(response.elapsed_ms())
+                    answer_parts.append(message.get("delta", {}).get("text", ""))
+                elif kind == "message_delta":
+                    output_tokens = message.get("usage", {}).get("output_tokens", output_tokens)
+                elif kind == "error":
+                    raise ValueError(message.get("error", {}).get("message", "流式响应错误"))
+        finally:
+            response.close()
+
+        if not token_times:
+            raise ValueError("流式响应中没有收到任何Token")
+
+        tokens = output_tokens or len(token_times)
+        decode_span = (token_times[-1] - token_times[0]) / 1000
+        gaps = [later - earlier for earlier, later in zip(token_times, token_times[1:])]
+
+        stream_metrics = {
+            "ttft_ms": round(token_times[0], 1),
+            "itl_ms": round(sum(gaps) / len(gaps), 1) if gaps else None,
+            "tokens_per_sec": round((tokens - 1) / decode_span, 1) if decode_span > 0 and tokens > 1 else None,
+            "output_tokens": tokens
+        }
+        return "".join(answer_parts), stream_metrics
+
+    def get_current_claude_config(self):
+        """获取当前claude配置"""
+        try:
+            if self.settings_file.exists():
+                with open(self.settings_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            pass
+        return {}
+
+    def get_system_env_config(self):
+        """获取系统环境变量配置"""
+        env_config = {}
+        try:
+            env_config['ANTHROPIC_BASE_URL'] = os.environ.get('ANTHROPIC_BASE_URL', '')
+            env_config['ANTHROPIC_AUTH_TOKEN'] = os.environ.get('ANTHROPIC_AUTH_TOKEN', '')
+            env_config['ANTHROPIC_MODEL'] = os.environ.get('ANTHROPIC_MODEL', '')
+        except:
+            pass
+        return env_config
+
+    def get_available_models(self):
+        """获取可用模型列表 - 从配置文件读取"""
+        try:
+            # 获取当前脚本所在目录
+            current_dir = Path(__file__).parent.absolute()
+            models_config_file = current_dir / "models_config.json"
+
+            # 尝试读取模型配置文件
+            if models_config_file.exists():
+                with open(models_config_file, 'r', encoding='utf-8') as f:
+                    models_config = json.load(f)
+
+                # 提取所有模型到一个扁平列表
+                all_models = []
+                for category in models_config.get("models", []):
+                    all_models.extend(category.get("models", []))
+
+                return all_models
+        except Exception as e:
+            print(f"读取模型配置文件失败: {e}")
+
+        # 如果读取失败，返回默认模型列表
+        return [
+            # Claude 4系列模型
+            "claude-4-sonnet",
+            "claude-sonnet-4-20250514",
+
+            # Claude 3.5系列模型
+            "claude-3-5-sonnet",
+            "claude-3-5-haiku",
+
+            # DeepSeek系列模型
+            "deepseek-v3",
+            "deepseek-chat",
+
+            # 其他常用模型
+            "gpt-4o",
+            "gemini-1.5-pro",
+
+            # 简化名称模型
+            "claude-sonnet",
+            "claude-haiku"
+        ]
+
+    def archive_old_sessions(self, days=None, cancel_token=None):
+        """压缩归档超过指定天数未修改的会话（阻塞，应在后台线程调用）
+
+        Args:
+            days (float): 归档超过该天数未修改的会话，默认使用设置 archive_after_days
+            cancel_token (CancelToken): 取消后停止统计和归档剩余的项目
+
+        Returns:
+            tuple: (success, message, stats)
+        """
+        days = self.get_setting("archive_after_days") if days is None else days
+        try:
+            # 归档前先统计用量，保证归档的会话已解析到文件末尾
+            self.usage_analytics.update(cancel_token)
+            if cancel_token is not None and cancel_token.cancelled:
+                return False, "归档已取消", {}
+            stats = self.project_index.archive_old_sessions(float(days) * 86400, cancel_token)
+        except Exception as e:
+            return False, f"归档失败: {str(e)}", {}
+
+        if cancel_token is not None and cancel_token.cancelled:
+            return False, f"归档已取消，已归档 {stats['sessions']} 个会话", stats
+        if not stats["sessions"]:
+            return True, f"没有超过 {days} 天未修改的会话", stats
+        message = (f"已归档 {stats['sessions']} 个会话，"
+                   f"{stats['original_bytes'] / 1024 / 1024:.1f}MB 压缩为 {stats['archived_bytes'] / 1024 / 1024:.1f}MB，"
+                   f"节省 {stats['saved_bytes'] / 1024 / 1024:.1f}MB；"
+                   f"目录扫描耗时 {stats['scan_ms_before']:.0f}ms → {stats['scan_ms_after']:.0f}ms")
+        return True, message, stats
+
+    def restore_archived_sessions(self, project_path=None, cancel_token=None):
+        """把冷存储中的会话恢复到Claude Code的项目目录（阻塞，应在后台线程调用）
+
+        Args:
+            project_path (str): 只恢复该项目的会话，None表示全部
+            cancel_token (CancelToken): 取消后不再恢复剩余的项目
+
+        Returns:
+            tuple: (success, message, count)
+        """
+        try:
+            count = self.project_index.restore_archived_sessions(project_path, cancel_token)
+        except Exception as e:
+            return False, f"恢复失败: {str(e)}", 0
+        if cancel_token is not None and cancel_token.cancelled:
+            return False, f"恢复已取消，已恢复 {count} 个会话", count
+        if not count:
+            return True, "没有可恢复的冷存储会话", 0
+        return True, f"已恢复 {count} 个会话，可以在Claude Code中用 --resume 继续", count
+
+    def get_claude_code_projects(self, on_batch=None, cancel_token=None):
+        """获取Claude Code最近的项目列表（使用持久化索引，只重新读取变化的会话文件）
+
+        Args:
+            on_batch (callable): 并行扫描过程中分批回调 on_batch(projects)
+            cancel_token (CancelToken): 取消后停止扫描，返回已扫描到的项目
+        """
+        projects = []
+
+        try:
+            claude_projects_dir = self.project_index.projects_dir
+
+            if not claude_projects_dir.exists():
+                return projects
+
+            # 检查读取权限
+            if not os.access(claude_projects_dir, os.R_OK):
+                print("没有权限访问Claude项目目录")
+                return projects
+
+            projects = self.project_index.get_projects(on_batch=on_batch, cancel_token=cancel_token)
+
+        except (PermissionError, OSError) as e:
+            print(f"访问Claude目录时权限不足: {e}")
+        except Exception as e:
+            print(f"获取项目列表时出错: {e}")
+
+        return projects
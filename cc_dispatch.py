@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 界面更新合并
+后台线程把界面更新按键放入队列，界面线程按固定频率批量执行，
+同一键的多次更新（同一行、状态栏、列表刷新）只执行最后一次。
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class UIUpdateDispatcher:
+    """合并后台线程的界面更新
+
+    post() 可在任意线程调用；队列由空变为非空时调用 schedule()，
+    由界面在一个更新周期后调用 drain() 执行所有待处理的更新。
+    """
+
+    MAX_PASSES = 5  # 执行更新时新加入的更新在同一次drain中最多再处理几轮
+
+    def __init__(self, schedule=None):
+        self.schedule = schedule
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()  # 键 -> (函数, 位置参数, 关键字参数)
+        self._sequence = 0
+        self.merged_count = 0  # 被合并掉的更新数
+        self.applied_count = 0
+
+    def post(self, key, func, *args, **kwargs):
+        """加入更新，key相同的未执行更新被替换（key为None时不合并）"""
+        with self._lock:
+            if key is None:
+                self._sequence += 1
+                key = ("_unique", self._sequence)
+            elif key in self._pending:
+                self.merged_count += 1
+                # 替换后移到队尾，保证最新状态在之前加入的更新之后执行
+                del self._pending[key]
+            was_empty = not self._pending
+            self._pending[key] = (func, args, kwargs)
+        if was_empty and self.schedule:
+            self.schedule()
+
+    @property
+    def pending(self):
+        """待执行的更新数"""
+        with self._lock:
+            return len(self._pending)
+
+    def drain(self):
+        """执行所有待处理的更新（在界面线程调用），返回执行的更新数"""
+        applied = 0
+        for _ in range(self.MAX_PASSES):
+            with self._lock:
+                if not self._pending:
+                    break
+                batch, self._pending = self._pending, OrderedDict()
+            for func, args, kwargs in batch.values():
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:
+                    print(f"界面更新失败: {e}")
+                applied += 1
+        self.applied_count += applied
+        if self.pending and self.schedule:
+            # 更新持续产生，留到下一个周期
+            self.schedule()
+        return applied
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch HTTP连接池
+所有对外请求共用一个requests会话，按主机复用keep-alive连接，
+新建连接时分别记录DNS、TCP连接和TLS握手耗时
+"""
+
+import json
+import queue
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, cast
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.exceptions import TimeoutError as Urllib3TimeoutError
+
+if TYPE_CHECKING:
+    from urllib3._base_connection import BaseHTTPConnection, BaseHTTPSConnection
+
+
+# 会话最多保留连接池的主机数
+POOL_HOSTS = 32
+
+# 当前线程正在发送的请求（记录新建连接的分阶段耗时，并把使用的连接告知调用方）
+_request_context = threading.local()
+
+
+def new_timings():
+    """新建分阶段耗时记录（毫秒）；复用连接时DNS/连接/TLS均为0"""
+    return {"dns_ms": 0.0, "connect_ms": 0.0, "tls_ms": 0.0, "ttfb_ms": 0.0, "total_ms": 0.0}
+
+
+def iter_sse_events(lines):
+    """解析SSE字节行流，逐个返回(event, data)"""
+    event, data_lines = None, []
+    for raw in lines:
+        line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+        if not line:
+            if event is not None or data_lines:
+                yield event or "message", "\n".join(data_lines)
+            event, data_lines = None, []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == "event":
+            event = value
+        elif field == "data":
+            data_lines.append(value)
+    if event is not None or data_lines:
+        yield event or "message", "\n".join(data_lines)
+
+
+def abort_connection(conn):
+    """从其他线程中止连接上正在进行的请求（阻塞的读写会立即抛出异常）"""
+    sock = conn.sock
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    conn.close()
+
+
+if TYPE_CHECKING:
+    _ConnectionBase = HTTPConnection
+else:
+    _ConnectionBase = object
+
+
+class _TimedConnectionMixin(_ConnectionBase):
+    """新建连接时记录DNS和TCP连接耗时，发送请求时把连接交给调用方（用于中止请求）"""
+
+    _fresh = False  # 连接刚建立，尚未发送过请求
+    last_used = 0.0
+
+    def _new_conn(self):
+        context = getattr(_request_context, "value", None)
+        if context is None:
+            return super()._new_conn()
+
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            # 由urllib3重新解析并抛出统一的异常
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        context["timings"]["dns_ms"] = (resolved - start) * 1000
+
+        last_error = None
+        for _, _, _, _, address in addresses:
+            self._dns_host = str(address[0])
+            try:
+                sock = super()._new_conn()
+            except (NewConnectionError, ConnectTimeoutError) as e:
+                last_error = e
+                continue
+            finally:
+                self._dns_host = host
+            context["timings"]["connect_ms"] = (time.perf_counter() - resolved) * 1000
+            return sock
+        if last_error is None:
+            raise socket.gaierror(socket.EAI_NONAME, f"无法解析主机地址: {host}")
+        raise last_error
+
+    def connect(self):
+        super().connect()
+        self._fresh = True
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        context = getattr(_request_context, "value", None)
+        if context is not None:
+            # HTTPS连接在发送请求前已建立，HTTP连接在发送请求时建立
+            context["reused"] = self.sock is not None and not self._fresh
+            if context["on_connection"]:
+                context["on_connection"](self)
+        self.last_used = time.monotonic()
+        try:
+            return super().request(method, url, body=body, headers=headers, **kwargs)
+        finally:
+            self._fresh = False
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        context = getattr(_request_context, "value", None)
+        start = time.perf_counter()
+        super().connect()
+        if context is not None:
+            # TLS握手（经过代理时包括CONNECT隧道）= 建立连接总耗时 - DNS - TCP连接
+            timings = context["timings"]
+            elapsed = (time.perf_counter() - start) * 1000
+            timings["tls_ms"] = max(0.0, elapsed - timings["dns_ms"] - timings["connect_ms"])
+
+
+# urllib3的连接协议类型与其自带的连接类也不完全匹配，这里按协议类型声明
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = cast("type[BaseHTTPConnection]", _TimedHTTPConnection)
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = cast("type[BaseHTTPSConnection]", _TimedHTTPSConnection)
+
+
+_POOL_CLASSES = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """使用可计时连接的HTTPAdapter（直连和HTTP/HTTPS代理，SOCKS代理不记录分阶段耗时）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = _POOL_CLASSES
+        return manager
+
+    def connection_pools(self):
+        """当前所有主机的连接池"""
+        managers = [self.poolmanager, *self.proxy_manager.values()]
+        pools = []
+        for manager in managers:
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    pools.append(pool)
+        return pools
+
+
+class PooledResponse:
+    """连接池响应，读取完毕后连接自动归还连接池"""
+
+    def __init__(self, response, reused, timings, start):
+        self._response = response
+        self._start = start
+        self.reused = reused
+        self.timings = timings
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.headers = response.headers  # 不区分大小写，同名头部合并为一个值
+
+    @property
+    def connection_state(self):
+        """本次请求使用的连接状态: warm(复用) / cold(新建)"""
+        return "warm" if self.reused else "cold"
+
+    def header_items(self):
+        """按原样返回响应头 [(名称, 值)]，同名头部（如Set-Cookie）分别返回"""
+        raw_headers = self._response.raw.headers
+        return [(key, value) for key in raw_headers for value in raw_headers.getlist(key)]
+
+    def read(self):
+        """读取完整响应体（按Content-Encoding解压）"""
+        try:
+            data = self._response.raw.read(decode_content=True)
+        except Urllib3TimeoutError as e:
+            self.close()
+            raise TimeoutError(str(e)) from e
+        except Exception:
+            self.close()
+            raise
+        self._finish()
+        return data
+
+    def json(self):
+        """读取并解析JSON响应体"""
+        return json.loads(self.read().decode('utf-8'))
+
+    def _iter_raw(self, chunk_size, decode_content):
+        """按到达顺序读取响应体数据块，不等待凑满chunk_size"""
+        raw = self._response.raw
+        try:
+            while True:
+                chunk = raw.read1(chunk_size, decode_content=decode_content)
+                if not chunk:
+                    break
+                yield chunk
+        except Urllib3TimeoutError as e:
+            self.close()
+            raise TimeoutError(str(e)) from e
+        except Exception:
+            self.close()
+            raise
+        self._finish()
+
+    def iter_lines(self):
+        """逐行读取响应体（用于SSE流式响应）"""
+        pending = b""
+        for chunk in self._iter_raw(65536, decode_content=True):
+            pending += chunk
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+        if pending:
+            yield pending
+
+    def iter_chunks(self, chunk_size=65536):
+        """按到达顺序读取原始响应体数据块（不解压，用于流式转发）"""
+        return self._iter_raw(chunk_size, decode_content=False)
+
+    def elapsed_ms(self):
+        """从发起请求到现在的耗时（毫秒）"""
+        return (time.perf_counter() - self._start) * 1000
+
+    def _finish(self):
+        """记录响应读取完毕的总耗时"""
+        self.timings["total_ms"] = (time.perf_counter() - self._start) * 1000
+
+    def latency_record(self):
+        """返回可持久化的分阶段耗时（毫秒，保留1位小数）"""
+        record = {key: round(value, 1) for key, value in self.timings.items()}
+        record["connection"] = self.connection_state
+        return record
+
+    def close(self):
+        """放弃响应；未读完的响应会关闭底层连接"""
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class HTTPPoolManager:
+    """共享的requests会话，每个主机保持pool_size个keep-alive连接
+
+    系统和环境变量代理、重定向、证书校验沿用requests的行为。
+    """
+
+    def __init__(self, pool_size=4, idle_timeout=60):
+        self.pool_size = max(1, int(pool_size))
+        self.idle_timeout = max(1, float(idle_timeout))
+        self._lock = threading.Lock()
+        self._janitor = None
+        self.session = requests.Session()
+        # 请求头完全由调用方指定（代理按原样转发客户端的请求头）
+        self.session.headers.clear()
+        self._adapter = self._mount()
+
+    def _mount(self):
+        """按当前池大小创建HTTPAdapter并挂载到会话，返回新的adapter"""
+        adapter = _TimedHTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        return adapter
+
+    def configure(self, pool_size=None, idle_timeout=None):
+        """更新连接池大小和空闲超时"""
+        with self._lock:
+            if idle_timeout is not None:
+                self.idle_timeout = max(1, float(idle_timeout))
+            if pool_size is not None and max(1, int(pool_size)) != self.pool_size:
+                self.pool_size = max(1, int(pool_size))
+                # 挂载新的adapter后关闭旧的连接池
+                old_adapter, self._adapter = self._adapter, self._mount()
+                old_adapter.close()
+
+    def _start_janitor(self):
+        with self._lock:
+            if self._janitor is None:
+                self._janitor = threading.Thread(target=self._janitor_loop, name="http-pool-janitor", daemon=True)
+                self._janitor.start()
+
+    def _janitor_loop(self):
+        """后台定期清理空闲超时的连接"""
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 2))
+            self.evict_idle()
+
+    def evict_idle(self):
+        """关闭所有连接池中空闲超时的连接"""
+        now = time.monotonic()
+        for pool in self._adapter.connection_pools():
+            idle = pool.pool
+            if idle is None:
+                continue
+            connections = []
+            while True:
+                try:
+                    connections.append(idle.get(block=False))
+                except queue.Empty:
+                    break
+            for conn in connections:
+                if conn is not None and conn.sock is not None and now - conn.last_used > self.idle_timeout:
+                    conn.close()
+                try:
+                    idle.put(conn, block=False)
+                except queue.Full:
+                    if conn is not None:
+                        conn.close()
+
+    def close_all(self):
+        """关闭所有连接"""
+        self._adapter.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=10, on_connection=None,
+                read_timeout=None, allow_redirects=True):
+        """发送请求并返回PooledResponse（调用方负责read()或close()）
+
+        timeout: 建立连接（DNS、TCP、TLS）的超时秒数
+        read_timeout: 连接建立后每次读写的超时秒数，None时与timeout相同
+        on_connection: 发送请求前以连接对象回调，调用方可据此用abort_connection()中止请求
+        """
+        if read_timeout is None:
+            read_timeout = timeout
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self._start_janitor()
+
+        timings = new_timings()
+        context = {"timings": timings, "reused": False, "on_connection": on_connection}
+        _request_context.value = context
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, data=body, headers=headers or {},
+                                            timeout=(timeout, read_timeout), stream=True,
+                                            allow_redirects=allow_redirects)
+        except requests.exceptions.Timeout as e:
+            raise TimeoutError(str(e)) from e
+        finally:
+            _request_context.value = None
+        timings["ttfb_ms"] = (time.perf_counter() - start) * 1000
+        return PooledResponse(response, context["reused"], timings, start)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool_manager():
+    """获取全局共享的连接池"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPPoolManager()
+        return _default_pool
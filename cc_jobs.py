@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 后台任务管理
+测试、批量测试、项目加载、归档和启动等后台操作统一提交到有界线程池，
+每个任务有取消令牌和进度，界面据此显示任务列表并可取消任务。
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class CancelToken:
+    """取消令牌：任务定期检查 cancelled，阻塞操作通过 on_cancel 注册中止回调"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消任务并执行已注册的中止回调"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"取消回调失败: {e}")
+
+    def on_cancel(self, callback):
+        """注册中止回调（已取消时立即执行），返回用于注销的函数"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled()
+
+    def wait(self, timeout):
+        """等待timeout秒，期间被取消时返回True"""
+        return self._event.wait(timeout)
+
+
+class Job:
+    """一个后台任务"""
+
+    PENDING = "等待中"
+    RUNNING = "运行中"
+    DONE = "已完成"
+    CANCELLED = "已取消"
+    FAILED = "失败"
+
+    def __init__(self, job_id, title, manager):
+        self.id = job_id
+        self.title = title
+        self.token = CancelToken()
+        self.state = self.PENDING
+        self.done = 0
+        self.total = None
+        self.message = ""
+        self.result = None
+        self.submitted = time.time()
+        self.finished = None
+        self._manager = manager
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    @property
+    def active(self):
+        return self.state in (self.PENDING, self.RUNNING)
+
+    def set_progress(self, done, total=None, message=None):
+        """报告进度（任意线程调用）"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self._manager._changed()
+
+    def cancel(self):
+        self._manager.cancel(self.id)
+
+    def progress_text(self):
+        if self.total:
+            return f"{self.done}/{self.total}"
+        return ""
+
+
+class JobManager:
+    """有界的后台任务执行器
+
+    submit() 把任务放入线程池，任务函数以Job为第一个参数，
+    应检查 job.cancelled 或通过 job.token.on_cancel 注册中止操作。
+    任务状态变化时调用 on_change()（在任务线程中调用）。
+    工作线程是守护线程，按需创建，最多max_workers个；退出程序时不等待未响应取消的任务。
+    """
+
+    def __init__(self, max_workers=4, on_change=None, keep_finished=20):
+        self.max_workers = max(1, int(max_workers))
+        self.on_change = on_change
+        self.keep_finished = keep_finished
+        self._queue = deque()  # (任务, 函数, 位置参数, 关键字参数, 完成回调)
+        self._workers = []
+        self._idle = 0  # 正在等待任务的工作线程数
+        self._closed = False
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._jobs = {}  # 任务id -> Job（按提交顺序）
+        self._ids = itertools.count(1)
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def submit(self, title, func, *args, on_done=None, **kwargs):
+        """提交任务，返回Job
+
+        Args:
+            title (str): 任务列表中显示的名称
+            func (callable): func(job, *args, **kwargs)，返回值保存在 job.result
+            on_done (callable): 任务结束后（完成、取消或失败）以Job为参数回调，在任务线程中调用
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("任务管理器已关闭")
+            job = Job(next(self._ids), title, self)
+            self._jobs[job.id] = job
+            self._prune()
+            self._queue.append((job, func, args, kwargs, on_done))
+            self._condition.notify()
+            # 排队的任务多于等待中的工作线程时新建工作线程
+            if len(self._queue) > self._idle and len(self._workers) < self.max_workers:
+                thread = threading.Thread(target=self._worker, name=f"job-{len(self._workers) + 1}", daemon=True)
+                self._workers.append(thread)
+                thread.start()
+        self._changed()
+        return job
+
+    def _worker(self):
+        """工作线程：依次执行队列中的任务，关闭后执行完队列中剩余的任务（已取消）再退出"""
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    # 只有真正等待任务时才计为空闲
+                    self._idle += 1
+                    self._condition.wait()
+                    self._idle -= 1
+                if not self._queue:
+                    return
+                item = self._queue.popleft()
+            self._run(*item)
+
+    def _run(self, job, func, args, kwargs, on_done):
+        if job.cancelled:
+            job.state = Job.CANCELLED
+        else:
+            job.state = Job.RUNNING
+            self._changed()
+            try:
+                job.result = func(job, *args, **kwargs)
+                job.state = Job.CANCELLED if job.cancelled else Job.DONE
+            except JobCancelled:
+                job.state = Job.CANCELLED
+            except Exception as e:
+                job.state = Job.CANCELLED if job.cancelled else Job.FAILED
+                job.message = str(e)
+                print(f"任务 {job.title} 失败: {e}")
+        job.finished = time.time()
+        if on_done:
+            try:
+                on_done(job)
+            except Exception as e:
+                print(f"任务 {job.title} 完成回调失败: {e}")
+        self._changed()
+
+    def _prune(self):
+        """只保留最近的keep_finished个已结束任务（调用方持有锁）"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def jobs(self):
+        """按提交顺序返回任务列表"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """取消任务，返回是否找到未结束的任务"""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.token.cancel()
+        self._changed()
+        return True
+
+    def cancel_all(self):
+        for job in self.jobs():
+            if job.active:
+                job.token.cancel()
+        self._changed()
+
+    def shutdown(self, timeout=2.0):
+        """取消所有任务并停止接受新任务，最多等待timeout秒让正在运行的任务结束
+
+        Returns:
+            bool: 工作线程是否都已结束（超时未结束的守护线程不会阻止程序退出）
+        """
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        self.cancel_all()
+        with self._condition:
+            self._condition.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in workers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in workers)
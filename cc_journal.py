@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 测试历史日志
+每次测试结果追加一行到只追加的日志文件，按保留天数和大小上限定期压缩，
+查询按时间二分定位后流式读取，不把整个历史读入内存。
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+
+# 日志行中的状态代码 <-> 配置中的测试状态
+STATUS_CODES = {"通过": "ok", "失败": "fail", "超时": "timeout", "错误": "error"}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图，内存占用与样本数无关，百分位相对误差约为 (growth-1)/2"""
+
+    def __init__(self, growth=1.05):
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.buckets = {}  # 桶序号 -> 样本数
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value_ms):
+        bucket = int(math.log(max(value_ms, 1.0)) / self._log_growth)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value_ms
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """第p百分位（取所在桶的几何中点），没有样本时返回None"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return self.growth ** (bucket + 0.5)
+        return self.growth ** (max(self.buckets) + 0.5)
+
+
+class TestJournal:
+    """只追加的测试历史日志
+
+    每行是一个JSON数组 [时间戳, 配置id, 状态代码, 耗时毫秒或null, 错误信息]，
+    按追加顺序即时间顺序排列，查询时据此二分查找时间窗口的起点。
+    """
+
+    def __init__(self, path, retention_days=30, max_bytes=20 * 1024 * 1024, compact_interval=24 * 3600):
+        self.path = Path(path)
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._last_compact = 0.0
+        self._readers = 0  # 正在读取日志的迭代器数（Windows下不能替换已打开的文件，读取期间推迟压缩）
+
+    def append(self, config_id, status, latency_ms=None, message="", timestamp=None):
+        """追加一条测试结果
+
+        Args:
+            config_id (str): 配置id
+            status (str): 测试状态（通过/失败/超时/错误）
+            latency_ms (float): 总耗时（毫秒），没有时为None
+            message (str): 失败时的错误信息
+        """
+        code = STATUS_CODES.get(status, status)
+        record = [round(timestamp if timestamp is not None else time.time(), 3), config_id, code,
+                  round(latency_ms, 1) if latency_ms is not None else None,
+                  "" if code == "ok" else (message or "")[:120]]
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._lock:
+            try:
+                self.path.parent.mkdir(exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                    size = f.tell()
+            except (IOError, OSError) as e:
+                print(f"写入测试历史失败: {e}")
+                return
+            if size > self.max_bytes or time.time() - self._last_compact > self.compact_interval:
+                self._compact_locked()
+
+    def compact(self):
+        """立即压缩日志，返回压缩后的大小（字节），有读取者或替换失败时返回原大小"""
+        with self._lock:
+            return self._compact_locked()
+
+    def _compact_locked(self, now=None):
+        """删除超过保留天数的记录，并把大小降到上限的3/4以下（保留最新的记录）
+
+        有读取者或替换文件失败时不压缩，下次追加时重试。
+        """
+        now = time.time() if now is None else now
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            return 0
+        if self._readers:
+            return size
+
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(self.path, 'rb') as f:
+                start = self._seek_time(f, now - self.retention_days * 86400, size)
+                target = self.max_bytes * 3 // 4
+                if size - start > target:
+                    # 超出大小上限，从保留窗口内更靠后的一行开始保留
+                    f.seek(size - target)
+                    f.readline()
+                    start = f.tell()
+                if start == 0:
+                    self._last_compact = now
+                    return size
+
+                f.seek(start)
+                with open(temp_file, 'wb') as out:
+                    while True:
+                        chunk = f.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                    out.flush()
+                    os.fsync(out.fileno())
+            os.replace(temp_file, self.path)
+        except OSError as e:
+            print(f"压缩测试历史失败: {e}")
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+            return size
+        self._last_compact = now
+        return size - start
+
+    @staticmethod
+    def _parse(line):
+        """解析一行，损坏的行返回None"""
+        try:
+            record = json.loads(line)
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(record, list) or len(record) < 5:
+            return None
+        return record
+
+    def _line_at(self, f, offset):
+        """从offset处（或其后第一个行首）开始的第一条有效记录，返回(行首偏移, 记录或None)"""
+        if offset > 0:
+            f.seek(offset - 1)
+            f.readline()  # offset-1 处是换行符时只读掉该换行符
+        else:
+            f.seek(0)
+        while True:
+            line_start = f.tell()
+            line = f.readline()
+            if not line:
+                return line_start, None
+            record = self._parse(line)
+            if record is not None:
+                return line_start, record
+
+    def _seek_time(self, f, since, size):
+        """二分查找第一条时间戳不早于since的记录的行首偏移"""
+        if since is None:
+            return 0
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            _, record = self._line_at(f, middle)
+            if record is None or record[0] >= since:
+                high = middle
+            else:
+                low = middle + 1
+        return self._line_at(f, low)[0]
+
+    def iter_records(self, since=None, until=None, config_ids=None):
+        """按时间顺序遍历记录，生成(时间戳, 配置id, 状态代码, 耗时毫秒, 错误信息)"""
+        config_ids = set(config_ids) if config_ids is not None else None
+        with self._lock:
+            try:
+                f = open(self.path, 'rb')
+            except OSError:
+                return
+            self._readers += 1
+        try:
+            with f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(self._seek_time(f, since, size))
+                for line in f:
+                    record = self._parse(line)
+                    if record is None:
+                        continue
+                    timestamp, config_id = record[0], record[1]
+                    if since is not None and timestamp < since:
+                        continue
+                    if until is not None and timestamp > until:
+                        break
+                    if config_ids is not None and config_id not in config_ids:
+                        continue
+                    yield tuple(record[:5])
+        finally:
+            with self._lock:
+                self._readers -= 1
+
+    def stats(self, since=None, until=None, config_ids=None):
+        """按配置统计时间窗口内的测试结果
+
+        Returns:
+            dict: 配置id -> {"total", "ok", "uptime"（百分比）, "mean_ms", "p95_ms",
+                  "errors": {"状态: 错误信息": 次数}}
+        """
+        results = {}
+        histograms = {}
+        for _, config_id, code, latency_ms, message in self.iter_records(since, until, config_ids):
+            result = results.get(config_id)
+            if result is None:
+                result = results[config_id] = {"total": 0, "ok": 0, "errors": {}}
+                histograms[config_id] = LatencyHistogram()
+            result["total"] += 1
+            if code == "ok":
+                result["ok"] += 1
+                if latency_ms is not None:
+                    histograms[config_id].add(latency_ms)
+            else:
+                key = STATUS_NAMES.get(code, code)
+                if message:
+                    key = f"{key}: {message}"
+                result["errors"][key] = result["errors"].get(key, 0) + 1
+
+        for config_id, result in results.items():
+            histogram = histograms[config_id]
+            result["uptime"] = result["ok"] * 100.0 / result["total"]
+            result["mean_ms"] = histogram.mean
+            result["p95_ms"] = histogram.percentile(95)
+        return results
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 后台健康监控
+按自适应周期在后台重新探测所有配置
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cc_jobs import CancelToken
+
+
+class HealthMonitor:
+    """后台健康监控
+
+    健康的配置按较长周期探测；失败的配置从较短周期开始按指数退避探测，
+    状态反复变化（抖动）的配置保持较短周期。
+    """
+
+    def __init__(self, config_manager, on_result=None, healthy_interval=300,
+                 failure_interval=15, max_workers=4, history_size=6):
+        self.config_manager = config_manager
+        self.on_result = on_result
+        self.healthy_interval = max(1.0, float(healthy_interval))
+        self.failure_interval = max(1.0, min(float(failure_interval), self.healthy_interval))
+        self.max_workers = max(1, int(max_workers))
+        self.history_size = max(2, int(history_size))
+
+        self._states = {}  # 配置id -> 调度状态
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._cancel_token = CancelToken()  # 停止时中止进行中的探测请求
+        self._thread = None
+
+    @property
+    def running(self):
+        """监控线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台监控"""
+        if self.running and not self._stop_event.is_set():
+            return
+        # 每次启动使用新的停止事件，避免尚未退出的旧线程被重新唤醒
+        self._stop_event = threading.Event()
+        self._cancel_token = CancelToken()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event, self._cancel_token),
+                                        name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台监控，中止正在进行的探测"""
+        self._stop_event.set()
+        self._cancel_token.cancel()
+        self._thread = None
+
+    def _new_state(self, delay):
+        """新建配置的调度状态"""
+        return {
+            "next_probe": time.monotonic() + delay,
+            "failures": 0,
+            "history": deque(maxlen=self.history_size),
+            "in_flight": False,
+        }
+
+    def _sync_schedule(self):
+        """同步配置列表：新配置加入调度，已删除的配置移出调度"""
+        config_ids = self.config_manager.store.ids()
+        known = set(config_ids)
+        with self._lock:
+            for config_id in list(self._states):
+                if config_id not in known:
+                    del self._states[config_id]
+            pending = [config_id for config_id in config_ids if config_id not in self._states]
+            for offset, config_id in enumerate(pending):
+                # 错开首次探测，避免同时请求所有配置
+                self._states[config_id] = self._new_state(offset * 2.0)
+
+    def is_flapping(self, history):
+        """最近的探测结果中状态变化两次及以上视为抖动"""
+        changes = sum(1 for earlier, later in zip(history, list(history)[1:]) if earlier != later)
+        return changes >= 2
+
+    def next_interval(self, state):
+        """根据探测历史计算下一次探测间隔（秒）"""
+        if state["failures"] > 0:
+            interval = self.failure_interval * (2 ** (state["failures"] - 1))
+        elif self.is_flapping(state["history"]):
+            interval = self.failure_interval * 2
+        else:
+            interval = self.healthy_interval
+        interval = min(interval, self.healthy_interval)
+        # 加入±10%抖动，避免所有配置在同一时刻探测
+        return interval * random.uniform(0.9, 1.1)
+
+    def _run(self, stop_event, cancel_token):
+        """监控主循环"""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="health-probe") as executor:
+            while not stop_event.is_set():
+                self._sync_schedule()
+                now = time.monotonic()
+                due = []
+                with self._lock:
+                    for config_id, state in self._states.items():
+                        if not state["in_flight"] and state["next_probe"] <= now:
+                            state["in_flight"] = True
+                            due.append(config_id)
+                    pending = [state["next_probe"] for state in self._states.values() if not state["in_flight"]]
+
+                for config_id in due:
+                    executor.submit(self._probe, config_id, cancel_token)
+
+                wait = min(pending) - time.monotonic() if pending else 1.0
+                stop_event.wait(min(max(wait, 0.2), 1.0))
+
+    def _probe(self, config_id, cancel_token=None):
+        """探测单个配置并更新调度状态"""
+        success, message = False, ""
+        probed = False
+        try:
+            if self._stop_event.is_set() or self.config_manager.get_config(config_id) is None:
+                return
+            probed = True
+            success, message, _ = self.config_manager.test_config(config_id, cancel_token=cancel_token)
+            # 监控停止时被中止的探测不计入探测历史
+            probed = cancel_token is None or not cancel_token.cancelled
+        except Exception as e:
+            success, message = False, str(e)
+        finally:
+            with self._lock:
+                state = self._states.get(config_id)
+                if state is not None:
+                    state["in_flight"] = False
+                    if probed:
+                        state["history"].append(success)
+                        state["failures"] = 0 if success else state["failures"] + 1
+                    state["next_probe"] = time.monotonic() + self.next_interval(state)
+
+        if probed and self.on_result and not self._stop_event.is_set():
+            self.on_result(config_id, success, message)
+
+
+class AutoSwitcher:
+    """自动切换到最快的健康配置
+
+    使用最近一次测试记录的延迟排名（扣除DNS/连接/TLS建连耗时，避免冷热连接不可比），
+    只比较同一测试模式（流式/非流式）的结果。
+    当前配置不可用时立即切换到排名第一的配置；耗时超过阈值时，
+    目标配置至少快margin比例且连续confirmations次评估都如此才切换，避免在相近的配置间来回切换。
+    """
+
+    FAILED_STATUSES = ("失败", "错误", "超时")
+
+    def __init__(self, config_manager, threshold_ms=5000, set_env=False, margin=0.2, confirmations=2):
+        self.config_manager = config_manager
+        self.threshold_ms = float(threshold_ms)
+        self.set_env = set_env
+        self.margin = max(0.0, float(margin))
+        self.confirmations = max(1, int(confirmations))
+        self._candidate = None  # (目标配置id, 连续更快的评估次数)
+
+    @staticmethod
+    def score(config):
+        """配置的服务耗时（毫秒），没有测试数据时返回None"""
+        latency = config.get("latency") or {}
+        total = latency.get("total_ms")
+        if total is None:
+            return None
+        setup = latency.get("dns_ms", 0) + latency.get("connect_ms", 0) + latency.get("tls_ms", 0)
+        return max(0.0, total - setup)
+
+    @staticmethod
+    def test_mode(config):
+        """最近一次测试是否为流式测试"""
+        return bool((config.get("latency") or {}).get("stream"))
+
+    def rank(self, stream=None):
+        """按服务耗时对通过测试的配置排序，返回[(耗时, 配置id)]
+
+        Args:
+            stream (bool): 只包含该测试模式的配置，为None时使用测试结果最多的模式
+        """
+        measured = []
+        for position, config in enumerate(self.config_manager.get_all_configs()):
+            if config.get("test_status") != "通过":
+                continue
+            score = self.score(config)
+            if score is not None:
+                measured.append((score, position, config["id"], self.test_mode(config)))
+        if stream is None:
+            streamed = sum(1 for *_, mode in measured if mode)
+            stream = streamed * 2 > len(measured)
+        ranked = sorted((score, position, config_id) for score, position, config_id, mode in measured
+                        if mode == stream)
+        return [(score, config_id) for score, _, config_id in ranked]
+
+    def evaluate(self):
+        """判断是否需要切换，返回(目标配置id或None, 原因)"""
+        active_id = self.config_manager.get_active_id()
+        active = self.config_manager.get_config(active_id)
+        active_score = self.score(active) if active is not None else None
+        # 当前配置有测试结果时只与同一测试模式的配置比较
+        ranked = self.rank(self.test_mode(active) if active_score is not None else None)
+        if not ranked:
+            self._candidate = None
+            return None, "没有可用的健康配置"
+
+        best_score, best_id = ranked[0]
+        if active is None:
+            self._candidate = None
+            return best_id, "当前没有活跃配置"
+        if active_id == best_id:
+            self._candidate = None
+            return None, "当前配置已是最快的配置"
+
+        if active.get("test_status") in self.FAILED_STATUSES:
+            self._candidate = None
+            return best_id, f"当前配置{active.get('test_status')}"
+
+        if (active_score is None or active_score <= self.threshold_ms
+                or best_score > active_score * (1 - self.margin)):
+            self._candidate = None
+            return None, "当前配置正常"
+
+        count = self._candidate[1] + 1 if self._candidate and self._candidate[0] == best_id else 1
+        self._candidate = (best_id, count)
+        if count < self.confirmations:
+            return None, f"当前配置耗时 {active_score:.0f}ms 超过阈值，等待确认（{count}/{self.confirmations}）"
+        self._candidate = None
+        return best_id, f"当前配置耗时 {active_score:.0f}ms 超过阈值 {self.threshold_ms:.0f}ms"
+
+    def apply(self):
+        """执行自动切换，返回(是否切换, 消息)"""
+        config_id, reason = self.evaluate()
+        if config_id is None:
+            return False, reason
+
+        success, message = self.config_manager.switch_config(config_id)
+        if not success:
+            return False, message
+
+        if self.set_env:
+            env_success, env_message = self.config_manager.set_environment_variables(config_id, "user")
+            if not env_success:
+                message = f"{message}，{env_message}"
+
+        return True, f"自动切换: {message}（{reason}）"
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 延迟合并写入
+把短时间内的多次修改合并为一次写入，写入时先写临时文件并fsync，再原子替换目标文件
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+def atomic_write_text(path, text, encoding='utf-8'):
+    """原子写入文本文件：写临时文件并fsync后用os.replace替换"""
+    path = Path(path)
+    temp_file = path.with_name(path.name + ".tmp")
+    with open(temp_file, 'w', encoding=encoding) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+    if os.name == "posix":
+        # 确保目录项（重命名）也落盘
+        try:
+            dir_fd = os.open(path.parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+class WriteBehindJSONFile:
+    """延迟合并写入的JSON文件
+
+    mark_dirty() 只记录有修改，第一次修改后delay秒内的修改合并为一次写入；
+    flush() 立即写入，进程退出时自动调用。所有写入串行执行。
+    get_data() 应返回数据的副本（在数据自己的锁内复制）。
+    """
+
+    def __init__(self, path, get_data, delay=0.5, indent=None):
+        self.path = Path(path)
+        self.get_data = get_data
+        self.delay = max(0.0, float(delay))
+        self.indent = indent
+
+        self._write_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._deadline = None  # 待写入时的写入时间点，None表示没有未写入的修改
+        self._thread = None
+        self.write_count = 0
+        atexit.register(self.flush)
+
+    def mark_dirty(self):
+        """记录数据已修改，在合并窗口结束时写入"""
+        with self._condition:
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.delay
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    @property
+    def dirty(self):
+        """是否有尚未写入的修改"""
+        with self._condition:
+            return self._deadline is not None
+
+    def _run(self):
+        """后台写入线程：等到合并窗口结束后写入"""
+        while True:
+            with self._condition:
+                while self._deadline is None:
+                    if not self._condition.wait(timeout=30):
+                        # 长时间没有修改，退出线程，下次修改时重新启动
+                        if self._deadline is None:
+                            self._thread = None
+                            return
+                wait = self._deadline - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(timeout=wait)
+                    continue
+            self.flush()
+
+    def _snapshot(self):
+        """序列化数据（get_data在自己的锁内返回副本，序列化时不会与其他线程的修改冲突）"""
+        return json.dumps(self.get_data(), indent=self.indent, ensure_ascii=False)
+
+    def flush(self):
+        """立即写入未保存的修改
+
+        Returns:
+            bool: 没有待写入的修改或写入成功时返回True
+        """
+        with self._write_lock:
+            with self._condition:
+                if self._deadline is None:
+                    return True
+                # 先清除标记，写入期间的新修改会重新安排一次写入
+                self._deadline = None
+            try:
+                self.path.parent.mkdir(exist_ok=True)
+                atomic_write_text(self.path, self._snapshot())
+                self.write_count += 1
+                return True
+            except (IOError, OSError, TypeError, ValueError) as e:
+                print(f"保存 {self.path.name} 失败: {e}")
+                with self._condition:
+                    if self._deadline is None:
+                        # 写入失败，稍后重试
+                        self._deadline = time.monotonic() + max(self.delay, 1.0)
+                        self._condition.notify()
+                return False
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch Claude Code项目索引
+按文件路径、修改时间和大小持久化会话元数据，刷新时只重新读取有变化的会话文件，
+各项目目录使用线程池并行扫描，扫描结果分批回调，并支持按目录增量更新。
+最后活动时间和最后使用的模型从文件末尾反向读取，读取量与文件大小无关。
+已归档的会话从归档的元数据副本读取，无需解压。
+"""
+
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+
+INDEX_VERSION = 2
+
+TAIL_CHUNK_SIZE = 64 * 1024      # 反向读取的块大小
+TAIL_MAX_BYTES = 1024 * 1024     # 单个文件最多读取的字节数（末尾元数据和消息计数）
+
+
+def read_session_metadata(session_file):
+    """读取会话文件开头的用户消息，返回{"cwd", "timestamp"}，无法识别时返回None"""
+    try:
+        with open(session_file, 'r', encoding='utf-8') as f:
+            first_line = f.readline().strip()
+            if not first_line:
+                return None
+            data = json.loads(first_line)
+            # 跳过summary行，找用户消息
+            if data.get('type') == 'summary':
+                second_line = f.readline().strip()
+                if not second_line:
+                    return None
+                data = json.loads(second_line)
+    except (json.JSONDecodeError, IOError, PermissionError, UnicodeDecodeError):
+        return None
+
+    if 'cwd' in data and 'timestamp' in data:
+        return {"cwd": data['cwd'], "timestamp": data['timestamp']}
+    return None
+
+
+def read_session_tail(session_file, chunk_size=TAIL_CHUNK_SIZE, max_bytes=TAIL_MAX_BYTES):
+    """从文件末尾按块反向读取，找出最后的时间戳和最后使用的模型
+
+    最多读取max_bytes字节，末尾未写完的行会被跳过。
+
+    Returns:
+        dict: {"last_timestamp", "last_model"}，读取失败返回None
+    """
+    result = {"last_timestamp": None, "last_model": None}
+    try:
+        with open(session_file, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            remainder = b""
+            scanned = 0
+            while pos > 0 and scanned < max_bytes:
+                size = min(chunk_size, pos)
+                pos -= size
+                f.seek(pos)
+                chunk = f.read(size) + remainder
+                scanned += size
+                lines = chunk.split(b"\n")
+                # 块开头的行可能不完整，拼到下一块继续处理
+                remainder = lines.pop(0) if pos > 0 else b""
+                for line in reversed(lines):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except (ValueError, UnicodeDecodeError):
+                        continue
+                    if not isinstance(data, dict):
+                        continue
+                    if result["last_timestamp"] is None and data.get("timestamp"):
+                        result["last_timestamp"] = data["timestamp"]
+                    message = data.get("message")
+                    if result["last_model"] is None and isinstance(message, dict):
+                        model = message.get("model")
+                        # 跳过Claude Code生成的合成消息
+                        if model and model != "<synthetic>":
+                            result["last_model"] = model
+                    if result["last_timestamp"] is not None and result["last_model"] is not None:
+                        break
+                else:
+                    continue
+                break
+    except (IOError, OSError):
+        return None
+    return result
+
+
+def count_lines(session_file, start, end, max_bytes=TAIL_MAX_BYTES):
+    """统计文件[start, end)区间的换行数
+
+    区间超过max_bytes时只统计末尾max_bytes字节并按比例估算。
+
+    Returns:
+        tuple: (行数, 是否为估算值)
+    """
+    sample_start = max(start, end - max_bytes)
+    count = 0
+    try:
+        with open(session_file, 'rb') as f:
+            f.seek(sample_start)
+            remaining = end - sample_start
+            while remaining > 0:
+                chunk = f.read(min(TAIL_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                count += chunk.count(b"\n")
+                remaining -= len(chunk)
+    except (IOError, OSError):
+        return 0, True
+
+    if sample_start == start:
+        return count, False
+    return int(round(count * (end - start) / (end - sample_start))), True
+
+
+def parse_timestamp(value):
+    """解析会话中的ISO时间戳"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class ProjectIndex:
+    """Claude Code项目的持久化增量索引"""
+
+    def __init__(self, projects_dir=None, index_file=None, archive=None):
+        claude_dir = Path.home() / ".claude"
+        self.archive = archive  # SessionArchive，为None时不读取归档
+        self.projects_dir = Path(projects_dir) if projects_dir else claude_dir / "projects"
+        self.index_file = Path(index_file) if index_file else claude_dir / "cc_apiswitch_project_index.json"
+        self._loaded = False
+        self._files = {}  # 会话文件路径 -> {"mtime", "size", "cwd", "timestamp", "last_timestamp", ...}
+        self._projects = {}  # 项目目录 -> 项目信息（最近一次扫描结果，供增量更新使用）
+        self._scanned = False  # 是否完成过完整扫描（之前的项目信息不完整）
+        self._lock = threading.Lock()
+        self.last_scan_stats = {}
+
+    def _load(self):
+        """加载持久化索引（只在首次使用时读取磁盘）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self._files = data.get("files", {})
+        except (json.JSONDecodeError, IOError, OSError, AttributeError):
+            pass
+
+    def _save(self):
+        """原子写入索引文件"""
+        try:
+            self.index_file.parent.mkdir(exist_ok=True)
+            temp_file = self.index_file.with_suffix(".tmp")
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"version": INDEX_VERSION, "files": self._files}, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+        except (IOError, OSError):
+            pass
+
+    def _session_entry(self, session_file, stat, previous=None):
+        """生成会话文件的索引条目
+
+        文件只是追加写入时沿用开头的元数据，只统计新增部分的行数；
+        首次遇到的大文件按末尾样本的行密度估算消息数。
+        """
+        size = stat.st_size
+        previous = previous or {}
+        appended = previous.get("message_count") is not None and 0 < previous["size"] <= size
+        if appended:
+            head = {"cwd": previous.get("cwd"), "timestamp": previous.get("timestamp")}
+        else:
+            head = read_session_metadata(session_file) or {}
+
+        tail = read_session_tail(session_file) or {}
+        start = previous["size"] if appended else 0
+        count, estimated = count_lines(session_file, start, size)
+        if appended:
+            count += previous["message_count"]
+            estimated = estimated or previous.get("count_estimated", False)
+
+        return {"mtime": stat.st_mtime, "size": size,
+                "cwd": head.get("cwd"), "timestamp": head.get("timestamp"),
+                "last_timestamp": tail.get("last_timestamp"), "last_model": tail.get("last_model"),
+                "message_count": count, "count_estimated": estimated}
+
+    def _scan_project(self, project_dir, known):
+        """扫描单个项目目录（在线程池中运行）
+
+        Returns:
+            tuple: (项目信息或None, 该目录下会话文件的索引条目, 重新解析的文件数)
+        """
+        entries = {}
+        parsed = 0
+        latest_time = None
+        project_path = None
+        last_model = None
+        message_count = 0
+        count_estimated = False
+
+        try:
+            with os.scandir(project_dir) as it:
+                session_files = [entry for entry in it if entry.name.endswith(".jsonl") and entry.is_file()]
+        except OSError:
+            return None, entries, parsed
+
+        for session_file in session_files:
+            try:
+                # Windows下DirEntry.stat()直接使用目录列举的结果，无需额外系统调用
+                stat = session_file.stat()
+            except OSError:
+                continue
+
+            entry = known.get(session_file.path)
+            if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                entry = self._session_entry(session_file.path, stat, entry)
+                parsed += 1
+            entries[session_file.path] = entry
+
+        sessions = list(entries.values())
+        archived_count = 0
+        if self.archive is not None:
+            # 已归档的会话（原文件仍存在时以原文件为准）
+            live_names = {os.path.basename(path) for path in entries}
+            archived = self.archive.load_metadata(os.path.basename(project_dir))
+            archived_sessions = [entry for name, entry in archived.items() if name not in live_names]
+            archived_count = len(archived_sessions)
+            sessions += archived_sessions
+
+        for entry in sessions:
+            if not entry.get("cwd") or not entry.get("timestamp"):
+                continue
+            message_count += entry.get("message_count") or 0
+            count_estimated = count_estimated or entry.get("count_estimated", False)
+            try:
+                # 按最后活动时间排序，没有末尾时间戳时退回会话开始时间
+                file_time = parse_timestamp(entry.get("last_timestamp") or entry["timestamp"])
+            except (ValueError, AttributeError):
+                continue
+            if latest_time is None or file_time > latest_time:
+                latest_time = file_time
+                project_path = entry["cwd"]
+                last_model = entry.get("last_model")
+
+        project = None
+        # 检查项目路径是否仍然存在
+        if project_path and latest_time and os.path.isdir(project_path):
+            project = {
+                'name': Path(project_path).name,
+                'path': project_path,
+                'last_access': latest_time,
+                'last_model': last_model,
+                'message_count': message_count,
+                'count_estimated': count_estimated,
+                'archived_count': archived_count
+            }
+        return project, entries, parsed
+
+    def _list_project_dirs(self):
+        """列出项目目录，按目录修改时间倒序（新会话会更新目录时间，最近的项目先扫描）"""
+        project_dirs = []
+        with os.scandir(self.projects_dir) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        project_dirs.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        project_dirs.sort(reverse=True)
+        return [path for _, path in project_dirs]
+
+    def get_projects(self, on_batch=None, max_workers=8, batch_interval=0.1, cancel_token=None):
+        """并行扫描项目目录，返回按最后访问时间倒序排列的项目列表
+
+        Args:
+            on_batch (callable): 扫描过程中分批回调 on_batch(projects)，便于界面逐步显示
+            max_workers (int): 扫描线程数
+            batch_interval (float): 分批回调的最小间隔（秒）
+            cancel_token (CancelToken): 取消后不再扫描剩余目录，只返回已扫描到的项目
+        """
+        projects = []
+        with self._lock:
+            self._load()
+            known = self._files
+            files = {}
+            parsed = 0
+            batch = []
+            last_flush = time.monotonic()
+
+            project_dirs = self._list_project_dirs()
+            with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="project-scan") as executor:
+                futures = {executor.submit(self._scan_project, project_dir, known): project_dir
+                           for project_dir in project_dirs}
+                # 取消时丢弃尚未开始的目录，只等待正在扫描的目录
+                unregister = (cancel_token.on_cancel(lambda: [future.cancel() for future in futures])
+                              if cancel_token is not None else lambda: None)
+                projects_by_dir = {}
+                for future in as_completed(futures):
+                    try:
+                        project, entries, changed = future.result()
+                    except Exception:
+                        # 扫描失败或被取消（CancelledError）的目录
+                        continue
+                    files.update(entries)
+                    parsed += changed
+                    if project is None:
+                        continue
+                    projects_by_dir[futures[future]] = project
+                    projects.append(project)
+                    batch.append(project)
+                    if on_batch and time.monotonic() - last_flush >= batch_interval:
+                        on_batch(sorted(batch, key=lambda x: x['last_access'], reverse=True))
+                        batch = []
+                        last_flush = time.monotonic()
+
+            unregister()
+            if cancel_token is not None and cancel_token.cancelled:
+                # 未扫描的目录不能当作已删除：只合并已扫描的结果
+                known.update(files)
+                if parsed:
+                    self._save()
+                projects.sort(key=lambda x: x['last_access'], reverse=True)
+                return projects
+
+            if on_batch and batch:
+                on_batch(sorted(batch, key=lambda x: x['last_access'], reverse=True))
+
+            removed = len([key for key in known if key not in files])
+            self._files = files
+            self._projects = projects_by_dir
+            self._scanned = True
+            if parsed or removed:
+                self._save()
+            self.last_scan_stats = {"files": len(files), "parsed": parsed, "removed": removed}
+
+        projects.sort(key=lambda x: x['last_access'], reverse=True)
+        return projects
+
+    def update_dirs(self, project_dirs):
+        """增量更新指定的项目目录（目录已删除时移除该项目）
+
+        还没有完成过完整扫描（例如首次扫描被取消）时项目列表不完整，总是报告没有变化。
+
+        Returns:
+            tuple: (项目列表是否变化, 按最后访问时间倒序排列的项目列表)
+        """
+        with self._lock:
+            self._load()
+            changed = False
+            parsed = 0
+            removed = 0
+            for project_dir in set(str(path) for path in project_dirs):
+                prefix = os.path.join(project_dir, "")
+                known = {key: entry for key, entry in self._files.items() if key.startswith(prefix)}
+                project, entries, count = self._scan_project(project_dir, known)
+                parsed += count
+
+                for key in known:
+                    if key not in entries:
+                        del self._files[key]
+                        removed += 1
+                self._files.update(entries)
+
+                if project != self._projects.get(project_dir):
+                    changed = True
+                    if project is None:
+                        self._projects.pop(project_dir, None)
+                    else:
+                        self._projects[project_dir] = project
+
+            if parsed or removed:
+                self._save()
+            self.last_scan_stats = {"files": len(self._files), "parsed": parsed, "removed": removed}
+            projects = sorted(self._projects.values(), key=lambda x: x['last_access'], reverse=True)
+            changed = changed and self._scanned
+        return changed, projects
+
+    def _walk_ms(self):
+        """遍历并stat所有会话文件的耗时（毫秒），用于衡量归档节省的扫描时间"""
+        start = time.perf_counter()
+        try:
+            for project_dir in self._list_project_dirs():
+                try:
+                    with os.scandir(project_dir) as it:
+                        for entry in it:
+                            if entry.name.endswith(".jsonl") and entry.is_file():
+                                entry.stat()
+                except OSError:
+                    continue
+        except OSError:
+            pass
+        return (time.perf_counter() - start) * 1000
+
+    def archive_old_sessions(self, max_age_seconds, cancel_token=None):
+        """把超过max_age_seconds未修改的会话压缩归档
+
+        cancel_token 取消后不再处理剩余的项目，已写入归档的会话照常完成校验和删除。
+
+        Returns:
+            dict: {"sessions", "original_bytes", "archived_bytes", "saved_bytes",
+                   "scan_ms_before", "scan_ms_after"}
+        """
+        stats = {"sessions": 0, "original_bytes": 0, "archived_bytes": 0}
+        if self.archive is None:
+            raise ValueError("未配置会话归档")
+
+        scan_ms_before = self._walk_ms()
+        try:
+            project_dirs = self._list_project_dirs()
+        except OSError:
+            project_dirs = []
+
+        for project_dir in project_dirs:
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            # 先更新索引，保证归档的元数据是最新的
+            self.update_dirs([project_dir])
+            prefix = os.path.join(project_dir, "")
+            with self._lock:
+                entries = {path: dict(entry) for path, entry in self._files.items() if path.startswith(prefix)}
+            try:
+                result = self.archive.archive_project(project_dir, entries, max_age_seconds,
+                                                      cancel_token=cancel_token)
+            except (IOError, OSError, zipfile.BadZipFile) as e:
+                print(f"归档项目 {project_dir} 失败: {e}")
+                continue
+            if result["sessions"]:
+                self.update_dirs([project_dir])
+            for key in stats:
+                stats[key] += result[key]
+
+        stats["saved_bytes"] = stats["original_bytes"] - stats["archived_bytes"]
+        return {**stats, "scan_ms_before": scan_ms_before, "scan_ms_after": self._walk_ms()}
+
+    def restore_archived_sessions(self, project_path=None, cancel_token=None):
+        """把已归档的会话恢复到原项目目录
+
+        Args:
+            project_path (str): 只恢复该项目（会话cwd）的会话，None表示全部
+            cancel_token (CancelToken): 取消后不再恢复剩余的项目
+
+        Returns:
+            int: 恢复的会话数
+        """
+        if self.archive is None:
+            raise ValueError("未配置会话归档")
+
+        by_project = {}
+        for project_name, session_name, entry in self.archive.iter_archived():
+            if project_path is None or entry.get("cwd") == project_path:
+                by_project.setdefault(project_name, []).append(session_name)
+
+        restored = 0
+        for project_name, session_names in by_project.items():
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            project_dir = str(self.projects_dir / project_name)
+            try:
+                restored += self.archive.restore_project(project_dir, session_names)
+            except (IOError, OSError, zipfile.BadZipFile) as e:
+                print(f"恢复项目 {project_dir} 的归档会话失败: {e}")
+                continue
+            self.update_dirs([project_dir])
+        return restored
+
+    def find_changed_dirs(self):
+        """只比较文件修改时间和大小，找出会话文件有增删改的项目目录（用于轮询）"""
+        with self._lock:
+            self._load()
+            changed = []
+            seen = set()
+            try:
+                project_dirs = self._list_project_dirs()
+            except OSError:
+                project_dirs = []
+
+            for project_dir in project_dirs:
+                dirty = False
+                try:
+                    with os.scandir(project_dir) as it:
+                        for entry in it:
+                            if not entry.name.endswith(".jsonl") or not entry.is_file():
+                                continue
+                            seen.add(entry.path)
+                            known = self._files.get(entry.path)
+                            if dirty:
+                                continue
+                            stat = entry.stat()
+                            if known is None or known["mtime"] != stat.st_mtime or known["size"] != stat.st_size:
+                                dirty = True
+                except OSError:
+                    dirty = True
+                if dirty:
+                    changed.append(project_dir)
+
+            # 会话文件被删除的目录（包括整个项目目录被删除）
+            for key in self._files:
+                if key not in seen:
+                    project_dir = os.path.dirname(key)
+                    if project_dir not in changed:
+                        changed.append(project_dir)
+        return changed
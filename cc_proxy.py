@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 本地故障转移代理
+Claude Code 指向本地代理后，切换配置无需重启Claude
+"""
+
+import functools
+import hmac
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from cc_http import abort_connection, get_pool_manager
+from cc_monitor import AutoSwitcher
+
+
+# 逐跳头部不转发
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+# 上游返回这些状态码时换下一个配置重试
+RETRY_STATUSES = {401, 403, 408, 429, 500, 502, 503, 504, 529}
+
+# 既没有代理记录的首字节时间样本、也没有测试记录时使用的对冲延迟（毫秒）
+DEFAULT_HEDGE_DELAY_MS = 1000
+
+
+class LoadBalancer:
+    """代理负载均衡
+
+    在默认模型相同的一组配置之间分配请求，支持以下策略:
+    active 只使用活跃配置（仅故障转移）、weighted_round_robin 平滑加权轮询（配置的weight字段）、
+    least_outstanding 最少进行中请求、ewma 按首字节时间的指数加权移动平均（乘以进行中请求数+1）。
+    """
+
+    POLICIES = ("active", "weighted_round_robin", "least_outstanding", "ewma")
+
+    def __init__(self, policy="active", ewma_alpha=0.3):
+        self.policy = policy if policy in self.POLICIES else "active"
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._current_weights = {}
+        self._outstanding = {}
+        self._ewma = {}
+        self._ttfb_samples = {}  # 配置名称 -> 最近的首字节时间样本
+
+    @staticmethod
+    def get_weight(config):
+        """配置权重，默认1"""
+        try:
+            return max(1, int(config.get("weight", 1)))
+        except (TypeError, ValueError):
+            return 1
+
+    def ewma_ms(self, config):
+        """配置的首字节时间EWMA，尚无代理数据时使用测试记录"""
+        with self._lock:
+            value = self._ewma.get(config["name"])
+        if value is None:
+            value = (config.get("latency") or {}).get("ttfb_ms")
+        return value if value is not None else 1000.0
+
+    def ttfb_percentile(self, name, percentile, min_samples=5):
+        """代理记录的首字节时间百分位数（毫秒），样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self._ttfb_samples.get(name, ()))
+        if len(samples) < min_samples:
+            return None
+        position = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[position]
+
+    def outstanding(self, name):
+        """配置进行中的请求数"""
+        with self._lock:
+            return self._outstanding.get(name, 0)
+
+    def choose(self, configs, indices):
+        """从候选组中按策略选出一个配置索引"""
+        if self.policy == "weighted_round_robin":
+            with self._lock:
+                total = 0
+                best = None
+                for index in indices:
+                    name = configs[index]["name"]
+                    weight = self.get_weight(configs[index])
+                    self._current_weights[name] = self._current_weights.get(name, 0) + weight
+                    total += weight
+                    if best is None or self._current_weights[name] > self._current_weights[configs[best]["name"]]:
+                        best = index
+                self._current_weights[configs[best]["name"]] -= total
+                return best
+
+        if self.policy == "least_outstanding":
+            return min(indices, key=lambda index: self.outstanding(configs[index]["name"]))
+
+        if self.policy == "ewma":
+            return min(indices, key=lambda index: self.ewma_ms(configs[index])
+                       * (self.outstanding(configs[index]["name"]) + 1))
+
+        return indices[0]
+
+    def acquire(self, name):
+        """请求开始"""
+        with self._lock:
+            self._outstanding[name] = self._outstanding.get(name, 0) + 1
+
+    def release(self, name, ttfb_ms=None, failed=False):
+        """请求结束，更新首字节时间EWMA；失败时加倍惩罚"""
+        with self._lock:
+            self._outstanding[name] = max(0, self._outstanding.get(name, 1) - 1)
+            previous = self._ewma.get(name)
+            if failed:
+                self._ewma[name] = max(1000.0, (previous or 0.0) * 2)
+            elif ttfb_ms is not None:
+                self._ttfb_samples.setdefault(name, deque(maxlen=200)).append(ttfb_ms)
+                if previous is None:
+                    self._ewma[name] = ttfb_ms
+                else:
+                    self._ewma[name] = previous + self.ewma_alpha * (ttfb_ms - previous)
+
+
+class _ProxyRequestHandler(BaseHTTPRequestHandler):
+    """本地代理请求处理器，所有方法都交给FailoverProxy处理"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "CC-APISwitch-Proxy"
+
+    def __init__(self, request, client_address, server, proxy):
+        # 父类构造函数会直接处理请求，需要先记下代理
+        self.proxy = proxy
+        super().__init__(request, client_address, server)
+
+    def do_GET(self):
+        self.proxy.handle(self)
+
+    do_POST = do_GET
+    do_PUT = do_GET
+    do_PATCH = do_GET
+    do_DELETE = do_GET
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FailoverProxy:
+    """本地故障转移反向代理
+
+    每个请求都按当前活跃配置转发（切换配置即时生效），上游连接失败或返回可重试状态码时，
+    在响应开始转发之前换下一个健康配置重试。SSE流式响应逐块透传。
+    只转发携带本地代理令牌（x-api-key 或 Authorization: Bearer）的请求，
+    避免本机其他程序或网页借代理使用真实的API令牌。
+    """
+
+    FAILED_STATUSES = ("失败", "错误", "超时")
+
+    def __init__(self, config_manager, host="127.0.0.1", port=15721, max_attempts=3,
+                 timeout=300, failure_cooldown=30, pool=None, balance_policy="active",
+                 hedge_enabled=False, hedge_percentile=95, hedge_budget=0.1, hedge_min_delay_ms=500,
+                 hedge_default_delay_ms=DEFAULT_HEDGE_DELAY_MS, cache=None, auth_token=None):
+        self.config_manager = config_manager
+        self.auth_token = auth_token or config_manager.get_proxy_token()
+        self.host = host
+        self.port = int(port)
+        self.max_attempts = max(1, int(max_attempts))
+        self.timeout = timeout
+        self.failure_cooldown = failure_cooldown
+        self.pool = pool or get_pool_manager()
+        self.balancer = LoadBalancer(balance_policy)
+
+        # 对冲请求：首选上游超过其首字节时间百分位仍未响应时，向下一个配置再发一次
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget  # 额外请求数占总请求数的上限比例
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_default_delay_ms = hedge_default_delay_ms
+        self._hedge_tokens = 1.0
+
+        # 可选的响应缓存（ResponseCache），只缓存确定性请求
+        self.cache = cache
+
+        self._server = None
+        self._thread = None
+        self._failures = {}  # 配置名称 -> 最近一次失败时间
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def running(self):
+        """代理是否在运行"""
+        return self._server is not None
+
+    @property
+    def url(self):
+        """代理地址（Claude的ANTHROPIC_BASE_URL）"""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """启动代理服务"""
+        if self.running:
+            return True, f"本地代理已在运行: {self.url}"
+        try:
+            handler_class = functools.partial(_ProxyRequestHandler, proxy=self)
+            server = ThreadingHTTPServer((self.host, self.port), handler_class)
+        except OSError as e:
+            return False, f"本地代理启动失败: {str(e)}"
+
+        server.daemon_threads = True
+        self.port = server.server_address[1]
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, name="failover-proxy", daemon=True)
+        self._thread.start()
+        return True, f"本地代理已启动: {self.url}"
+
+    def stop(self):
+        """停止代理服务"""
+        if self._server is None:
+            return
+        server, self._server = self._server, None
+        server.shutdown()
+        server.server_close()
+
+    def _mark_failure(self, config):
+        """记录配置失败，冷却期内排到候选列表末尾"""
+        with self._lock:
+            self._failures[config["name"]] = time.monotonic()
+            self.stats["retries"] += 1
+
+    def _in_cooldown(self, config):
+        """配置是否处于失败冷却期"""
+        with self._lock:
+            failed_at = self._failures.get(config["name"])
+        return failed_at is not None and time.monotonic() - failed_at < self.failure_cooldown
+
+    def candidate_indices(self, configs=None):
+        """按转发优先级返回候选配置在configs中的索引
+
+        活跃配置优先，其余健康配置按延迟排序；启用负载均衡时，
+        由均衡策略从与活跃配置默认模型相同的配置组中选出首选配置。
+        configs为同一次请求使用的配置快照，None时重新读取。
+        """
+        if configs is None:
+            configs = self.config_manager.get_all_configs()
+        active_name = self.config_manager.store.active_name
+
+        healthy = []
+        for index, config in enumerate(configs):
+            if config["name"] == active_name:
+                continue
+            if config.get("test_status") in self.FAILED_STATUSES:
+                continue
+            score = AutoSwitcher.score(config)
+            healthy.append((score is None, score or 0.0, index))
+        healthy.sort()
+        ordered = [index for _, _, index in healthy]
+
+        active_index = next((i for i, config in enumerate(configs) if config["name"] == active_name), None)
+        if active_index is not None:
+            ordered.insert(0, active_index)
+
+        # 冷却期内的配置排到最后（稳定排序保持原有顺序）
+        ordered.sort(key=lambda index: self._in_cooldown(configs[index]))
+
+        if self.balancer.policy != "active" and active_index is not None:
+            model = configs[active_index].get("default_model")
+            group = [index for index in ordered
+                     if configs[index].get("default_model") == model and not self._in_cooldown(configs[index])]
+            if len(group) > 1:
+                chosen = self.balancer.choose(configs, group)
+                ordered.remove(chosen)
+                ordered.insert(0, chosen)
+        return ordered
+
+    @staticmethod
+    def _read_body(handler):
+        """读取客户端请求体（支持Content-Length和chunked）"""
+        if handler.headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(handler.rfile.readline().split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # 跳过trailer直到空行
+                    while handler.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return body
+                body += handler.rfile.read(size)
+                handler.rfile.readline()
+        length = int(handler.headers.get("content-length") or 0)
+        return handler.rfile.read(length) if length else b""
+
+    @staticmethod
+    def _prepare_body(body, config, active_config):
+        """请求的是活跃配置的默认模型时，替换为目标配置的默认模型"""
+        if not body or active_config is None or config is active_config:
+            return body
+        try:
+            payload = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            return body
+        if isinstance(payload, dict) and payload.get("model") == active_config.get("default_model"):
+            payload["model"] = config.get("default_model", payload["model"])
+            return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        return body
+
+    @staticmethod
+    def _upstream_headers(handler, config):
+        """构造上游请求头，按客户端的认证方式注入配置的令牌"""
+        headers = {}
+        for key, value in handler.headers.items():
+            lower = key.lower()
+            if lower in HOP_BY_HOP_HEADERS or lower in ("x-api-key", "authorization", "accept-encoding"):
+                continue
+            headers[key] = value
+
+        token = config["ANTHROPIC_AUTH_TOKEN"]
+        if "authorization" in {key.lower() for key in handler.headers.keys()}:
+            headers["Authorization"] = f"Bearer {token}"
+        else:
+            headers["x-api-key"] = token
+        # 统一使用未压缩响应，便于SSE逐块透传
+        headers["Accept-Encoding"] = "identity"
+        return headers
+
+    def _send_upstream(self, handler, config, body, active_config, on_connection=None):
+        """向单个上游配置发送请求"""
+        url = f"{config['ANTHROPIC_BASE_URL'].rstrip('/')}{handler.path}"
+        return self.pool.request(handler.command, url,
+                                 body=self._prepare_body(body, config, active_config),
+                                 headers=self._upstream_headers(handler, config),
+                                 timeout=self.timeout, on_connection=on_connection,
+                                 allow_redirects=False)
+
+    def hedge_delay_ms(self, config):
+        """对冲延迟：代理记录的首字节时间百分位，样本不足时使用最近一次测试记录的首字节时间，
+        都没有时使用 hedge_default_delay_ms"""
+        delay = self.balancer.ttfb_percentile(config["name"], self.hedge_percentile)
+        if delay is None:
+            delay = (config.get("latency") or {}).get("ttfb_ms") or self.hedge_default_delay_ms
+        return max(float(self.hedge_min_delay_ms), float(delay))
+
+    def _take_hedge_token(self):
+        """按预算取得一次对冲机会"""
+        with self._lock:
+            if self._hedge_tokens >= 1.0:
+                self._hedge_tokens -= 1.0
+                self.stats["hedges"] += 1
+                return True
+            return False
+
+    def _launch_attempt(self, handler, config, body, active_config, results):
+        """在后台线程中向上游发起一次请求，结果放入results队列"""
+        attempt = {"config": config, "conn": None, "cancelled": False, "lock": threading.Lock()}
+
+        def on_connection(conn):
+            with attempt["lock"]:
+                attempt["conn"] = conn
+                cancelled = attempt["cancelled"]
+            if cancelled:
+                abort_connection(conn)
+
+        def run():
+            name = config["name"]
+            self.balancer.acquire(name)
+            try:
+                response = self._send_upstream(handler, config, body, active_config, on_connection)
+            except Exception as e:
+                with attempt["lock"]:
+                    cancelled = attempt["cancelled"]
+                    if not cancelled:
+                        results.put((attempt, None, e))
+                self.balancer.release(name, failed=not cancelled)
+                return
+            with attempt["lock"]:
+                if not attempt["cancelled"]:
+                    results.put((attempt, response, None))
+                    return
+            # 已被取消（另一个请求胜出）
+            response.close()
+            self.balancer.release(name)
+
+        threading.Thread(target=run, name="proxy-attempt", daemon=True).start()
+        return attempt
+
+    @staticmethod
+    def _cancel_attempt(attempt):
+        """取消一次后台请求并中止其连接"""
+        with attempt["lock"]:
+            attempt["cancelled"] = True
+            conn = attempt["conn"]
+        if conn is not None:
+            abort_connection(conn)
+
+    def _hedged_request(self, handler, configs, candidates, body, active_config):
+        """对冲请求：首选配置超时未返回首字节时向第二个配置再发一次，先响应者胜出
+
+        Returns:
+            tuple: ((响应, 配置) 或 None, 已尝试的索引集合, 最后的错误,
+                    最后一个可重试状态码的 (响应, 配置) 或 None)
+        """
+        results = queue.Queue()
+        primary_index, hedge_index = candidates[0], candidates[1]
+        pending = [self._launch_attempt(handler, configs[primary_index], body, active_config, results)]
+        tried = {primary_index}
+        delay = self.hedge_delay_ms(configs[primary_index]) / 1000
+        hedged = False
+        winner = None
+        last_error = ""
+        last_response = None  # 没有其他候选时转发给客户端，与普通故障转移一致
+
+        while pending:
+            try:
+                attempt, response, error = results.get(timeout=None if hedged else delay)
+            except queue.Empty:
+                hedged = True
+                if self._take_hedge_token():
+                    tried.add(hedge_index)
+                    pending.append(self._launch_attempt(handler, configs[hedge_index], body, active_config, results))
+                continue
+
+            pending.remove(attempt)
+            config = attempt["config"]
+            if error is None and response.status_code not in RETRY_STATUSES:
+                winner = (response, config)
+                if config is not configs[primary_index]:
+                    with self._lock:
+                        self.stats["hedge_wins"] += 1
+                break
+
+            if error is None:
+                if last_response is not None:
+                    last_response[0].close()
+                last_response = (response, config)
+                self.balancer.release(config["name"], failed=True)
+                last_error = f"{config['name']}: HTTP {response.status_code}"
+            else:
+                last_error = f"{config['name']}: {str(error)}"
+            self._mark_failure(config)
+            if not hedged:
+                # 首选配置在对冲延迟内直接失败，交给普通故障转移流程
+                break
+
+        for attempt in pending:
+            self._cancel_attempt(attempt)
+        # 取消前已经放入队列的响应也要关闭
+        while True:
+            try:
+                attempt, response, _ = results.get_nowait()
+            except queue.Empty:
+                break
+            if response is not None:
+                response.close()
+                self.balancer.release(attempt["config"]["name"])
+
+        return winner, tried, last_error, last_response
+
+    def _authorized(self, handler):
+        """客户端是否携带了本地代理令牌"""
+        token = handler.headers.get("x-api-key")
+        if token is None:
+            scheme, _, credentials = (handler.headers.get("authorization") or "").partition(" ")
+            token = credentials.strip() if scheme.lower() == "bearer" else None
+        return token is not None and hmac.compare_digest(token.encode('utf-8'), self.auth_token.encode('utf-8'))
+
+    def handle(self, handler):
+        """转发一个客户端请求，失败时按候选顺序重试"""
+        with self._lock:
+            self.stats["requests"] += 1
+
+        if not self._authorized(handler):
+            # 不读取请求体，直接关闭连接
+            handler.close_connection = True
+            self._send_error(handler, 401, "authentication_error", "本地代理令牌无效")
+            return
+
+        try:
+            body = self._read_body(handler)
+        except (ValueError, OSError):
+            self._send_error(handler, 400, "invalid_request_error", "无法读取请求体")
+            return
+
+        # 缓存可能在请求处理中被界面开关替换，整个请求使用同一个缓存对象
+        cache = self.cache
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(handler.command, handler.path, body)
+            cached = cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                self._replay_cached(handler, *cached)
+                return
+
+        configs = self.config_manager.get_all_configs()
+        candidates = self.candidate_indices(configs)[:self.max_attempts]
+        if not candidates:
+            self._send_error(handler, 503, "api_error", "没有可用的API配置")
+            return
+
+        active_name = self.config_manager.store.active_name
+        active_config = next((config for config in configs if config["name"] == active_name), None)
+
+        with self._lock:
+            self._hedge_tokens = min(3.0, self._hedge_tokens + self.hedge_budget)
+
+        last_error = ""
+        if self.hedge_enabled and len(candidates) > 1:
+            winner, tried, last_error, last_response = self._hedged_request(
+                handler, configs, candidates, body, active_config)
+            if winner is not None:
+                response, config = winner
+                try:
+                    self._relay_response(handler, response, config, cache, cache_key)
+                finally:
+                    self.balancer.release(config["name"], ttfb_ms=response.timings.get("ttfb_ms"))
+                return
+            candidates = [index for index in candidates if index not in tried]
+            if last_response is not None:
+                if not candidates:
+                    # 候选都已失败：转发最后一个上游响应（负载均衡计数已在对冲中释放）
+                    self._relay_response(handler, *last_response)
+                    return
+                last_response[0].close()
+
+        for attempt, index in enumerate(candidates):
+            config = configs[index]
+            self.balancer.acquire(config["name"])
+            try:
+                response = self._send_upstream(handler, config, body, active_config)
+            except Exception as e:
+                self.balancer.release(config["name"], failed=True)
+                self._mark_failure(config)
+                last_error = f"{config['name']}: {str(e)}"
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt + 1 < len(candidates):
+                response.close()
+                self.balancer.release(config["name"], failed=True)
+                self._mark_failure(config)
+                last_error = f"{config['name']}: HTTP {response.status_code}"
+                continue
+
+            try:
+                self._relay_response(handler, response, config, cache, cache_key)
+            finally:
+                self.balancer.release(config["name"], ttfb_ms=response.timings.get("ttfb_ms"))
+            return
+
+        with self._lock:
+            self.stats["errors"] += 1
+        self._send_error(handler, 502, "api_error", f"所有上游配置均请求失败: {last_error}")
+
+    @staticmethod
+    def _relay_response(handler, response, config, cache=None, cache_key=None):
+        """把上游响应（包括SSE流）逐块转发给客户端，成功的可缓存响应同时写入缓存"""
+        handler.send_response(response.status_code, response.reason)
+        for key, value in response.header_items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                handler.send_header(key, value)
+        handler.send_header("X-CC-APISwitch-Config", quote(config["name"]))
+
+        length = response.headers.get("content-length")
+        # 1xx、204、304和HEAD请求的响应没有响应体，不能加分块编码
+        has_body = (handler.command != "HEAD" and response.status_code >= 200
+                    and response.status_code not in (204, 304))
+        chunked = has_body and length is None
+        if chunked:
+            handler.send_header("Transfer-Encoding", "chunked")
+        elif length is not None and response.status_code != 204:
+            handler.send_header("Content-Length", length)
+        handler.end_headers()
+        if not has_body:
+            handler.wfile.flush()
+            response.close()
+            return
+
+        captured = [] if cache is not None and cache_key and response.status_code == 200 else None
+        try:
+            for chunk in response.iter_chunks():
+                if captured is not None:
+                    captured.append(chunk)
+                if chunked:
+                    handler.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                else:
+                    handler.wfile.write(chunk)
+                handler.wfile.flush()
+            if chunked:
+                handler.wfile.write(b"0\r\n\r\n")
+                handler.wfile.flush()
+        except OSError:
+            # 客户端断开或上游中断：放弃上游连接并关闭客户端连接
+            response.close()
+            handler.close_connection = True
+            return
+
+        if cache is not None and captured is not None:
+            headers = {key.lower(): value for key, value in response.headers.items()
+                       if key.lower() not in HOP_BY_HOP_HEADERS}
+            cache.put(cache_key, response.status_code, headers, b"".join(captured))
+
+    @staticmethod
+    def _replay_cached(handler, status, headers, data):
+        """回放缓存的响应，SSE响应按原始事件帧逐个发送"""
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.send_header("X-CC-APISwitch-Cache", "HIT")
+
+        try:
+            if "text/event-stream" in headers.get("content-type", ""):
+                handler.send_header("Transfer-Encoding", "chunked")
+                handler.end_headers()
+                events = data.split(b"\n\n")
+                for position, event in enumerate(events):
+                    frame = event + b"\n\n" if position < len(events) - 1 else event
+                    if frame:
+                        handler.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+                handler.wfile.write(b"0\r\n\r\n")
+            else:
+                handler.send_header("Content-Length", str(len(data)))
+                handler.end_headers()
+                handler.wfile.write(data)
+            handler.wfile.flush()
+        except OSError:
+            handler.close_connection = True
+
+    @staticmethod
+    def _send_error(handler, status, error_type, message):
+        """按Anthropic API错误格式返回错误"""
+        body = json.dumps({"type": "error", "error": {"type": error_type, "message": message}},
+                          ensure_ascii=False).encode('utf-8')
+        try:
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        except OSError:
+            handler.close_connection = True
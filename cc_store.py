@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 配置存储
+线程安全的配置存储，每个配置有稳定的id，按id和名称O(1)查找
+"""
+
+import threading
+import uuid
+
+
+class ConfigStore:
+    """线程安全的配置存储
+
+    配置以字典保存在配置文件数据的"configs"列表中（保持原有JSON格式），每个配置增加"id"字段。
+    所有读写都在锁内完成：读取返回配置的副本，修改只能通过本类的方法进行，
+    因此后台测试、监控和代理在列表重排或删除时仍能按id把结果写回正确的配置。
+    """
+
+    def __init__(self, data, on_change=None):
+        """
+        Args:
+            data (dict): 配置文件数据 {"configs", "active_config", "settings", ...}
+            on_change (callable): 数据修改后回调（用于保存文件）
+        """
+        self._data = data
+        self._data.setdefault("configs", [])
+        self._data.setdefault("settings", {})
+        self.on_change = on_change
+        self._lock = threading.RLock()
+
+        self._by_id = {}      # id -> 配置字典
+        self._by_name = {}    # 名称 -> id
+        self._positions = {}  # id -> 列表位置
+        changed = False
+        with self._lock:
+            for config in self._data["configs"]:
+                if not config.get("id") or config["id"] in self._by_id:
+                    config["id"] = self._new_id()
+                    changed = True
+                self._by_id[config["id"]] = config
+            self._reindex()
+        if changed:
+            self._notify()
+
+    def _new_id(self):
+        """生成新的配置id（调用方持有锁）"""
+        while True:
+            config_id = uuid.uuid4().hex[:12]
+            if config_id not in self._by_id:
+                return config_id
+
+    def _reindex(self):
+        """重建名称和位置索引（调用方持有锁，只在增删、改名和重排时调用）"""
+        configs = self._data["configs"]
+        self._by_name = {config["name"]: config["id"] for config in configs}
+        self._positions = {config["id"]: position for position, config in enumerate(configs)}
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change()
+
+    def to_json_data(self):
+        """用于保存文件的数据副本"""
+        with self._lock:
+            data = dict(self._data)
+            data["configs"] = [dict(config) for config in self._data["configs"]]
+            data["settings"] = dict(self._data["settings"])
+            return data
+
+    # ---- 读取 ----
+
+    def snapshot(self):
+        """按显示顺序返回所有配置的副本"""
+        with self._lock:
+            return [dict(config) for config in self._data["configs"]]
+
+    def ids(self):
+        """按显示顺序返回所有配置id"""
+        with self._lock:
+            return [config["id"] for config in self._data["configs"]]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data["configs"])
+
+    def get(self, config_id):
+        """按id获取配置副本，不存在时返回None"""
+        with self._lock:
+            config = self._by_id.get(config_id)
+            return dict(config) if config is not None else None
+
+    def find_id(self, name):
+        """按名称查找配置id，不存在时返回None"""
+        with self._lock:
+            return self._by_name.get(name)
+
+    def index_of(self, config_id):
+        """配置在列表中的位置，不存在时返回-1"""
+        with self._lock:
+            return self._positions.get(config_id, -1)
+
+    @property
+    def active_name(self):
+        """活跃配置名称"""
+        with self._lock:
+            return self._data.get("active_config")
+
+    @property
+    def active_id(self):
+        """活跃配置id，没有时返回None"""
+        with self._lock:
+            return self._by_name.get(self._data.get("active_config"))
+
+    def get_setting(self, key, default=None):
+        """读取设置项"""
+        with self._lock:
+            return self._data["settings"].get(key, default)
+
+    # ---- 修改 ----
+
+    def set_setting(self, key, value):
+        """保存设置项"""
+        with self._lock:
+            self._data["settings"][key] = value
+        self._notify()
+
+    def set_active(self, config_id):
+        """设置活跃配置，返回是否发生变化"""
+        with self._lock:
+            config = self._by_id.get(config_id)
+            name = config["name"] if config is not None else None
+            changed = self._data.get("active_config") != name
+            self._data["active_config"] = name
+        if changed:
+            self._notify()
+        return changed
+
+    def add(self, fields):
+        """添加配置，返回(success, message, id)"""
+        with self._lock:
+            if fields["name"] in self._by_name:
+                return False, "名称已存在", None
+            config = dict(fields)
+            config["id"] = self._new_id()
+            self._data["configs"].append(config)
+            self._by_id[config["id"]] = config
+            self._by_name[config["name"]] = config["id"]
+            self._positions[config["id"]] = len(self._data["configs"]) - 1
+        self._notify()
+        return True, "配置添加成功", config["id"]
+
+    def update(self, config_id, fields):
+        """更新配置字段，返回(success, message)
+
+        改名时检查名称冲突，并同步更新活跃配置名称。
+        """
+        with self._lock:
+            config = self._by_id.get(config_id)
+            if config is None:
+                return False, "配置不存在"
+            name = fields.get("name", config["name"])
+            if name != config["name"]:
+                if self._by_name.get(name, config_id) != config_id:
+                    return False, "名称已存在"
+                if self._data.get("active_config") == config["name"]:
+                    self._data["active_config"] = name
+                del self._by_name[config["name"]]
+                self._by_name[name] = config_id
+            config.update(fields)
+            config["id"] = config_id
+        self._notify()
+        return True, "配置更新成功"
+
+    def delete(self, config_ids):
+        """删除配置，返回删除的配置名称列表"""
+        config_ids = set(config_ids)
+        with self._lock:
+            removed = [config for config in self._data["configs"] if config["id"] in config_ids]
+            if not removed:
+                return []
+            self._data["configs"] = [config for config in self._data["configs"] if config["id"] not in config_ids]
+            for config in removed:
+                del self._by_id[config["id"]]
+                if self._data.get("active_config") == config["name"]:
+                    self._data["active_config"] = None
+            self._reindex()
+        self._notify()
+        return [config["name"] for config in removed]
+
+    def move(self, config_ids, offset):
+        """把选中的配置整体上移(offset=-1)或下移(offset=1)一位，返回移动的配置名称列表"""
+        config_ids = set(config_ids)
+        with self._lock:
+            configs = self._data["configs"]
+            positions = [i for i, config in enumerate(configs) if config["id"] in config_ids]
+            # 上移从前往后、下移从后往前处理，已到边界的配置保持不动
+            moved = []
+            for i in (positions if offset < 0 else reversed(positions)):
+                target = i + offset
+                if 0 <= target < len(configs) and configs[target]["id"] not in config_ids:
+                    configs[i], configs[target] = configs[target], configs[i]
+                    moved.append(configs[target]["name"])
+            if not moved:
+                return []
+            self._reindex()
+        self._notify()
+        return moved
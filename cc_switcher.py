@@ -5,437 +5,287 @@ CC-APISwitch v1.2
 专业的Claude API配置切换管理工具，支持项目快速启动
 """
 
+import time
+
+# 尽早记录启动时间，启动耗时统计包含导入wx的时间
+STARTUP_BEGIN = time.perf_counter()
+
 import wx
 import wx.adv
 import os
-import json
+import multiprocessing
 import shutil
-import winreg
-import requests
-import threading
-import time
 import glob
 from pathlib import Path
-from datetime import datetime
-
-
-class SimpleConfigManager:
-    """API配置管理器"""
-
-    def __init__(self):
-        self.claude_dir = Path.home() / ".claude"
-        self.settings_file = self.claude_dir / "settings.json"
-
-        # 优先使用新的配置文件名，如果不存在则尝试旧文件名
-        self.configs_file = self.claude_dir / "cc_apiswitch_configs.json"
-        old_configs_file = self.claude_dir / "cc_switcher_configs.json"
-
-        # 如果新文件不存在但旧文件存在，则迁移配置
-        if not self.configs_file.exists() and old_configs_file.exists():
-            import shutil
-            try:
-                shutil.copy2(old_configs_file, self.configs_file)
-                print(f"已迁移配置文件: {old_configs_file} -> {self.configs_file}")
-            except Exception as e:
-                print(f"迁移配置文件失败: {e}")
-                # 如果迁移失败，继续使用旧文件
-                self.configs_file = old_configs_file
-
-        self.configs_data = self.load_configs_data()
-
-    def load_configs_data(self):
-        """从JSON文件加载配置"""
-        default_data = {"configs": [], "active_config": None, "version": "1.0"}
-
-        if not self.configs_file.exists():
-            return default_data
-
-        try:
-            with open(self.configs_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for key in default_data:
-                    if key not in data:
-                        data[key] = default_data[key]
-                return data
-        except (json.JSONDecodeError, IOError):
-            return default_data
-
-    def save_configs_data(self):
-        """保存配置到JSON文件"""
-        try:
-            self.claude_dir.mkdir(exist_ok=True)
-            with open(self.configs_file, 'w', encoding='utf-8') as f:
-                json.dump(self.configs_data, f, indent=2, ensure_ascii=False)
-        except (IOError, OSError):
-            pass
-
-    def get_all_configs(self):
-        """获取所有配置"""
-        return self.configs_data["configs"]
-
-    def add_config(self, name, base_url, auth_token, model, note=""):
-        """添加新配置"""
-        for config in self.configs_data["configs"]:
-            if config["name"] == name:
-                return False, "名称已存在"
-
-        new_config = {
-            "name": name,
-            "ANTHROPIC_BASE_URL": base_url,
-            "ANTHROPIC_AUTH_TOKEN": auth_token,
-            "default_model": model,
-            "note": note,
-            "test_status": "未测试",
-            "test_time": "",
-            "test_message": ""
-        }
-
-        self.configs_data["configs"].append(new_config)
-        self.save_configs_data()
-        return True, "配置添加成功"
-
-    def update_config(self, index, name, base_url, auth_token, model, note=""):
-        """更新配置"""
-        if index < 0 or index >= len(self.configs_data["configs"]):
-            return False, "无效的配置索引"
-
-        # 检查名称冲突
-        for i, config in enumerate(self.configs_data["configs"]):
-            if i != index and config["name"] == name:
-                return False, "名称已存在"
-
-        config = self.configs_data["configs"][index]
-        config.update({
-            "name": name,
-            "ANTHROPIC_BASE_URL": base_url,
-            "ANTHROPIC_AUTH_TOKEN": auth_token,
-            "default_model": model,
-            "note": note
-        })
-
-        self.save_configs_data()
-        return True, "配置更新成功"
-
-    def delete_config(self, index):
-        """删除配置"""
-        if index < 0 or index >= len(self.configs_data["configs"]):
-            return False, "无效的配置索引"
-
-        config_name = self.configs_data["configs"][index]["name"]
-        del self.configs_data["configs"][index]
-
-        if self.configs_data["active_config"] == config_name:
-            self.configs_data["active_config"] = None
-
-        self.save_configs_data()
-        return True, "配置删除成功"
-
-    def switch_config(self, index):
-        """切换配置"""
-        if index < 0 or index >= len(self.configs_data["configs"]):
-            return False, "无效的配置索引"
-
-        config = self.configs_data["configs"][index]
-
-        try:
-            settings_content = {
-                "ANTHROPIC_BASE_URL": config["ANTHROPIC_BASE_URL"],
-                "ANTHROPIC_AUTH_TOKEN": config["ANTHROPIC_AUTH_TOKEN"],
-                "default_model": config["default_model"]
-            }
-
-            self.claude_dir.mkdir(exist_ok=True)
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings_content, f, indent=2)
-
-            self.configs_data["active_config"] = config["name"]
-            self.save_configs_data()
-
-            return True, f"已切换到配置 {config['name']}"
-        except Exception as e:
-            return False, f"切换失败: {str(e)}"
-
-    def set_environment_variables(self, index, scope="user"):
-        """设置环境变量"""
-        if index < 0 or index >= len(self.configs_data["configs"]):
-            return False, "无效的配置索引"
-
-        config = self.configs_data["configs"][index]
-
-        try:
-            base_url = config["ANTHROPIC_BASE_URL"]
-            auth_token = config["ANTHROPIC_AUTH_TOKEN"]
-            model = config.get("default_model", "claude-sonnet-4-20250514")
-
-            # 设置当前进程环境变量
-            os.environ["ANTHROPIC_BASE_URL"] = base_url
-            os.environ["ANTHROPIC_AUTH_TOKEN"] = auth_token
-            os.environ["ANTHROPIC_MODEL"] = model
-
-            # 根据scope选择注册表位置
-            if scope == "system":
-                # 系统环境变量需要管理员权限
-                try:
-                    key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, "SYSTEM\\CurrentControlSet\\Control\\Session Manager\\Environment", 0, winreg.KEY_ALL_ACCESS)
-                    scope_name = "系统"
-                except PermissionError:
-                    return False, "设置系统环境变量需要管理员权限，请以管理员身份运行程序"
-            else:
-                # 用户环境变量
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_ALL_ACCESS)
-                scope_name = "用户"
-
-            # 设置注册表环境变量
-            winreg.SetValueEx(key, "ANTHROPIC_BASE_URL", 0, winreg.REG_SZ, base_url)
-            winreg.SetValueEx(key, "ANTHROPIC_AUTH_TOKEN", 0, winreg.REG_SZ, auth_token)
-            winreg.SetValueEx(key, "ANTHROPIC_MODEL", 0, winreg.REG_SZ, model)
-            winreg.CloseKey(key)
-
-            # 通知系统环境变量已更改
-            import ctypes
-            HWND_BROADCAST = 0xFFFF
-            WM_SETTINGCHANGE = 0x1A
-            SMTO_ABORTIFHUNG = 0x0002
-            result = ctypes.c_long()
-            ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, ctypes.byref(result))
-
-            return True, f"{scope_name}环境变量已设置为: {config['name']}"
-        except Exception as e:
-            return False, f"设置失败: {str(e)}"
-
-    def test_config(self, index, question="1+2=?"):
-        """测试单个配置"""
-        if index < 0 or index >= len(self.configs_data["configs"]):
-            return False, "无效的配置索引", {}
-
-        config = self.configs_data["configs"][index]
-
-        try:
-            headers = {
-                "content-type": "application/json",
-                "anthropic-version": "2023-06-01",
-                "x-api-key": config["ANTHROPIC_AUTH_TOKEN"],
-                "user-agent": "claude-cli/1.0.115 (external, cli)"
-            }
-
-            data = {
-                "model": config["default_model"],
-                "max_tokens": 100,
-                "messages": [{"role": "user", "content": question}]
-            }
-
-            url = f"{config['ANTHROPIC_BASE_URL'].rstrip('/')}/v1/messages"
-            response = requests.post(url, json=data, headers=headers, timeout=10)
-
-            current_time = time.strftime("%H:%M:%S")
-
-            if response.status_code == 200:
-                response_data = response.json()
-                answer = response_data.get("content", [{}])[0].get("text", "")
-
-                config.update({
-                    "test_status": "通过",
-                    "test_time": current_time,
-                    "test_message": f"Q:{question} A:{answer[:30]}..."
-                })
-                self.save_configs_data()
-                return True, "测试成功", {"answer": answer}
-
-            else:
-                error_msg = f"HTTP {response.status_code}"
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get("error", {}).get("message", error_msg)
-                except:
-                    pass
-
-                config.update({
-                    "test_status": "失败",
-                    "test_time": current_time,
-                    "test_message": error_msg
-                })
-                self.save_configs_data()
-                return False, error_msg, {}
-
-        except requests.exceptions.Timeout:
-            config.update({
-                "test_status": "超时",
-                "test_time": time.strftime("%H:%M:%S"),
-                "test_message": "请求超时"
-            })
-            self.save_configs_data()
-            return False, "请求超时", {}
-
-        except Exception as e:
-            config.update({
-                "test_status": "错误",
-                "test_time": time.strftime("%H:%M:%S"),
-                "test_message": str(e)
-            })
-            self.save_configs_data()
-            return False, f"测试失败: {str(e)}", {}
-
-    def get_current_claude_config(self):
-        """获取当前claude配置"""
-        try:
-            if self.settings_file.exists():
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-        return {}
-
-    def get_system_env_config(self):
-        """获取系统环境变量配置"""
-        env_config = {}
-        try:
-            env_config['ANTHROPIC_BASE_URL'] = os.environ.get('ANTHROPIC_BASE_URL', '')
-            env_config['ANTHROPIC_AUTH_TOKEN'] = os.environ.get('ANTHROPIC_AUTH_TOKEN', '')
-            env_config['ANTHROPIC_MODEL'] = os.environ.get('ANTHROPIC_MODEL', '')
-        except:
-            pass
-        return env_config
-
-    def get_available_models(self):
-        """获取可用模型列表 - 从配置文件读取"""
-        try:
-            # 获取当前脚本所在目录
-            current_dir = Path(__file__).parent.absolute()
-            models_config_file = current_dir / "models_config.json"
-
-            # 尝试读取模型配置文件
-            if models_config_file.exists():
-                with open(models_config_file, 'r', encoding='utf-8') as f:
-                    models_config = json.load(f)
-
-                # 提取所有模型到一个扁平列表
-                all_models = []
-                for category in models_config.get("models", []):
-                    all_models.extend(category.get("models", []))
-
-                return all_models
-        except Exception as e:
-            print(f"读取模型配置文件失败: {e}")
-
-        # 如果读取失败，返回默认模型列表
-        return [
-            # Claude 4系列模型
-            "claude-4-sonnet",
-            "claude-sonnet-4-20250514",
-
-            # Claude 3.5系列模型
-            "claude-3-5-sonnet",
-            "claude-3-5-haiku",
-
-            # DeepSeek系列模型
-            "deepseek-v3",
-            "deepseek-chat",
-
-            # 其他常用模型
-            "gpt-4o",
-            "gemini-1.5-pro",
-
-            # 简化名称模型
-            "claude-sonnet",
-            "claude-haiku"
-        ]
-
-    def get_claude_code_projects(self):
-        """获取Claude Code最近的项目列表"""
-        projects = []
-
-        try:
-            claude_projects_dir = Path.home() / ".claude" / "projects"
-
-            if not claude_projects_dir.exists():
-                return projects
-
-            # 检查读取权限
-            if not os.access(claude_projects_dir, os.R_OK):
-                print("没有权限访问Claude项目目录")
-                return projects
-
-            # 遍历所有项目目录
-            for project_dir in claude_projects_dir.iterdir():
-                if not project_dir.is_dir() or project_dir.name.startswith('.'):
-                    continue
-
-                try:
-                    # 获取项目名称（解码目录名）
-                    project_name = project_dir.name.replace("D--", "D:\\").replace("-", "\\")
-
-                    # 查找最新的会话文件来获取最后访问时间
-                    jsonl_files = list(project_dir.glob("*.jsonl"))
-                    if not jsonl_files:
-                        continue
-
-                    latest_time = None
-                    project_path = None
-
-                    # 遍历jsonl文件找到最新的和项目路径
-                    for jsonl_file in jsonl_files:
-                        try:
-                            # 检查文件权限
-                            if not os.access(jsonl_file, os.R_OK):
-                                continue
-
-                            with open(jsonl_file, 'r', encoding='utf-8') as f:
-                                first_line = f.readline().strip()
-                                if first_line:
-                                    data = json.loads(first_line)
-                                    # 跳过summary行，找用户消息
-                                    if data.get('type') == 'summary':
-                                        second_line = f.readline().strip()
-                                        if second_line:
-                                            data = json.loads(second_line)
-
-                                    if 'cwd' in data and 'timestamp' in data:
-                                        file_time = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
-                                        if latest_time is None or file_time > latest_time:
-                                            latest_time = file_time
-                                            project_path = data['cwd']
-                        except (json.JSONDecodeError, IOError, KeyError, PermissionError) as e:
-                            continue
-
-                    if project_path and latest_time:
-                        # 检查项目路径是否仍然存在且有访问权限
-                        try:
-                            project_path_obj = Path(project_path)
-                            if project_path_obj.exists() and os.access(project_path_obj, os.R_OK):
-                                projects.append({
-                                    'name': project_path_obj.name,
-                                    'path': project_path,
-                                    'last_access': latest_time
-                                })
-                        except (OSError, PermissionError):
-                            continue
-
-                except (OSError, PermissionError) as e:
-                    continue
-
-            # 按最后访问时间排序（最新的在前）
-            projects.sort(key=lambda x: x['last_access'], reverse=True)
-
-        except (PermissionError, OSError) as e:
-            print(f"访问Claude目录时权限不足: {e}")
-        except Exception as e:
-            print(f"获取项目列表时出错: {e}")
-
-        return projects
+from cc_config import SimpleConfigManager
+from cc_dispatch import UIUpdateDispatcher
+from cc_jobs import JobManager
+# 测试、监控、代理、缓存和项目监视模块（含网络和ctypes）在第一次使用时导入
+
+class ConfigListCtrl(wx.ListCtrl):
+    """虚拟模式的配置列表
+
+    行内容由 OnGetItemText/OnGetItemAttr 从缓存的行数据读取，
+    set_rows 与上一次的行数据比较，只重绘有变化的行。
+    """
+
+    # 行颜色：活跃-绿色，通过-蓝色，失败-红色
+    ROW_COLOURS = {
+        "active": (0, 150, 0),
+        "passed": (0, 100, 200),
+        "failed": (200, 0, 0),
+    }
+
+    def __init__(self, parent):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL)
+        self.rows = []     # 每行各列的文本
+        self.colours = []  # 每行的颜色键，None为默认颜色
+        self.attrs = {}
+        for key, colour in self.ROW_COLOURS.items():
+            attr = wx.ItemAttr()
+            attr.SetTextColour(wx.Colour(*colour))
+            self.attrs[key] = attr
+
+    def set_rows(self, rows, colours):
+        """更新行数据，返回重绘的行数"""
+        old_rows, old_colours = self.rows, self.colours
+        self.rows, self.colours = rows, colours
+        if len(rows) != len(old_rows):
+            # 行数变化时控件会整体重绘可见区域
+            self.SetItemCount(len(rows))
+            return len(rows)
+
+        changed = 0
+        first = None
+        for i in range(len(rows) + 1):
+            dirty = i < len(rows) and (rows[i] != old_rows[i] or colours[i] != old_colours[i])
+            if dirty:
+                changed += 1
+                if first is None:
+                    first = i
+            elif first is not None:
+                # 连续的变化行合并为一次重绘
+                if first == i - 1:
+                    self.RefreshItem(first)
+                else:
+                    self.RefreshItems(first, i - 1)
+                first = None
+        return changed
+
+    def OnGetItemText(self, item, column):
+        if item < len(self.rows) and column < len(self.rows[item]):
+            return self.rows[item][column]
+        return ""
+
+    def OnGetItemAttr(self, item):
+        if item < len(self.colours):
+            return self.attrs.get(self.colours[item])
+        return None
 
 
 class ConfigManagementFrame(wx.Frame):
     """API配置管理主窗口"""
 
+    # 指标列: (列标题, 配置中的记录名, 字段)
+    METRIC_COLUMNS = [
+        ("DNS(ms)", "latency", "dns_ms"),
+        ("连接(ms)", "latency", "connect_ms"),
+        ("TLS(ms)", "latency", "tls_ms"),
+        ("首字节(ms)", "latency", "ttfb_ms"),
+        ("总耗时(ms)", "latency", "total_ms"),
+        ("首Token(ms)", "stream_metrics", "ttft_ms"),
+        ("Token间隔(ms)", "stream_metrics", "itl_ms"),
+        ("tok/s", "stream_metrics", "tokens_per_sec"),
+    ]
+    METRIC_COLUMN_START = 4
+
+    # 代理负载均衡策略: (显示名称, 策略)
+    BALANCE_POLICIES = [
+        ("仅活跃配置", "active"),
+        ("加权轮询", "weighted_round_robin"),
+        ("最少并发", "least_outstanding"),
+        ("EWMA延迟", "ewma"),
+    ]
+
     def __init__(self):
-        super().__init__(None, title="CC-APISwitch v1.2", size=(1050, 900))  # 增加窗口宽度
+        super().__init__(None, title="CC-APISwitch v1.2", size=(1250, 900))  # 增加窗口宽度
+        self.startup_stages = []  # 启动各阶段耗时 [(阶段, 毫秒)]
+        self.startup_mark = STARTUP_BEGIN
+        self.mark_startup_stage("导入模块")
         self.config_manager = SimpleConfigManager()
-        self.selected_index = -1
-        self.testing_indices = set()  # 正在测试的配置索引
+        self.mark_startup_stage("加载配置")
+        self.selected_id = None  # 当前选中（编辑区加载）的配置id
+        self.testing_ids = set()  # 正在测试的配置id
+        self.row_ids = []  # 列表各行对应的配置id
+        self.sort_column = -1  # 列表按该列显示排序（只影响显示，不改变保存的配置顺序），-1为原始顺序
+        self.sort_reverse = False
+        # 延迟趋势要读取耗时历史文件，首次显示时先不画，窗口显示后再补上
+        self.sparklines_ready = False
+        # 后台线程的界面更新先合并，再由定时器按固定频率批量执行
+        self.ui_updates = UIUpdateDispatcher(schedule=lambda: wx.CallAfter(self.schedule_ui_updates))
+        self.ui_update_timer = wx.Timer(self)
+        self.ui_update_interval = int(1000 / max(1, min(60, self.config_manager.get_setting("ui_update_hz"))))
+        self.Bind(wx.EVT_TIMER, self.on_ui_update_timer, self.ui_update_timer)
+        # 测试、项目加载、归档、启动等后台操作统一由任务管理器执行
+        self.jobs = JobManager(max_workers=self.config_manager.get_setting("job_max_workers"),
+                               on_change=lambda: self.ui_updates.post("jobs", self.refresh_jobs_panel))
+        self.job_row_ids = []  # 任务列表各行对应的任务id
+        self.project_scan_job = None
+        # 健康监控、代理和自动切换在第一次使用时创建，项目监视在窗口显示后启动
+        self._components = {}
+        self.project_watcher = None
 
         self.create_ui()
+        self.mark_startup_stage("创建界面")
         self.refresh_list()
+        self.mark_startup_stage("配置列表")
+        self.Bind(wx.EVT_CLOSE, self.on_close)
         self.Center()
+        # 模型列表、当前Claude配置、项目索引和后台服务在窗口显示后再加载
+        wx.CallAfter(self.finish_startup)
+
+    def mark_startup_stage(self, name):
+        """记录从上一个阶段结束到现在的启动耗时"""
+        now = time.perf_counter()
+        self.startup_stages.append((name, (now - self.startup_mark) * 1000))
+        self.startup_mark = now
+
+    def finish_startup(self):
+        """窗口显示后的启动阶段"""
+        self.Update()  # 先完成首次绘制
+        self.mark_startup_stage("首次显示")
+
+        self.load_model_choices()
+        self.mark_startup_stage("模型列表")
+        self.update_config_display()
+        self.mark_startup_stage("当前配置")
+        self.sparklines_ready = True
+        self.refresh_list()
+        self.mark_startup_stage("延迟趋势")
+
+        from cc_watch import ProjectWatcher
+        self.project_watcher = ProjectWatcher(
+            self.config_manager.project_index,
+            on_change=lambda projects: self.ui_updates.post("projects", self.on_projects_changed, projects),
+            poll_interval=self.config_manager.get_setting("project_watch_poll_interval"))
+        self.refresh_projects()
+        self.project_watcher.start()
+        self.mark_startup_stage("项目索引")
+
+        if self.config_manager.get_setting("monitor_enabled"):
+            self.monitor_checkbox.SetValue(True)
+            self.health_monitor.start()
+        self.auto_switch_checkbox.SetValue(bool(self.config_manager.get_setting("auto_switch_enabled")))
+        self.auto_env_checkbox.SetValue(bool(self.config_manager.get_setting("auto_switch_set_env")))
+        if self.config_manager.get_setting("cache_enabled"):
+            self.cache_checkbox.SetValue(True)
+            self.enable_cache()
+        if self.config_manager.get_setting("proxy_enabled"):
+            self.proxy_checkbox.SetValue(True)
+            self.start_proxy()
+        self.mark_startup_stage("后台服务")
+        self.report_startup_time()
+
+    def report_startup_time(self):
+        """在状态栏显示启动耗时，各阶段明细放在状态栏提示中"""
+        first_paint = 0.0
+        for name, ms in self.startup_stages:
+            first_paint += ms
+            if name == "首次显示":
+                break
+        total = sum(ms for _, ms in self.startup_stages)
+        details = " | ".join(f"{name} {ms:.0f}ms" for name, ms in self.startup_stages)
+        summary = f"启动耗时: 首次显示 {first_paint:.0f}ms，全部完成 {total:.0f}ms"
+        self.status_text.SetToolTip(f"{summary}\n{details}")
+        self.status_text.SetLabel(summary)
+
+    def _component(self, name, factory):
+        """获取按需创建的后台组件（界面线程调用，只创建一次）"""
+        component = self._components.get(name)
+        if component is None:
+            component = self._components[name] = factory()
+        return component
+
+    @property
+    def health_monitor(self):
+        """后台健康监控"""
+        def create():
+            from cc_monitor import HealthMonitor
+            return HealthMonitor(
+                self.config_manager,
+                on_result=lambda config_id, success, message: self.ui_updates.post(
+                    ("monitor", config_id), self.on_monitor_result, config_id, success, message),
+                healthy_interval=self.config_manager.get_setting("monitor_healthy_interval"),
+                failure_interval=self.config_manager.get_setting("monitor_failure_interval"),
+                max_workers=self.config_manager.get_setting("monitor_max_workers"))
+        return self._component("health_monitor", create)
+
+    @property
+    def proxy(self):
+        """本地故障转移代理（创建时按当前设置配置，启动前不监听端口）"""
+        def create():
+            from cc_proxy import FailoverProxy
+            return FailoverProxy(
+                self.config_manager,
+                port=self.config_manager.get_setting("proxy_port"),
+                max_attempts=self.config_manager.get_setting("proxy_max_attempts"),
+                timeout=self.config_manager.get_setting("proxy_timeout"),
+                balance_policy=self.config_manager.get_setting("proxy_balance_policy"),
+                hedge_enabled=self.config_manager.get_setting("proxy_hedge_enabled"),
+                hedge_percentile=self.config_manager.get_setting("proxy_hedge_percentile"),
+                hedge_budget=self.config_manager.get_setting("proxy_hedge_budget"),
+                hedge_min_delay_ms=self.config_manager.get_setting("proxy_hedge_min_delay_ms"),
+                hedge_default_delay_ms=self.config_manager.get_setting("proxy_hedge_default_delay_ms"))
+        return self._component("proxy", create)
+
+    @property
+    def auto_switcher(self):
+        """根据测试结果自动切换配置"""
+        def create():
+            from cc_monitor import AutoSwitcher
+            return AutoSwitcher(
+                self.config_manager,
+                threshold_ms=self.config_manager.get_setting("auto_switch_threshold_ms"),
+                set_env=self.config_manager.get_setting("auto_switch_set_env"),
+                margin=self.config_manager.get_setting("auto_switch_margin"),
+                confirmations=self.config_manager.get_setting("auto_switch_confirmations"))
+        return self._component("auto_switcher", create)
+
+    def on_close(self, event):
+        """关闭窗口时停止后台任务并写入尚未保存的配置"""
+        self.ui_update_timer.Stop()
+        # 窗口销毁后不再调度界面更新
+        self.ui_updates.schedule = None
+        if self.project_watcher is not None:
+            self.project_watcher.stop()
+        monitor = self._components.get("health_monitor")
+        if monitor is not None:
+            monitor.stop()
+        proxy = self._components.get("proxy")
+        if proxy is not None and proxy.running:
+            # 代理随程序退出，Claude配置改回直接指向活跃配置
+            proxy.stop()
+            self.config_manager.proxy_url = ""
+            active_id = self.config_manager.get_active_id()
+            if active_id is not None:
+                self.config_manager.switch_config(active_id)
+        # 取消所有任务，最多等待2秒让它们中止（工作线程是守护线程，不会阻止退出）
+        self.jobs.shutdown(timeout=2.0)
+        self.config_manager.flush()
+        event.Skip()
+
+    def schedule_ui_updates(self):
+        """有待执行的界面更新时，一个更新周期后批量执行"""
+        if not self.ui_update_timer.IsRunning():
+            self.ui_update_timer.StartOnce(self.ui_update_interval)
+
+    def on_ui_update_timer(self, event):
+        """批量执行合并后的界面更新"""
+        self.ui_updates.drain()
+
+    def request_list_refresh(self):
+        """在下一个更新周期刷新配置列表（多次请求合并为一次）"""
+        self.ui_updates.post("config_list", self.refresh_list)
 
     def create_ui(self):
         """创建界面"""
@@ -457,12 +307,15 @@ class ConfigManagementFrame(wx.Frame):
         main_sizer.Add(self.env_config_label, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM | wx.EXPAND, 10)
 
         # 配置列表 - 支持多选，直接添加到主面板
-        self.config_list = wx.ListCtrl(panel, style=wx.LC_REPORT)
+        self.config_list = ConfigListCtrl(panel)
         self.config_list.AppendColumn('配置名称', width=160)
-        self.config_list.AppendColumn('模型', width=220)
-        self.config_list.AppendColumn('状态', width=80)
-        self.config_list.AppendColumn('测试时间', width=80)
-        self.config_list.AppendColumn('测试结果', width=320)
+        self.config_list.AppendColumn('模型', width=180)
+        self.config_list.AppendColumn('状态', width=70)
+        self.config_list.AppendColumn('测试时间', width=70)
+        for title, _, _ in self.METRIC_COLUMNS:
+            self.config_list.AppendColumn(title, width=65, format=wx.LIST_FORMAT_RIGHT)
+        self.config_list.AppendColumn('延迟趋势', width=120)
+        self.config_list.AppendColumn('测试结果', width=220)
         main_sizer.Add(self.config_list, 3, wx.ALL | wx.EXPAND, 10)
 
         # 配置编辑区域
@@ -490,14 +343,8 @@ class ConfigManagementFrame(wx.Frame):
 
         # Model - 改为支持自定义输入的ComboBox
         form_sizer.Add(wx.StaticText(panel, label="默认模型:"), 0, wx.ALIGN_CENTER_VERTICAL)
-        models = self.config_manager.get_available_models()
-        self.model_choice = wx.ComboBox(panel, choices=models, style=wx.CB_DROPDOWN)
-        # 设置默认选择为 claude-sonnet-4-20250514
-        default_model = "claude-sonnet-4-20250514"
-        if default_model in models:
-            self.model_choice.SetValue(default_model)
-        else:
-            self.model_choice.SetSelection(0)
+        # 模型列表在窗口显示后由 load_model_choices 从模型配置文件加载
+        self.model_choice = wx.ComboBox(panel, choices=[], style=wx.CB_DROPDOWN)
         form_sizer.Add(self.model_choice, 1, wx.EXPAND)
 
         # 备注
@@ -517,6 +364,8 @@ class ConfigManagementFrame(wx.Frame):
         self.delete_btn = wx.Button(panel, label="删除", size=(60, -1))
         self.test_btn = wx.Button(panel, label="测试")
         self.batch_test_btn = wx.Button(panel, label="批量测试")
+        self.stream_test_checkbox = wx.CheckBox(panel, label="流式")
+        self.stream_test_checkbox.SetToolTip("使用流式(SSE)请求测试，记录首Token时间、Token间隔和解码速度")
         self.switch_btn = wx.Button(panel, label="切换配置")
         self.env_btn = wx.Button(panel, label="用户环境变量")
         self.system_env_btn = wx.Button(panel, label="系统环境变量")
@@ -539,6 +388,7 @@ class ConfigManagementFrame(wx.Frame):
         btn_sizer.AddSpacer(10)
         btn_sizer.Add(self.test_btn, 0, wx.ALL, 2)
         btn_sizer.Add(self.batch_test_btn, 0, wx.ALL, 2)
+        btn_sizer.Add(self.stream_test_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
         btn_sizer.AddSpacer(10)
         btn_sizer.Add(self.switch_btn, 0, wx.ALL, 2)
         btn_sizer.Add(self.env_btn, 0, wx.ALL, 2)
@@ -546,6 +396,43 @@ class ConfigManagementFrame(wx.Frame):
 
         main_sizer.Add(btn_sizer, 0, wx.ALL | wx.CENTER, 5)
 
+        # 自动化区域：后台监控和自动切换
+        auto_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.monitor_checkbox = wx.CheckBox(panel, label="后台监控")
+        self.monitor_checkbox.SetToolTip("在后台定期重新测试所有配置：健康的配置探测较慢，失败或不稳定的配置探测较快")
+        self.auto_switch_checkbox = wx.CheckBox(panel, label="自动切换到最快配置")
+        self.auto_switch_checkbox.SetToolTip("根据测试结果自动切换到最快的健康配置，当前配置失败或超过阈值时再次切换")
+        self.auto_threshold_spin = wx.SpinCtrl(panel, min=100, max=120000, size=(90, -1),
+                                               initial=int(self.config_manager.get_setting("auto_switch_threshold_ms")))
+        self.auto_env_checkbox = wx.CheckBox(panel, label="同时设置用户环境变量")
+        self.proxy_checkbox = wx.CheckBox(panel, label="本地代理")
+        self.proxy_checkbox.SetToolTip("启动本地故障转移代理并让Claude指向它：切换配置无需重启Claude，请求失败自动换下一个健康配置")
+        self.balance_choice = wx.Choice(panel, choices=[label for label, _ in self.BALANCE_POLICIES])
+        self.balance_choice.SetToolTip("在默认模型与活跃配置相同的配置之间分配代理请求")
+        policy = self.config_manager.get_setting("proxy_balance_policy")
+        policies = [value for _, value in self.BALANCE_POLICIES]
+        self.balance_choice.SetSelection(policies.index(policy) if policy in policies else 0)
+        self.hedge_checkbox = wx.CheckBox(panel, label="对冲请求")
+        self.hedge_checkbox.SetToolTip("首选上游迟迟没有响应时向另一个健康配置再发一次请求，先响应者胜出（额外请求数受预算限制）")
+        self.hedge_checkbox.SetValue(bool(self.config_manager.get_setting("proxy_hedge_enabled")))
+        self.cache_checkbox = wx.CheckBox(panel, label="响应缓存")
+        self.cache_checkbox.SetToolTip("缓存经过代理的temperature为0的请求响应，重复请求直接从磁盘回放（包括SSE流）")
+
+        auto_sizer.Add(self.monitor_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.AddSpacer(10)
+        auto_sizer.Add(self.auto_switch_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(wx.StaticText(panel, label="切换阈值(ms):"), 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(self.auto_threshold_spin, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(self.auto_env_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.AddSpacer(10)
+        auto_sizer.Add(self.proxy_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(wx.StaticText(panel, label="负载均衡:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(self.balance_choice, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(self.hedge_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+        auto_sizer.Add(self.cache_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 2)
+
+        main_sizer.Add(auto_sizer, 0, wx.ALL | wx.CENTER, 5)
+
         # 项目管理区域
         project_box = wx.StaticBox(panel, label="项目快速启动")
         project_sizer = wx.StaticBoxSizer(project_box, wx.HORIZONTAL)
@@ -557,15 +444,35 @@ class ConfigManagementFrame(wx.Frame):
 
         # 项目操作按钮
         self.refresh_project_btn = wx.Button(panel, label="刷新")
+        self.archive_btn = wx.Button(panel, label="冷存储旧会话")
+        self.archive_btn.SetToolTip("把长期未修改的会话压缩进冷存储，冷存储中的会话要恢复后才能在Claude Code中用 --resume 继续")
+        self.restore_btn = wx.Button(panel, label="恢复会话")
+        self.restore_btn.SetToolTip("把选中项目（未选择项目时为全部项目）冷存储中的会话恢复到Claude Code的会话目录")
         self.open_claude_btn = wx.Button(panel, label="启动Claude")
         self.open_claude_c_btn = wx.Button(panel, label="启动Claude -c")
 
         project_sizer.Add(self.refresh_project_btn, 0, wx.ALL, 5)
+        project_sizer.Add(self.archive_btn, 0, wx.ALL, 5)
+        project_sizer.Add(self.restore_btn, 0, wx.ALL, 5)
         project_sizer.Add(self.open_claude_btn, 0, wx.ALL, 5)
         project_sizer.Add(self.open_claude_c_btn, 0, wx.ALL, 5)
 
         main_sizer.Add(project_sizer, 0, wx.ALL | wx.EXPAND, 10)
 
+        # 后台任务区域
+        jobs_box = wx.StaticBox(panel, label="后台任务")
+        jobs_sizer = wx.StaticBoxSizer(jobs_box, wx.HORIZONTAL)
+        self.jobs_list = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL, size=(-1, 90))
+        self.jobs_list.AppendColumn('任务', width=220)
+        self.jobs_list.AppendColumn('状态', width=70)
+        self.jobs_list.AppendColumn('进度', width=80)
+        self.jobs_list.AppendColumn('信息', width=400)
+        jobs_sizer.Add(self.jobs_list, 1, wx.EXPAND | wx.ALL, 5)
+        self.cancel_job_btn = wx.Button(panel, label="取消任务")
+        self.cancel_job_btn.SetToolTip("取消选中的任务，未选中时取消所有进行中的任务")
+        jobs_sizer.Add(self.cancel_job_btn, 0, wx.ALL, 5)
+        main_sizer.Add(jobs_sizer, 0, wx.LEFT | wx.RIGHT | wx.EXPAND, 10)
+
         # 底部状态栏、备份按钮和版权信息区域（同一行）
         bottom_sizer = wx.BoxSizer(wx.HORIZONTAL)
 
@@ -573,6 +480,15 @@ class ConfigManagementFrame(wx.Frame):
         self.status_text = wx.StaticText(panel, label="就绪")
         bottom_sizer.Add(self.status_text, 1, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 10)
 
+        # 响应缓存统计
+        self.cache_status_text = wx.StaticText(panel, label="")
+        self.cache_status_text.SetForegroundColour(wx.Colour(128, 128, 128))
+        bottom_sizer.Add(self.cache_status_text, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+
+        # 用量统计按钮
+        self.usage_btn = wx.Button(panel, label="用量统计", size=(80, -1))
+        bottom_sizer.Add(self.usage_btn, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+
         # 中间备份按钮
         self.backup_btn = wx.Button(panel, label="备份配置", size=(80, -1))
         bottom_sizer.Add(self.backup_btn, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
@@ -593,6 +509,7 @@ class ConfigManagementFrame(wx.Frame):
         # 事件绑定
         self.config_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_select)
         self.config_list.Bind(wx.EVT_MOTION, self.on_list_motion)
+        self.config_list.Bind(wx.EVT_LIST_COL_CLICK, self.on_sort_column)
         self.add_btn.Bind(wx.EVT_BUTTON, self.on_add)
         self.update_btn.Bind(wx.EVT_BUTTON, self.on_update)
         self.delete_btn.Bind(wx.EVT_BUTTON, self.on_delete)
@@ -603,20 +520,44 @@ class ConfigManagementFrame(wx.Frame):
         self.delete_selected_btn.Bind(wx.EVT_BUTTON, self.on_delete_selected)
         self.test_btn.Bind(wx.EVT_BUTTON, self.on_test)
         self.batch_test_btn.Bind(wx.EVT_BUTTON, self.on_batch_test)
+        self.monitor_checkbox.Bind(wx.EVT_CHECKBOX, self.on_toggle_monitor)
+        self.auto_switch_checkbox.Bind(wx.EVT_CHECKBOX, self.on_toggle_auto_switch)
+        self.auto_threshold_spin.Bind(wx.EVT_SPINCTRL, self.on_auto_threshold_change)
+        self.auto_env_checkbox.Bind(wx.EVT_CHECKBOX, self.on_toggle_auto_env)
+        self.proxy_checkbox.Bind(wx.EVT_CHECKBOX, self.on_toggle_proxy)
+        self.balance_choice.Bind(wx.EVT_CHOICE, self.on_balance_policy_change)
+        self.hedge_checkbox.Bind(wx.EVT_CHECKBOX, self.on_toggle_hedge)
+        self.cache_checkbox.Bind(wx.EVT_CHECKBOX, self.on_toggle_cache)
         self.switch_btn.Bind(wx.EVT_BUTTON, self.on_switch)
         self.env_btn.Bind(wx.EVT_BUTTON, self.on_env_switch)
         self.system_env_btn.Bind(wx.EVT_BUTTON, self.on_system_env_switch)
 
         # 项目管理事件绑定
         self.refresh_project_btn.Bind(wx.EVT_BUTTON, self.on_refresh_projects)
+        self.archive_btn.Bind(wx.EVT_BUTTON, self.on_archive_sessions)
+        self.restore_btn.Bind(wx.EVT_BUTTON, self.on_restore_sessions)
         self.open_claude_btn.Bind(wx.EVT_BUTTON, self.on_open_claude)
         self.open_claude_c_btn.Bind(wx.EVT_BUTTON, self.on_open_claude_c)
+        self.cancel_job_btn.Bind(wx.EVT_BUTTON, self.on_cancel_job)
 
         # 备份按钮事件绑定
         self.backup_btn.Bind(wx.EVT_BUTTON, self.on_backup_config)
+        self.usage_btn.Bind(wx.EVT_BUTTON, self.on_usage_stats)
 
-        self.update_config_display()
-        self.refresh_projects()  # 初始化项目列表
+    def load_model_choices(self):
+        """从模型配置文件加载默认模型下拉列表（保留已输入的模型）"""
+        value = self.model_choice.GetValue()
+        models = self.config_manager.get_available_models()
+        self.model_choice.Set(models)
+        if value:
+            self.model_choice.SetValue(value)
+            return
+        # 设置默认选择为 claude-sonnet-4-20250514
+        default_model = "claude-sonnet-4-20250514"
+        if default_model in models:
+            self.model_choice.SetValue(default_model)
+        elif models:
+            self.model_choice.SetSelection(0)
 
     def update_config_display(self):
         """更新配置显示信息"""
@@ -640,8 +581,7 @@ class ConfigManagementFrame(wx.Frame):
 
     def adjust_list_height(self):
         """动态调整配置列表高度，但不超出合理范围"""
-        configs = self.config_manager.get_all_configs()
-        count = len(configs)
+        count = len(self.row_ids)
 
         # 计算合适的高度：每行约24像素，最少显示3行，最多显示10行
         min_rows = 3
@@ -666,9 +606,8 @@ class ConfigManagementFrame(wx.Frame):
         item, flags = self.config_list.HitTest(pos)
 
         if item != wx.NOT_FOUND:
-            configs = self.config_manager.get_all_configs()
-            if item < len(configs):
-                config = configs[item]
+            config = self.config_manager.get_config(self.row_ids[item]) if item < len(self.row_ids) else None
+            if config is not None:
                 note = config.get("note", "")
                 if note:
                     self.config_list.SetToolTip(f"{config['name']}: {note}")
@@ -680,42 +619,122 @@ class ConfigManagementFrame(wx.Frame):
         event.Skip()
 
     def refresh_list(self):
-        """刷新配置列表"""
-        self.config_list.DeleteAllItems()
-        configs = self.config_manager.get_all_configs()
-
-        for i, config in enumerate(configs):
-            index = self.config_list.InsertItem(i, config["name"])
-
-            # 模型显示
-            model = config.get("default_model", "")
-            self.config_list.SetItem(index, 1, model)
-
+        """刷新配置列表（只重绘内容有变化的行）"""
+        configs = self.sort_view(self.config_manager.get_all_configs())
+        old_row_ids = self.row_ids
+        self.row_ids = [config["id"] for config in configs]
+        active_id = self.config_manager.get_active_id()
+        latency_series = self.config_manager.latency_series if self.sparklines_ready else None
+
+        rows = []
+        colours = []
+        for config in configs:
             # 测试状态
             status = config.get("test_status", "未测试")
-            if i in self.testing_indices:
+            if config["id"] in self.testing_ids:
                 status = "测试中..."
 
-            self.config_list.SetItem(index, 2, status)
+            # 名称、模型、状态、测试时间
+            row = [config["name"], config.get("default_model", ""), status, config.get("test_time", "")]
 
-            # 测试时间
-            test_time = config.get("test_time", "")
-            self.config_list.SetItem(index, 3, test_time)
+            # 分阶段延迟和流式指标
+            for _, record, field in self.METRIC_COLUMNS:
+                value = (config.get(record) or {}).get(field)
+                row.append(f"{value:.0f}" if value is not None else "")
 
-            # 测试结果
-            test_message = config.get("test_message", "")
-            self.config_list.SetItem(index, 4, test_message)
+            # 延迟趋势和测试结果
+            row.append(latency_series.sparkline(config["id"]) if latency_series is not None else "")
+            row.append(config.get("test_message", ""))
+            rows.append(tuple(row))
 
             # 设置颜色
-            if config["name"] == self.config_manager.configs_data.get("active_config"):
-                self.config_list.SetItemTextColour(index, wx.Colour(0, 150, 0))  # 绿色-活跃
+            if config["id"] == active_id:
+                colours.append("active")
             elif status == "通过":
-                self.config_list.SetItemTextColour(index, wx.Colour(0, 100, 200))  # 蓝色-通过
+                colours.append("passed")
             elif status in ["失败", "错误", "超时"]:
-                self.config_list.SetItemTextColour(index, wx.Colour(200, 0, 0))  # 红色-失败
+                colours.append("failed")
+            else:
+                colours.append(None)
+
+        # 虚拟列表的选中状态按行号保存，行顺序变化时按配置id恢复选中
+        selected_ids = None
+        if self.row_ids != old_row_ids:
+            selected_ids = [old_row_ids[row] for row in self.get_selected_rows() if row < len(old_row_ids)]
+            for row in self.get_selected_rows():
+                self.config_list.Select(row, False)
+
+        self.config_list.set_rows(rows, colours)
+
+        if selected_ids:
+            positions = {config_id: row for row, config_id in enumerate(self.row_ids)}
+            for config_id in selected_ids:
+                if config_id in positions:
+                    self.config_list.Select(positions[config_id], True)
+
+        # 行数变化时调整列表高度
+        if len(self.row_ids) != len(old_row_ids):
+            self.adjust_list_height()
+
+    def get_sort_key(self, column):
+        """获取列排序键函数，没有指标数据的配置始终排在最后"""
+        metric_end = self.METRIC_COLUMN_START + len(self.METRIC_COLUMNS)
+        if self.METRIC_COLUMN_START <= column < metric_end:
+            _, record, field = self.METRIC_COLUMNS[column - self.METRIC_COLUMN_START]
+
+            def metric_key(config):
+                value = (config.get(record) or {}).get(field)
+                if value is None:
+                    return (1, 0.0)
+                return (0, -value if self.sort_reverse else value)
+            return metric_key
+
+        if column == metric_end:
+            # 延迟趋势列按最近的平均耗时排序
+            def trend_key(config):
+                trend = self.config_manager.latency_series.trend(config["id"], width=1)
+                if not trend:
+                    return (1, 0.0)
+                return (0, -trend[-1] if self.sort_reverse else trend[-1])
+            return trend_key
+
+        fields = {0: "name", 1: "default_model", 2: "test_status", 3: "test_time", metric_end + 1: "test_message"}
+        field = fields.get(column, "name")
+        return lambda config: str(config.get(field, ""))
+
+    def sort_view(self, configs):
+        """按当前排序列返回显示顺序的配置列表"""
+        if self.sort_column < 0:
+            return configs
+        metric_end = self.METRIC_COLUMN_START + len(self.METRIC_COLUMNS)
+        if self.METRIC_COLUMN_START <= self.sort_column <= metric_end:
+            # 指标列和延迟趋势列由键函数处理降序，保证未测试的配置留在末尾
+            return sorted(configs, key=self.get_sort_key(self.sort_column))
+        return sorted(configs, key=self.get_sort_key(self.sort_column), reverse=self.sort_reverse)
+
+    def clear_sort(self):
+        """恢复按保存的配置顺序显示"""
+        self.sort_column = -1
+        self.sort_reverse = False
+
+    def on_sort_column(self, event):
+        """点击列标题排序显示：升序、降序、恢复原始顺序循环切换，不修改保存的配置顺序"""
+        column = event.GetColumn()
+        title = self.config_list.GetColumn(column).GetText()
+        if column != self.sort_column:
+            self.sort_column = column
+            self.sort_reverse = False
+        elif not self.sort_reverse:
+            self.sort_reverse = True
+        else:
+            self.clear_sort()
 
-        # 调整列表高度
-        self.adjust_list_height()
+        self.refresh_list()
+        if self.sort_column < 0:
+            self.status_text.SetLabel("已恢复原始顺序")
+        else:
+            order = "降序" if self.sort_reverse else "升序"
+            self.status_text.SetLabel(f"已按「{title}」{order}排序显示")
 
     def clear_form(self):
         """清空表单"""
@@ -738,23 +757,22 @@ class ConfigManagementFrame(wx.Frame):
 
     def on_select(self, event):
         """选择配置 - 支持多选"""
-        selected_items = self.get_selected_indices()
+        selected_items = self.get_selected_ids()
 
         if len(selected_items) == 1:
             # 单选时加载配置到编辑区
-            self.selected_index = selected_items[0]
-            configs = self.config_manager.get_all_configs()
-            if self.selected_index < len(configs):
-                self.load_form(configs[self.selected_index])
-                self.status_text.SetLabel(f"已选择配置: {configs[self.selected_index]['name']}")
+            self.selected_id = selected_items[0]
+            config = self.config_manager.get_config(self.selected_id)
+            if config is not None:
+                self.load_form(config)
+                self.status_text.SetLabel(f"已选择配置: {config['name']}")
         elif len(selected_items) > 1:
             # 多选时不加载配置到编辑区
-            self.selected_index = selected_items[0]  # 保持第一个选中项
+            self.selected_id = selected_items[0]  # 保持第一个选中项
             self.status_text.SetLabel(f"已选择 {len(selected_items)} 个配置")
 
         # 更新全选复选框状态
-        configs = self.config_manager.get_all_configs()
-        if selected_items and len(selected_items) == len(configs):
+        if selected_items and len(selected_items) == len(self.row_ids):
             self.select_all_checkbox.SetValue(True)
         else:
             self.select_all_checkbox.SetValue(False)
@@ -772,30 +790,25 @@ class ConfigManagementFrame(wx.Frame):
             wx.MessageBox("请填写所有必填字段", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        # 检查是否已存在同名配置
-        configs = self.config_manager.get_all_configs()
-        for config in configs:
-            if config["name"] == name:
-                wx.MessageBox(f"配置名称 '{name}' 已存在，请使用其他名称", "提示", wx.OK | wx.ICON_INFORMATION)
-                return
-
         success, message = self.config_manager.add_config(name, url, token, model, note)
         if success:
             self.status_text.SetLabel(message)
             self.refresh_list()
             self.clear_form()
+        elif message == "名称已存在":
+            wx.MessageBox(f"配置名称 '{name}' 已存在，请使用其他名称", "提示", wx.OK | wx.ICON_INFORMATION)
         else:
             wx.MessageBox(message, "错误", wx.OK | wx.ICON_ERROR)
 
     def on_clear(self, event):
         """清除表单内容"""
         self.clear_form()
-        self.selected_index = -1
+        self.selected_id = None
         self.status_text.SetLabel("已清除表单内容")
 
     def on_update(self, event):
         """更新配置"""
-        if self.selected_index < 0:
+        if self.selected_id is None:
             wx.MessageBox("请先选择一个配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
@@ -810,7 +823,7 @@ class ConfigManagementFrame(wx.Frame):
             return
 
         success, message = self.config_manager.update_config(
-            self.selected_index, name, url, token, model, note)
+            self.selected_id, name, url, token, model, note)
         if success:
             self.status_text.SetLabel(message)
             self.refresh_list()
@@ -819,44 +832,57 @@ class ConfigManagementFrame(wx.Frame):
 
     def on_delete(self, event):
         """删除配置"""
-        if self.selected_index < 0:
+        config = self.config_manager.get_config(self.selected_id)
+        if config is None:
             wx.MessageBox("请先选择一个配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        configs = self.config_manager.get_all_configs()
-        config_name = configs[self.selected_index]["name"]
+        config_name = config["name"]
 
         if wx.MessageBox(f"确定删除配置 '{config_name}' 吗？",
                         "确认删除", wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
-            success, message = self.config_manager.delete_config(self.selected_index)
+            success, message = self.config_manager.delete_config(self.selected_id)
             if success:
                 self.status_text.SetLabel(message)
                 self.refresh_list()
                 self.clear_form()
-                self.selected_index = -1
+                self.selected_id = None
             else:
                 wx.MessageBox(message, "错误", wx.OK | wx.ICON_ERROR)
 
     def on_test(self, event):
         """测试单个配置"""
-        if self.selected_index < 0:
+        config = self.config_manager.get_config(self.selected_id)
+        if config is None:
             wx.MessageBox("请先选择一个配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        if self.selected_index in self.testing_indices:
+        if self.selected_id in self.testing_ids:
             wx.MessageBox("该配置正在测试中，请稍候", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        self.testing_indices.add(self.selected_index)
+        config_id = self.selected_id
+        self.testing_ids.add(config_id)
         self.test_btn.SetLabel("测试中...")
         self.test_btn.Enable(False)
         self.refresh_list()
 
-        def test_thread():
-            success, message, data = self.config_manager.test_config(self.selected_index)
-            wx.CallAfter(self.test_complete, self.selected_index, success, message)
+        stream = self.stream_test_checkbox.GetValue()
+        name = config["name"]
+
+        def test_job(job):
+            success, message, data = self.config_manager.test_config(config_id, stream=stream, cancel_token=job.token)
+            job.message = message
+            self.ui_updates.post(("test", config_id), self.test_complete, config_id, success, message)
+            return True
+
+        def test_done(job):
+            if job.result is None:
+                # 任务在开始前被取消或意外失败
+                message = "测试已取消" if job.cancelled else f"测试失败: {job.message}"
+                self.ui_updates.post(("test", config_id), self.test_complete, config_id, False, message)
 
-        threading.Thread(target=test_thread, daemon=True).start()
+        self.jobs.submit(f"测试 {name}", test_job, on_done=test_done)
 
     def on_batch_test(self, event):
         """批量测试所有配置"""
@@ -866,7 +892,7 @@ class ConfigManagementFrame(wx.Frame):
             return
 
         # 检查是否有配置正在测试
-        if self.testing_indices:
+        if self.testing_ids:
             wx.MessageBox("有配置正在测试中，请稍候", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
@@ -875,29 +901,48 @@ class ConfigManagementFrame(wx.Frame):
         self.status_text.SetLabel("开始批量测试...")
 
         # 添加所有配置到测试队列
-        for i in range(len(configs)):
-            self.testing_indices.add(i)
+        config_ids = [config["id"] for config in configs]
+        names = {config["id"]: config["name"] for config in configs}
+        self.testing_ids.update(config_ids)
 
         self.refresh_list()
 
-        def batch_test_thread():
-            for i in range(len(configs)):
-                if i not in self.testing_indices:  # 防止重复测试
-                    continue
-
-                wx.CallAfter(self.status_text.SetLabel, f"正在测试配置 {i+1}/{len(configs)}: {configs[i]['name']}")
-                success, message, data = self.config_manager.test_config(i)
-                wx.CallAfter(self.test_complete, i, success, message, is_batch=True)
-                time.sleep(1)  # 避免请求过快
-
-            wx.CallAfter(self.batch_test_complete)
-
-        threading.Thread(target=batch_test_thread, daemon=True).start()
-
-    def test_complete(self, index, success, message, is_batch=False):
+        from cc_batch import BatchTestEngine
+        engine = BatchTestEngine(
+            self.config_manager,
+            max_workers=self.config_manager.get_setting("batch_max_workers"),
+            per_host_limit=self.config_manager.get_setting("batch_per_host_limit"))
+        total = len(config_ids)
+        stream = self.stream_test_checkbox.GetValue()
+        completed = []
+
+        def batch_test_job(job):
+            def on_result(config_id, success, message, data):
+                completed.append(config_id)
+                job.set_progress(len(completed), total, names[config_id])
+                self.ui_updates.post("status", self.status_text.SetLabel,
+                                     f"批量测试进度 {len(completed)}/{total}: {names[config_id]}")
+                self.ui_updates.post(("test", config_id), self.test_complete, config_id, success, message,
+                                     is_batch=True)
+
+            job.set_progress(0, total)
+            engine.run(config_ids, on_result=on_result, stream=stream, cancel_token=job.token)
+            return True
+
+        def batch_test_done(job):
+            if job.result is None:
+                # 任务在开始前被取消或意外失败，清除所有测试中状态
+                for config_id in config_ids:
+                    if config_id not in completed:
+                        self.ui_updates.post(("test", config_id), self.test_complete, config_id, False,
+                                             "测试已取消", is_batch=True)
+            self.ui_updates.post("batch_done", self.batch_test_complete, job.cancelled)
+
+        self.jobs.submit(f"批量测试 {total} 个配置", batch_test_job, on_done=batch_test_done)
+
+    def test_complete(self, config_id, success, message, is_batch=False):
         """测试完成回调"""
-        if index in self.testing_indices:
-            self.testing_indices.remove(index)
+        self.testing_ids.discard(config_id)
 
         if not is_batch:
             self.test_btn.SetLabel("测试")
@@ -906,22 +951,160 @@ class ConfigManagementFrame(wx.Frame):
                 self.status_text.SetLabel(f"测试成功: {message}")
             else:
                 self.status_text.SetLabel(f"测试失败: {message}")
+            self.ui_updates.post("auto_switch", self.run_auto_switch)
 
-        self.refresh_list()
+        self.request_list_refresh()
 
-    def batch_test_complete(self):
+    def batch_test_complete(self, cancelled=False):
         """批量测试完成"""
         self.batch_test_btn.SetLabel("批量测试")
         self.batch_test_btn.Enable(True)
-        self.status_text.SetLabel("批量测试完成")
+        self.status_text.SetLabel("批量测试已取消" if cancelled else "批量测试完成")
+        self.run_auto_switch()
+
+    def on_toggle_monitor(self, event):
+        """启用/停用后台健康监控"""
+        enabled = event.IsChecked()
+        if enabled:
+            self.health_monitor.start()
+            self.status_text.SetLabel("后台监控已启用")
+        else:
+            self.health_monitor.stop()
+            self.status_text.SetLabel("后台监控已停用")
+        self.config_manager.set_setting("monitor_enabled", enabled)
+
+    def on_monitor_result(self, config_id, success, message):
+        """后台监控探测完成回调（UI线程）"""
+        config = self.config_manager.get_config(config_id)
+        if not success and config is not None:
+            self.status_text.SetLabel(f"后台监控: {config['name']} 测试失败: {message}")
+        self.ui_updates.post("auto_switch", self.run_auto_switch)
+        self.request_list_refresh()
+
+    def run_auto_switch(self):
+        """自动切换模式下根据最新测试结果切换配置（UI线程）"""
+        if not self.auto_switch_checkbox.GetValue():
+            return
+        if self.testing_ids:
+            # 批量测试进行中，等全部结果返回后再统一决策
+            return
+        switched, message = self.auto_switcher.apply()
+        if switched:
+            self.status_text.SetLabel(message)
+            self.request_list_refresh()
+            self.update_config_display()
+
+    def on_toggle_auto_switch(self, event):
+        """启用/停用自动切换"""
+        enabled = event.IsChecked()
+        self.config_manager.set_setting("auto_switch_enabled", enabled)
+        if enabled:
+            self.status_text.SetLabel("自动切换已启用")
+            self.run_auto_switch()
+        else:
+            self.status_text.SetLabel("自动切换已停用")
+
+    def on_auto_threshold_change(self, event):
+        """修改自动切换阈值"""
+        threshold = self.auto_threshold_spin.GetValue()
+        self.auto_switcher.threshold_ms = float(threshold)
+        self.config_manager.set_setting("auto_switch_threshold_ms", threshold)
+
+    def on_toggle_auto_env(self, event):
+        """自动切换时是否同时设置用户环境变量"""
+        self.auto_switcher.set_env = event.IsChecked()
+        self.config_manager.set_setting("auto_switch_set_env", event.IsChecked())
+
+    def start_proxy(self):
+        """启动本地代理，并让Claude配置指向代理"""
+        success, message = self.proxy.start()
+        if not success:
+            self.proxy_checkbox.SetValue(False)
+            wx.MessageBox(message, "错误", wx.OK | wx.ICON_ERROR)
+            return False
+
+        self.config_manager.proxy_url = self.proxy.url
+        active_id = self.config_manager.get_active_id()
+        if active_id is not None:
+            self.config_manager.switch_config(active_id)
+        else:
+            message += "，请切换到一个配置作为代理的首选上游"
+        self.status_text.SetLabel(message)
+        self.update_config_display()
+        return True
+
+    def stop_proxy(self):
+        """停止本地代理，并让Claude配置直接指向活跃配置"""
+        self.proxy.stop()
+        self.config_manager.proxy_url = ""
+        active_id = self.config_manager.get_active_id()
+        if active_id is not None:
+            self.config_manager.switch_config(active_id)
+        self.status_text.SetLabel("本地代理已停止")
+        self.update_config_display()
+
+    def on_toggle_proxy(self, event):
+        """启用/停用本地代理"""
+        if event.IsChecked():
+            enabled = self.start_proxy()
+        else:
+            self.stop_proxy()
+            enabled = False
+        self.config_manager.set_setting("proxy_enabled", enabled)
+
+    def on_balance_policy_change(self, event):
+        """切换代理负载均衡策略"""
+        label, policy = self.BALANCE_POLICIES[self.balance_choice.GetSelection()]
+        self.proxy.balancer.policy = policy
+        self.config_manager.set_setting("proxy_balance_policy", policy)
+        self.status_text.SetLabel(f"代理负载均衡策略: {label}")
+
+    def on_toggle_hedge(self, event):
+        """启用/停用代理对冲请求"""
+        enabled = event.IsChecked()
+        self.proxy.hedge_enabled = enabled
+        self.config_manager.set_setting("proxy_hedge_enabled", enabled)
+        self.status_text.SetLabel("代理对冲请求已启用" if enabled else "代理对冲请求已停用")
+
+    def enable_cache(self):
+        """创建响应缓存并挂到代理上"""
+        if self.proxy.cache is None:
+            from cc_cache import ResponseCache
+            self.proxy.cache = ResponseCache(
+                max_bytes=self.config_manager.get_setting("cache_max_mb") * 1024 * 1024,
+                ttl=self.config_manager.get_setting("cache_ttl_hours") * 3600,
+                on_change=lambda stats: self.ui_updates.post("cache_status", self.update_cache_status, stats))
+        self.update_cache_status(self.proxy.cache.get_stats())
+
+    def on_toggle_cache(self, event):
+        """启用/停用响应缓存"""
+        enabled = event.IsChecked()
+        if enabled:
+            self.enable_cache()
+            self.status_text.SetLabel("响应缓存已启用")
+        else:
+            self.proxy.cache = None
+            self.cache_status_text.SetLabel("")
+            self.status_text.SetLabel("响应缓存已停用")
+        self.config_manager.set_setting("cache_enabled", enabled)
+        self.Layout()
+
+    def update_cache_status(self, stats):
+        """在状态栏显示缓存命中统计（UI线程）"""
+        if self.proxy.cache is None:
+            return
+        size_mb = stats["bytes"] / (1024 * 1024)
+        self.cache_status_text.SetLabel(
+            f"缓存 命中:{stats['hits']} 未命中:{stats['misses']} | {stats['entries']}项 {size_mb:.1f}MB")
+        self.Layout()
 
     def on_switch(self, event):
         """切换配置"""
-        if self.selected_index < 0:
+        if self.selected_id is None:
             wx.MessageBox("请先选择一个配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        success, message = self.config_manager.switch_config(self.selected_index)
+        success, message = self.config_manager.switch_config(self.selected_id)
         if success:
             self.status_text.SetLabel(message)
             self.refresh_list()
@@ -931,11 +1114,11 @@ class ConfigManagementFrame(wx.Frame):
 
     def on_env_switch(self, event):
         """用户环境变量切换"""
-        if self.selected_index < 0:
+        if self.selected_id is None:
             wx.MessageBox("请先选择一个配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        success, message = self.config_manager.set_environment_variables(self.selected_index, "user")
+        success, message = self.config_manager.set_environment_variables(self.selected_id, "user")
         if success:
             self.status_text.SetLabel(message)
             self.update_config_display()  # 更新配置显示
@@ -944,11 +1127,11 @@ class ConfigManagementFrame(wx.Frame):
 
     def on_system_env_switch(self, event):
         """系统环境变量切换"""
-        if self.selected_index < 0:
+        if self.selected_id is None:
             wx.MessageBox("请先选择一个配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        success, message = self.config_manager.set_environment_variables(self.selected_index, "system")
+        success, message = self.config_manager.set_environment_variables(self.selected_id, "system")
         if success:
             self.status_text.SetLabel(message)
             self.update_config_display()  # 更新配置显示
@@ -956,34 +1139,70 @@ class ConfigManagementFrame(wx.Frame):
             wx.MessageBox(message, "错误", wx.OK | wx.ICON_ERROR)
 
     def refresh_projects(self):
-        """刷新项目列表"""
+        """刷新项目列表（扫描过程中逐步填充下拉框）"""
+        # 记住刷新前选中的项目，扫描到时恢复选择
+        self.project_restore_path = self.get_selected_project_path()
         self.project_choice.Clear()
         self.project_choice.Append("正在加载项目...")
         self.project_choice.SetSelection(0)
         self.status_text.SetLabel("正在加载项目列表...")
-        
-        # 使用后台线程加载项目，避免阻塞UI
-        def load_projects():
-            projects = self.config_manager.get_claude_code_projects()
-            wx.CallAfter(self.update_projects_ui, projects)
-            
-        threading.Thread(target=load_projects, daemon=True).start()
-
-    def update_projects_ui(self, projects):
+        self.projects_data = []
+        # 扫描代次，忽略被新一次刷新取代的旧扫描结果
+        self.project_scan_generation = getattr(self, 'project_scan_generation', 0) + 1
+        generation = self.project_scan_generation
+
+        # 在后台任务中加载项目，避免阻塞UI；新的刷新取消尚未完成的旧扫描
+        def load_projects(job):
+            projects = self.config_manager.get_claude_code_projects(
+                on_batch=lambda batch: job.cancelled or self.ui_updates.post(
+                    None, self.add_projects_batch, generation, batch),
+                cancel_token=job.token)
+            if not job.cancelled:
+                job.message = f"{len(projects)} 个项目"
+                self.ui_updates.post("project_list", self.update_projects_ui, projects, generation)
+
+        if self.project_scan_job is not None:
+            self.project_scan_job.cancel()
+        self.project_scan_job = self.jobs.submit("加载项目列表", load_projects)
+
+    def fill_project_choice(self, selected_path=None):
+        """按projects_data重新填充项目下拉框，尽量保持原有选择"""
+        items = [f"{project['name']} ({project['path']})"
+                 + (f" [冷存储 {project['archived_count']}]" if project.get('archived_count') else "")
+                 for project in self.projects_data]
+        self.project_choice.Set(items)
+        selection = 0
+        if selected_path:
+            selection = next((i for i, project in enumerate(self.projects_data)
+                              if project['path'] == selected_path), 0)
+        self.project_choice.SetSelection(selection)
+
+    def add_projects_batch(self, generation, batch):
+        """在UI线程中合并一批扫描到的项目，按最后访问时间倒序插入"""
+        if generation != self.project_scan_generation or not batch:
+            return
+        # 第一批到达前下拉框中是"正在加载"占位项，此时恢复刷新前的选择
+        selected_path = self.get_selected_project_path() if self.projects_data else self.project_restore_path
+        self.projects_data = sorted(self.projects_data + list(batch),
+                                    key=lambda x: x['last_access'], reverse=True)
+        self.fill_project_choice(selected_path)
+        self.status_text.SetLabel(f"正在加载项目列表... 已找到 {len(self.projects_data)} 个项目")
+
+    def update_projects_ui(self, projects, generation=None):
         """在UI线程中更新项目列表"""
-        self.project_choice.Clear()
-        
+        if generation is not None and generation != self.project_scan_generation:
+            return
+        selected_path = self.get_selected_project_path() if self.projects_data else self.project_restore_path
+
         # 存储项目数据
         self.projects_data = projects
 
         if projects:
-            for project in projects:
-                # 显示项目名称和路径
-                display_text = f"{project['name']} ({project['path']})"
-                self.project_choice.Append(display_text)
-            self.project_choice.SetSelection(0)
+            # 显示项目名称和路径
+            self.fill_project_choice(selected_path)
             self.status_text.SetLabel(f"已加载 {len(projects)} 个最近项目")
         else:
+            self.project_choice.Clear()
             # 检查是否是权限问题
             claude_dir = Path.home() / ".claude"
             if not claude_dir.exists():
@@ -996,10 +1215,113 @@ class ConfigManagementFrame(wx.Frame):
                 self.project_choice.Append("未找到Claude Code项目")
                 self.status_text.SetLabel("未找到Claude Code项目历史记录")
 
+    def on_projects_changed(self, projects):
+        """项目目录监视器检测到变化时增量更新下拉框"""
+        # 监视器的结果已包含完整项目列表，丢弃尚未到达的旧扫描结果
+        self.project_scan_generation = getattr(self, 'project_scan_generation', 0) + 1
+        selected_path = self.get_selected_project_path() if self.projects_data else self.project_restore_path
+        self.projects_data = projects
+        if projects:
+            self.fill_project_choice(selected_path)
+            self.status_text.SetLabel(f"项目列表已更新，共 {len(projects)} 个最近项目")
+        else:
+            self.update_projects_ui(projects)
+
+    def refresh_jobs_panel(self):
+        """刷新后台任务列表（最新的任务在最上面）"""
+        jobs = list(reversed(self.jobs.jobs()))
+        selected = self.jobs_list.GetFirstSelected()
+        selected_id = self.job_row_ids[selected] if 0 <= selected < len(self.job_row_ids) else None
+
+        if len(jobs) != self.jobs_list.GetItemCount():
+            self.jobs_list.DeleteAllItems()
+            for i in range(len(jobs)):
+                self.jobs_list.InsertItem(i, "")
+        self.job_row_ids = [job.id for job in jobs]
+        for i, job in enumerate(jobs):
+            self.jobs_list.SetItem(i, 0, job.title)
+            self.jobs_list.SetItem(i, 1, job.state)
+            self.jobs_list.SetItem(i, 2, job.progress_text())
+            self.jobs_list.SetItem(i, 3, job.message)
+            self.jobs_list.Select(i, job.id == selected_id)
+
+    def on_cancel_job(self, event):
+        """取消选中的任务，未选中时取消所有进行中的任务"""
+        selected = self.jobs_list.GetFirstSelected()
+        if 0 <= selected < len(self.job_row_ids):
+            job = self.jobs.get(self.job_row_ids[selected])
+            if job is not None and self.jobs.cancel(job.id):
+                self.status_text.SetLabel(f"已取消任务: {job.title}")
+            else:
+                self.status_text.SetLabel("该任务已结束")
+            return
+
+        active = [job for job in self.jobs.jobs() if job.active]
+        if not active:
+            self.status_text.SetLabel("没有进行中的任务")
+            return
+        self.jobs.cancel_all()
+        self.status_text.SetLabel(f"已取消 {len(active)} 个任务")
+
     def on_refresh_projects(self, event):
         """刷新项目按钮事件"""
         self.refresh_projects()
 
+    def on_archive_sessions(self, event):
+        """冷存储旧会话按钮事件"""
+        days = self.config_manager.get_setting("archive_after_days")
+        if wx.MessageBox(f"将超过 {days} 天未修改的会话压缩进冷存储。\n"
+                         f"冷存储中的会话不会出现在Claude Code的 --resume 会话列表中，"
+                         f"需要时点击「恢复会话」即可恢复。\n确定继续吗？",
+                         "冷存储旧会话", wx.YES_NO | wx.ICON_QUESTION) != wx.YES:
+            return
+
+        self.archive_btn.Enable(False)
+        self.restore_btn.Enable(False)
+        self.status_text.SetLabel("正在把旧会话移入冷存储...")
+
+        def archive_sessions(job):
+            success, message, _ = self.config_manager.archive_old_sessions(days, cancel_token=job.token)
+            job.message = message
+            self.ui_updates.post("archive", self.archive_complete, success, message)
+            return True
+
+        def archive_done(job):
+            if job.result is None:
+                self.ui_updates.post("archive", self.archive_complete, False, "归档已取消" if job.cancelled else f"归档失败: {job.message}")
+
+        self.jobs.submit("冷存储旧会话", archive_sessions, on_done=archive_done)
+
+    def on_restore_sessions(self, event):
+        """恢复会话按钮事件：恢复选中项目（未选择时为全部项目）冷存储中的会话"""
+        project_path = self.get_selected_project_path()
+        self.archive_btn.Enable(False)
+        self.restore_btn.Enable(False)
+        self.status_text.SetLabel("正在恢复冷存储中的会话...")
+
+        def restore_sessions(job):
+            success, message, _ = self.config_manager.restore_archived_sessions(project_path, cancel_token=job.token)
+            job.message = message
+            self.ui_updates.post("archive", self.archive_complete, success, message, "恢复完成")
+            return True
+
+        def restore_done(job):
+            if job.result is None:
+                self.ui_updates.post("archive", self.archive_complete, False, "恢复已取消" if job.cancelled else f"恢复失败: {job.message}")
+
+        self.jobs.submit("恢复冷存储会话", restore_sessions, on_done=restore_done)
+
+    def archive_complete(self, success, message, title="归档完成"):
+        """在UI线程中显示冷存储或恢复的结果"""
+        self.archive_btn.Enable(True)
+        self.restore_btn.Enable(True)
+        self.status_text.SetLabel(message)
+        wx.MessageBox(message, title if success else "错误",
+                      wx.OK | (wx.ICON_INFORMATION if success else wx.ICON_ERROR))
+        if success:
+            # 更新项目下拉框中的冷存储会话数
+            self.refresh_projects()
+
     def get_selected_project_path(self):
         """获取选中项目的路径"""
         selection = self.project_choice.GetSelection()
@@ -1018,21 +1340,17 @@ class ConfigManagementFrame(wx.Frame):
             wx.MessageBox("请先选择一个项目", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        # 使用独立线程启动，不阻塞主程序
-        def launch_claude():
+        # 在后台任务中启动，不阻塞主程序
+        def launch_claude(job):
             try:
                 import subprocess
                 import tempfile
                 import os
 
                 # 获取当前选中的配置和模型
-                if self.selected_index >= 0:
-                    configs = self.config_manager.get_all_configs()
-                    if self.selected_index < len(configs):
-                        config = configs[self.selected_index]
-                        model = config.get("default_model", "claude-sonnet-4-20250514")
-                    else:
-                        model = "claude-sonnet-4-20250514"
+                config = self.config_manager.get_config(self.selected_id)
+                if config is not None:
+                    model = config.get("default_model", "claude-sonnet-4-20250514")
                 else:
                     model = "claude-sonnet-4-20250514"
 
@@ -1057,15 +1375,14 @@ start "{window_title}" powershell -NoExit -Command "{claude_command}"
 
                 # 在主线程中更新状态
                 status_message = f"已在 {project_path} 启动{mode_text} (新窗口)"
-                wx.CallAfter(self.status_text.SetLabel, status_message)
+                self.ui_updates.post("status", self.status_text.SetLabel, status_message)
                 print(f"{mode_text} launched in new window at {project_path}")
 
             except Exception as e:
                 error_message = f"启动{mode_text}失败: {str(e)}"
-                wx.CallAfter(lambda: wx.MessageBox(error_message, "错误", wx.OK | wx.ICON_ERROR))
+                self.ui_updates.post(None, wx.MessageBox, error_message, "错误", wx.OK | wx.ICON_ERROR)
 
-        # 启动线程
-        threading.Thread(target=launch_claude, daemon=True).start()
+        self.jobs.submit(f"启动{'Claude -c' if use_c_flag else 'Claude'}", launch_claude)
 
     def on_open_claude(self, event):
         """启动Claude命令"""
@@ -1092,41 +1409,33 @@ start "{window_title}" powershell -NoExit -Command "{claude_command}"
         else:
             self.status_text.SetLabel("已取消全选")
 
-    def get_selected_indices(self):
-        """获取所有选中的索引"""
-        selected = []
-        for i in range(self.config_list.GetItemCount()):
-            if self.config_list.IsSelected(i):
-                selected.append(i)
-        return selected
+    def get_selected_ids(self):
+        """获取所有选中行对应的配置id"""
+        return [self.row_ids[row] for row in self.get_selected_rows() if row < len(self.row_ids)]
+
+    def get_selected_rows(self):
+        """获取所有选中的行号"""
+        rows = []
+        row = self.config_list.GetFirstSelected()
+        while row != -1:
+            rows.append(row)
+            row = self.config_list.GetNextSelected(row)
+        return rows
 
     def on_move_up(self, event):
         """上移选中的配置"""
-        selected_indices = self.get_selected_indices()
-        if not selected_indices:
+        selected_ids = self.get_selected_ids()
+        if not selected_ids:
             wx.MessageBox("请先选择要移动的配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        configs = self.config_manager.get_all_configs()
-        moved_configs = []
-
-        # 从后往前处理，避免索引变化
-        for index in sorted(selected_indices, reverse=True):
-            if index > 0:
-                # 交换配置
-                configs[index], configs[index - 1] = configs[index - 1], configs[index]
-                moved_configs.append(configs[index]['name'])
+        moved_configs = self.config_manager.move_configs(selected_ids, -1)
 
         if moved_configs:
-            # 更新配置数据
-            self.config_manager.configs_data["configs"] = configs
-            self.config_manager.save_configs_data()
-
-            # 刷新列表并重新选中
+            # 移动的是保存的顺序，恢复按保存的顺序显示
+            self.clear_sort()
+            # 刷新列表（选中状态随配置移动）
             self.refresh_list()
-            for i in range(len(selected_indices)):
-                if selected_indices[i] > 0:
-                    self.config_list.Select(selected_indices[i] - 1, True)
 
             # 状态提示
             if len(moved_configs) == 1:
@@ -1138,31 +1447,18 @@ start "{window_title}" powershell -NoExit -Command "{claude_command}"
 
     def on_move_down(self, event):
         """下移选中的配置"""
-        selected_indices = self.get_selected_indices()
-        if not selected_indices:
+        selected_ids = self.get_selected_ids()
+        if not selected_ids:
             wx.MessageBox("请先选择要移动的配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        configs = self.config_manager.get_all_configs()
-        moved_configs = []
-
-        # 从前往后处理，避免索引变化
-        for index in sorted(selected_indices):
-            if index < len(configs) - 1:
-                # 交换配置
-                configs[index], configs[index + 1] = configs[index + 1], configs[index]
-                moved_configs.append(configs[index]['name'])
+        moved_configs = self.config_manager.move_configs(selected_ids, 1)
 
         if moved_configs:
-            # 更新配置数据
-            self.config_manager.configs_data["configs"] = configs
-            self.config_manager.save_configs_data()
-
-            # 刷新列表并重新选中
+            # 移动的是保存的顺序，恢复按保存的顺序显示
+            self.clear_sort()
+            # 刷新列表（选中状态随配置移动）
             self.refresh_list()
-            for i in range(len(selected_indices)):
-                if selected_indices[i] < len(configs) - 1:
-                    self.config_list.Select(selected_indices[i] + 1, True)
 
             # 状态提示
             if len(moved_configs) == 1:
@@ -1174,45 +1470,68 @@ start "{window_title}" powershell -NoExit -Command "{claude_command}"
 
     def on_delete_selected(self, event):
         """删除选中的配置"""
-        selected_indices = self.get_selected_indices()
-        if not selected_indices:
+        selected_ids = self.get_selected_ids()
+        if not selected_ids:
             wx.MessageBox("请先选择要删除的配置", "提示", wx.OK | wx.ICON_INFORMATION)
             return
 
-        configs = self.config_manager.get_all_configs()
-        if len(selected_indices) == 1:
-            config_name = configs[selected_indices[0]]['name']
+        if len(selected_ids) == 1:
+            config = self.config_manager.get_config(selected_ids[0])
+            config_name = config['name'] if config else ""
             message = f"确定删除配置 '{config_name}' 吗？"
         else:
-            message = f"确定删除选中的 {len(selected_indices)} 个配置吗？"
+            message = f"确定删除选中的 {len(selected_ids)} 个配置吗？"
 
         if wx.MessageBox(message, "确认删除", wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
-            # 从后往前删除，避免索引变化
-            for index in sorted(selected_indices, reverse=True):
-                if index < len(configs):
-                    config_name = configs[index]['name']
-                    del configs[index]
-
-                    # 如果删除的是活跃配置，清除活跃配置
-                    if self.config_manager.configs_data.get("active_config") == config_name:
-                        self.config_manager.configs_data["active_config"] = None
-
-            # 更新配置数据
-            self.config_manager.configs_data["configs"] = configs
-            self.config_manager.save_configs_data()
+            # 按id删除，删除的是活跃配置时会清除活跃配置
+            deleted = self.config_manager.delete_configs(selected_ids)
 
             # 清空表单和选中状态
             self.clear_form()
-            self.selected_index = -1
+            self.selected_id = None
 
             # 刷新列表
             self.refresh_list()
 
             # 状态提示
-            if len(selected_indices) == 1:
+            if len(deleted) == 1:
                 self.status_text.SetLabel("配置删除成功")
             else:
-                self.status_text.SetLabel(f"已删除 {len(selected_indices)} 个配置")
+                self.status_text.SetLabel(f"已删除 {len(deleted)} 个配置")
+
+    def on_usage_stats(self, event):
+        """用量统计按钮事件：后台解析新增的会话内容后显示统计"""
+        self.usage_btn.Enable(False)
+        self.status_text.SetLabel("正在统计会话用量...")
+
+        def update_usage(job):
+            try:
+                stats = self.config_manager.usage_analytics.update(job.token)
+                if job.cancelled:
+                    self.ui_updates.post("usage_stats", self.show_usage_stats, None, "已取消")
+                else:
+                    self.ui_updates.post("usage_stats", self.show_usage_stats, stats, None)
+            except Exception as e:
+                self.ui_updates.post("usage_stats", self.show_usage_stats, None, str(e))
+            return True
+
+        def usage_done(job):
+            if job.result is None:
+                self.ui_updates.post("usage_stats", self.show_usage_stats, None, "已取消")
+
+        self.jobs.submit("统计会话用量", update_usage, on_done=usage_done)
+
+    def show_usage_stats(self, stats, error):
+        """在UI线程中显示用量统计"""
+        self.usage_btn.Enable(True)
+        if error:
+            self.status_text.SetLabel(f"用量统计失败: {error}")
+            return
+        self.status_text.SetLabel(
+            f"用量统计完成: {stats['files']} 个会话文件，解析新增 {stats['parsed_bytes'] / 1024 / 1024:.1f}MB")
+        dialog = UsageDialog(self, self.config_manager.usage_analytics)
+        dialog.ShowModal()
+        dialog.Destroy()
 
     def on_backup_config(self, event):
         """备份配置文件"""
@@ -1227,6 +1546,7 @@ start "{window_title}" powershell -NoExit -Command "{claude_command}"
             backup_path = current_dir / backup_filename
 
             # 复制配置文件
+            self.config_manager.flush()
             if self.config_manager.configs_file.exists():
                 shutil.copy2(self.config_manager.configs_file, backup_path)
                 self.status_text.SetLabel(f"配置已备份至: {backup_filename}")
@@ -1238,6 +1558,65 @@ start "{window_title}" powershell -NoExit -Command "{claude_command}"
             wx.MessageBox(f"备份失败: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
 
 
+class UsageDialog(wx.Dialog):
+    """会话token用量统计对话框"""
+
+    GROUPINGS = [
+        ("按配置", ("config",)),
+        ("按项目", ("project",)),
+        ("按模型", ("model",)),
+        ("按日期", ("day",)),
+        ("按配置和模型", ("config", "model")),
+        ("按日期和配置", ("day", "config")),
+    ]
+
+    GROUP_TITLES = {"project": "项目", "model": "模型", "day": "日期", "config": "配置"}
+
+    def __init__(self, parent, analytics):
+        super().__init__(parent, title="会话用量统计", size=(900, 500),
+                         style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.analytics = analytics
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        top_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        top_sizer.Add(wx.StaticText(self, label="分组:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+        self.group_choice = wx.Choice(self, choices=[label for label, _ in self.GROUPINGS])
+        self.group_choice.SetSelection(0)
+        self.group_choice.Bind(wx.EVT_CHOICE, lambda event: self.refresh_rows())
+        top_sizer.Add(self.group_choice, 0, wx.ALL, 5)
+        sizer.Add(top_sizer, 0, wx.ALL, 5)
+
+        self.list_ctrl = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        sizer.Add(self.list_ctrl, 1, wx.EXPAND | wx.ALL, 10)
+        sizer.Add(self.CreateStdDialogButtonSizer(wx.OK), 0, wx.ALIGN_RIGHT | wx.ALL, 10)
+        self.SetSizer(sizer)
+
+        self.refresh_rows()
+        self.Center()
+
+    def refresh_rows(self):
+        """按选择的分组重新汇总并显示"""
+        group_by = self.GROUPINGS[self.group_choice.GetSelection()][1]
+        rows = self.analytics.summarize(group_by)
+
+        self.list_ctrl.ClearAll()
+        columns = [self.GROUP_TITLES[field] for field in group_by] + ["输入", "输出", "缓存写入", "缓存读取", "消息数"]
+        for col, title in enumerate(columns):
+            self.list_ctrl.InsertColumn(col, title, width=200 if col < len(group_by) else 100)
+
+        for row in rows:
+            values = []
+            for field in group_by:
+                # 项目按工作目录汇总，只显示目录名
+                values.append(Path(row[field]).name if field == "project" else row[field])
+            values += [f"{row['input_tokens']:,}", f"{row['output_tokens']:,}",
+                       f"{row['cache_creation_input_tokens']:,}", f"{row['cache_read_input_tokens']:,}",
+                       str(row["messages"])]
+            item = self.list_ctrl.InsertItem(self.list_ctrl.GetItemCount(), str(values[0]))
+            for col, value in enumerate(values[1:], start=1):
+                self.list_ctrl.SetItem(item, col, str(value))
+
+
 class SimpleApp(wx.App):
     """应用程序"""
 
@@ -1248,5 +1627,7 @@ class SimpleApp(wx.App):
 
 
 if __name__ == "__main__":
+    # 打包为exe后用量统计的进程池需要
+    multiprocessing.freeze_support()
     app = SimpleApp()
     app.MainLoop()
\ No newline at end of file
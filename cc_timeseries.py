@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 延迟时间序列
+每个配置一组固定大小的环形存档（round-robin archive）：原始样本保留1小时，
+1分钟汇总保留1天，1小时汇总保留30天，每个汇总记录最小/平均/最大/P95耗时。
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+from cc_journal import LatencyHistogram
+from cc_persist import WriteBehindJSONFile
+
+
+SERIES_VERSION = 1
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def render_sparkline(values):
+    """把数值序列画成Unicode迷你折线图"""
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high - low < 1e-9:
+        return SPARK_CHARS[len(SPARK_CHARS) // 2] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[int(round((value - low) * scale))] for value in values)
+
+
+class RoundRobinArchive:
+    """固定槽位数的汇总存档
+
+    时间按step秒分段，每段一个槽位（槽位 = 段起点 // step % slots），
+    当前段在内存中累加（含直方图），进入下一段时汇总为
+    [段起点, 最小, 平均, 最大, P95, 样本数] 写入槽位，覆盖slots个周期前的旧数据。
+    """
+
+    def __init__(self, step, slots):
+        self.step = int(step)
+        self.slots = int(slots)
+        self._rows = {}  # 槽位 -> 汇总行
+        self._current = None  # 当前段的累加器
+
+    def add(self, timestamp, value):
+        start = int(timestamp) // self.step * self.step
+        current = self._current
+        if current is not None and start != current["start"]:
+            if start < current["start"]:
+                # 时钟回拨：较早的样本计入当前段
+                start = current["start"]
+            else:
+                self._finalize()
+                current = None
+        if current is None:
+            current = self._current = {"start": start, "min": value, "max": value,
+                                       "histogram": LatencyHistogram()}
+        current["min"] = min(current["min"], value)
+        current["max"] = max(current["max"], value)
+        current["histogram"].add(value)
+
+    @staticmethod
+    def _summarize(current):
+        histogram = current["histogram"]
+        # 直方图百分位取桶中点，限制在实际最小和最大值之间
+        p95 = min(max(histogram.percentile(95), current["min"]), current["max"])
+        return [current["start"], round(current["min"], 1), round(histogram.mean, 1),
+                round(current["max"], 1), round(p95, 1), histogram.count]
+
+    def _finalize(self):
+        """把当前段汇总写入槽位"""
+        current, self._current = self._current, None
+        if current is not None and current["histogram"].count:
+            self._rows[current["start"] // self.step % self.slots] = self._summarize(current)
+
+    def rows(self, now=None):
+        """保留期内的汇总（含未结束的当前段），按时间排序"""
+        now = time.time() if now is None else now
+        oldest = now - self.step * self.slots
+        rows = [row for row in self._rows.values() if row[0] >= oldest]
+        rows.sort(key=lambda row: row[0])
+        if self._current is not None and self._current["histogram"].count and self._current["start"] >= oldest:
+            rows.append(self._summarize(self._current))
+        return rows
+
+    def to_json_data(self):
+        data = {"step": self.step, "slots": self.slots,
+                "rows": list(self._rows.values())}
+        if self._current is not None:
+            histogram = self._current["histogram"]
+            data["current"] = {"start": self._current["start"], "min": self._current["min"],
+                               "max": self._current["max"], "total": histogram.total,
+                               "buckets": {str(bucket): count for bucket, count in histogram.buckets.items()}}
+        return data
+
+    def load_json_data(self, data):
+        """从保存的数据恢复（步长或槽位数变化时丢弃旧数据）"""
+        if data.get("step") != self.step or data.get("slots") != self.slots:
+            return
+        for row in data.get("rows", []):
+            self._rows[int(row[0]) // self.step % self.slots] = row
+        current = data.get("current")
+        if current:
+            histogram = LatencyHistogram()
+            histogram.buckets = {int(bucket): count for bucket, count in current["buckets"].items()}
+            histogram.count = sum(histogram.buckets.values())
+            histogram.total = current["total"]
+            self._current = {"start": current["start"], "min": current["min"], "max": current["max"],
+                             "histogram": histogram}
+
+
+class LatencySeries:
+    """单个配置的多分辨率延迟序列"""
+
+    RAW_SECONDS = 3600   # 原始样本保留时长
+    RAW_MAX_SAMPLES = 720
+    TIERS = ((60, 1440), (3600, 720))  # (步长秒, 槽位数)：1分钟×1天，1小时×30天
+
+    def __init__(self):
+        self.raw = deque(maxlen=self.RAW_MAX_SAMPLES)  # (时间戳, 耗时毫秒)
+        self.tiers = [RoundRobinArchive(step, slots) for step, slots in self.TIERS]
+
+    def add(self, timestamp, value):
+        self.raw.append((round(timestamp, 3), round(value, 1)))
+        while self.raw and self.raw[0][0] < timestamp - self.RAW_SECONDS:
+            self.raw.popleft()
+        for tier in self.tiers:
+            tier.add(timestamp, value)
+
+    def tier(self, step):
+        return next(tier for tier in self.tiers if tier.step == step)
+
+    def to_json_data(self):
+        return {"raw": [list(sample) for sample in self.raw],
+                "tiers": [tier.to_json_data() for tier in self.tiers]}
+
+    def load_json_data(self, data):
+        self.raw.extend(tuple(sample) for sample in data.get("raw", []))
+        for tier, tier_data in zip(self.tiers, data.get("tiers", [])):
+            tier.load_json_data(tier_data)
+
+
+class LatencyTimeSeriesStore:
+    """所有配置的延迟时间序列，按配置id保存，修改延迟合并写入JSON文件"""
+
+    def __init__(self, path, delay=5.0):
+        self._lock = threading.Lock()
+        self._series = {}  # 配置id -> LatencySeries
+        self._sparklines = {}  # (配置id, 宽度) -> (分钟序号, 折线图文本)，列表刷新时避免重复计算
+        self._writer = WriteBehindJSONFile(path, self.to_json_data, delay=delay)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._writer.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != SERIES_VERSION:
+            return
+        for config_id, series_data in data.get("series", {}).items():
+            series = LatencySeries()
+            try:
+                series.load_json_data(series_data)
+            except (KeyError, TypeError, ValueError, IndexError):
+                continue
+            self._series[config_id] = series
+
+    def to_json_data(self):
+        with self._lock:
+            return {"version": SERIES_VERSION,
+                    "series": {config_id: series.to_json_data() for config_id, series in self._series.items()}}
+
+    def add(self, config_id, latency_ms, timestamp=None):
+        """记录一次测试耗时"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            series = self._series.get(config_id)
+            if series is None:
+                series = self._series[config_id] = LatencySeries()
+            series.add(timestamp, latency_ms)
+            self._discard_sparklines([config_id])
+        self._writer.mark_dirty()
+
+    def remove(self, config_ids):
+        """删除配置的序列"""
+        with self._lock:
+            removed = [self._series.pop(config_id, None) for config_id in config_ids]
+            self._discard_sparklines(config_ids)
+        if any(series is not None for series in removed):
+            self._writer.mark_dirty()
+
+    def raw_samples(self, config_id, now=None):
+        """最近1小时的原始样本 [(时间戳, 耗时毫秒)]"""
+        oldest = (time.time() if now is None else now) - LatencySeries.RAW_SECONDS
+        with self._lock:
+            series = self._series.get(config_id)
+            return [sample for sample in series.raw if sample[0] >= oldest] if series is not None else []
+
+    def rollups(self, config_id, step=60, now=None):
+        """指定分辨率（60或3600秒）的汇总 [[段起点, 最小, 平均, 最大, P95, 样本数]]"""
+        with self._lock:
+            series = self._series.get(config_id)
+            return series.tier(step).rows(now) if series is not None else []
+
+    def trend(self, config_id, width=16, now=None):
+        """最近width个汇总段的平均耗时，优先使用1分钟汇总，不足两点时使用1小时汇总"""
+        with self._lock:
+            series = self._series.get(config_id)
+            if series is None:
+                return []
+            rows = []
+            for tier in series.tiers:
+                rows = tier.rows(now)
+                if len(rows) >= 2:
+                    break
+            return [row[2] for row in rows[-width:]]
+
+    def _discard_sparklines(self, config_ids):
+        """清除配置的折线图缓存（调用方持有锁）"""
+        config_ids = set(config_ids)
+        for key in [key for key in self._sparklines if key[0] in config_ids]:
+            del self._sparklines[key]
+
+    def sparkline(self, config_id, width=16):
+        """配置延迟趋势的迷你折线图文本（按分钟缓存，有新样本时重新计算）"""
+        minute = int(time.time() // 60)
+        with self._lock:
+            cached = self._sparklines.get((config_id, width))
+            if cached is not None and cached[0] == minute:
+                return cached[1]
+        text = render_sparkline(self.trend(config_id, width))
+        with self._lock:
+            self._sparklines[(config_id, width)] = (minute, text)
+        return text
+
+    def flush(self):
+        return self._writer.flush()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CC-APISwitch 项目目录监视
+监视 ~/.claude/projects 的会话文件变化，对项目索引做增量更新。
+Linux下使用inotify，其他平台按周期比较文件修改时间和大小。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+
+# inotify事件常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+if sys.platform == "linux":
+    IN_NONBLOCK = os.O_NONBLOCK
+else:
+    IN_NONBLOCK = 0  # 只在Linux下使用inotify
+
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+PROJECT_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """通过ctypes调用libc的inotify接口"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add_watch.restype = ctypes.c_int
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+
+    def add_watch(self, path, mask):
+        """添加监视，失败返回-1"""
+        return self._add_watch(self.fd, os.fsencode(path), mask)
+
+    def read_events(self):
+        """读取所有待处理事件，返回[(wd, mask, name)]"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class ProjectWatcher:
+    """项目目录监视器
+
+    收集有变化的项目目录，静默debounce秒（持续写入时最多max_delay秒）后
+    调用 ProjectIndex.update_dirs 增量更新，项目列表有变化时回调 on_change(projects)。
+    """
+
+    def __init__(self, project_index, on_change=None, poll_interval=5.0, debounce=0.5, max_delay=2.0):
+        self.project_index = project_index
+        self.on_change = on_change
+        self.poll_interval = max(0.5, float(poll_interval))
+        self.debounce = max(0.05, float(debounce))
+        self.max_delay = max(self.debounce, float(max_delay))
+        self.mode = None  # "inotify" 或 "poll"
+
+        self._stop_event = threading.Event()
+        self._wake_r = self._wake_w = None
+        self._thread = None
+
+    @property
+    def running(self):
+        """监视线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动监视（Linux优先使用inotify，不可用时退回轮询）"""
+        if self.running and not self._stop_event.is_set():
+            return
+        self._stop_event = threading.Event()
+
+        inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                inotify = _Inotify()
+            except (OSError, AttributeError):
+                inotify = None
+
+        if inotify is not None:
+            self.mode = "inotify"
+            self._wake_r, self._wake_w = os.pipe()
+            target, args = self._run_inotify, (self._stop_event, inotify, self._wake_r)
+        else:
+            self.mode = "poll"
+            target, args = self._run_poll, (self._stop_event,)
+
+        self._thread = threading.Thread(target=target, args=args, name="project-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监视"""
+        self._stop_event.set()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b"\0")
+                os.close(self._wake_w)
+            except OSError:
+                pass
+            self._wake_w = None
+        self._thread = None
+
+    def _apply(self, project_dirs):
+        """增量更新有变化的项目目录"""
+        if not project_dirs:
+            return
+        try:
+            changed, projects = self.project_index.update_dirs(project_dirs)
+        except Exception as e:
+            print(f"更新项目索引失败: {e}")
+            return
+        if changed and self.on_change and not self._stop_event.is_set():
+            self.on_change(projects)
+
+    def _run_poll(self, stop_event):
+        """轮询模式：只比较文件修改时间和大小，有变化的目录才重新读取"""
+        while not stop_event.wait(self.poll_interval):
+            try:
+                self._apply(self.project_index.find_changed_dirs())
+            except Exception as e:
+                print(f"轮询项目目录失败: {e}")
+
+    def _run_inotify(self, stop_event, inotify, wake_fd):
+        """inotify模式：无变化时阻塞在select上，不占用CPU"""
+        root = str(self.project_index.projects_dir)
+        watches = {}  # wd -> 目录
+        dirty = set()
+        dirty_since = 0.0
+
+        def watch_root():
+            wd = inotify.add_watch(root, ROOT_MASK)
+            if wd < 0:
+                return False
+            watches[wd] = root
+            try:
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if entry.is_dir() and not entry.name.startswith('.'):
+                            watch_project(entry.path)
+            except OSError:
+                pass
+            return True
+
+        def watch_project(path):
+            wd = inotify.add_watch(path, PROJECT_MASK)
+            if wd >= 0:
+                watches[wd] = path
+
+        try:
+            root_watched = watch_root()
+            while not stop_event.is_set():
+                if not root_watched:
+                    # 项目目录尚未创建时等待其出现
+                    if stop_event.wait(self.poll_interval):
+                        break
+                    root_watched = watch_root()
+                    if root_watched:
+                        self._apply([path for path in watches.values() if path != root])
+                    continue
+
+                timeout = None
+                if dirty:
+                    timeout = max(0.0, min(self.debounce, dirty_since + self.max_delay - time.monotonic()))
+                readable, _, _ = select.select([inotify.fd, wake_fd], [], [], timeout)
+                if wake_fd in readable or stop_event.is_set():
+                    break
+
+                if readable:
+                    was_dirty = bool(dirty)
+                    for wd, mask, name in inotify.read_events():
+                        if mask & IN_Q_OVERFLOW:
+                            # 事件队列溢出，重新检查所有目录
+                            dirty.update(self.project_index.find_changed_dirs())
+                            continue
+                        path = watches.get(wd)
+                        if mask & IN_IGNORED:
+                            watches.pop(wd, None)
+                            continue
+                        if path is None:
+                            continue
+                        if path == root:
+                            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                                root_watched = False
+                                continue
+                            if not (mask & IN_ISDIR) or not name or name.startswith('.'):
+                                continue
+                            project_dir = os.path.join(root, name)
+                            if mask & (IN_CREATE | IN_MOVED_TO):
+                                watch_project(project_dir)
+                            dirty.add(project_dir)
+                        elif name.endswith(".jsonl"):
+                            dirty.add(path)
+                    if dirty and not was_dirty:
+                        dirty_since = time.monotonic()
+                    if not root_watched:
+                        # 项目目录被删除或移走，移除所有项目
+                        dirty.update(self.project_index.find_changed_dirs())
+
+                # 静默debounce秒后应用累积的变化；会话持续写入时最多延迟max_delay秒
+                if dirty and (not readable or not root_watched
+                              or time.monotonic() - dirty_since >= self.max_delay):
+                    pending, dirty = dirty, set()
+                    self._apply(pending)
+        finally:
+            inotify.close()
+            try:
+                os.close(wake_fd)
+            except OSError:
+                pass
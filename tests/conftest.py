@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具：临时用户目录下的配置管理器和本地模拟上游API
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class MockUpstream:
+    """本地模拟的Anthropic API上游
+
+    按 responses 队列依次返回响应（队列只剩一个时重复使用），记录收到的请求。
+    响应为 (状态码, 响应头字典, 响应体)，响应体为列表时按SSE事件帧逐块发送，
+    每块发送前等待 stream_gate，超时则中断响应（用于验证流式透传）。
+    delay 为返回响应头之前等待的秒数（用于模拟慢上游）。
+    """
+
+    def __init__(self):
+        self.responses = []  # (状态码, 响应头字典, 响应体)
+        self.responses.append((200, {"Content-Type": "application/json"}, b'{"type":"message"}'))
+        self.requests = []  # (方法, 路径, 请求头, 请求体)
+        self.stream_gate = None
+        self.delay = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length") or 0)
+                body = self.rfile.read(length) if length else b""
+                upstream.requests.append((self.command, self.path, self.headers, body))
+                upstream.respond(self)
+
+            do_GET = do_POST
+            do_HEAD = do_POST
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def respond(self, handler):
+        status, headers, body = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if self.delay:
+            time.sleep(self.delay)
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        if handler.command == "HEAD" or status in (204, 304):
+            handler.end_headers()
+        elif isinstance(body, bytes):
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        else:
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            for frame in body:
+                if self.stream_gate is not None:
+                    if not self.stream_gate.wait(5):
+                        # 客户端没有及时收到上一块（代理缓冲了响应），放弃发送
+                        return
+                    self.stream_gate.clear()
+                handler.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+                handler.wfile.flush()
+            handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+    def json_response(self, status, payload):
+        return status, {"Content-Type": "application/json"}, json.dumps(payload).encode('utf-8')
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def make_upstream():
+    """创建模拟上游，测试结束后关闭"""
+    upstreams = []
+
+    def create():
+        upstream = MockUpstream()
+        upstreams.append(upstream)
+        return upstream
+
+    yield create
+    for upstream in upstreams:
+        upstream.close()
+
+
+@pytest.fixture
+def config_manager(tmp_path, monkeypatch):
+    """使用临时用户目录的配置管理器"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    from cc_config import SimpleConfigManager
+
+    manager = SimpleConfigManager()
+    yield manager
+    manager.flush()
+
+
+@pytest.fixture
+def project_tree(tmp_path):
+    """20个各含一个会话文件的Claude项目目录，返回projects目录"""
+    projects_dir = tmp_path / "projects"
+    for position in range(20):
+        project_dir = projects_dir / f"-work{position}"
+        project_dir.mkdir(parents=True)
+        workdir = tmp_path / f"work{position}"
+        workdir.mkdir()
+        (project_dir / "s.jsonl").write_text(
+            json.dumps({"cwd": str(workdir), "timestamp": "2024-01-01T00:00:00Z"}) + "\n", encoding='utf-8')
+    return projects_dir
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话归档测试：只有zip中的内容与原文件一致时才删除原文件
+"""
+
+import os
+import zipfile
+
+import cc_archive
+from cc_archive import SessionArchive
+
+
+def make_session(project_dir, name, content, mtime=1700000000.0):
+    path = project_dir / name
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+    return str(path), {"mtime": mtime, "size": len(content), "cwd": "/work", "timestamp": "2024-01-01T00:00:00Z"}
+
+
+def test_archives_and_removes_original(tmp_path):
+    project_dir = tmp_path / "projects" / "-work"
+    project_dir.mkdir(parents=True)
+    path, entry = make_session(project_dir, "a.jsonl", b'{"cwd": "/work"}\n')
+    archive = SessionArchive(tmp_path / "archive")
+
+    stats = archive.archive_project(str(project_dir), {path: entry}, 60, now=1700005000.0)
+
+    assert stats["sessions"] == 1
+    assert not os.path.exists(path)
+    with archive.open_session("-work", "a.jsonl") as f:
+        assert f.read() == b'{"cwd": "/work"}\n'
+    assert "a.jsonl" in archive.load_metadata("-work")
+
+
+def test_keeps_original_when_existing_member_differs(tmp_path):
+    project_dir = tmp_path / "projects" / "-work"
+    project_dir.mkdir(parents=True)
+    archive = SessionArchive(tmp_path / "archive")
+    archive.archive_dir.mkdir()
+    with zipfile.ZipFile(archive.archive_path("-work"), 'w') as zf:
+        zf.writestr("a.jsonl", b"old content\n")
+    # 大小相同但内容不同
+    path, entry = make_session(project_dir, "a.jsonl", b"new content\n")
+
+    stats = archive.archive_project(str(project_dir), {path: entry}, 60, now=1700005000.0)
+
+    assert stats["sessions"] == 0
+    assert open(path, 'rb').read() == b"new content\n"
+    assert "a.jsonl" not in archive.load_metadata("-work")
+
+
+def test_session_changed_during_archive_is_archived_next_time(tmp_path, monkeypatch):
+    project_dir = tmp_path / "projects" / "-work"
+    project_dir.mkdir(parents=True)
+    path, entry = make_session(project_dir, "a.jsonl", b'{"n": 1}\n')
+    archive = SessionArchive(tmp_path / "archive")
+    file_crc32 = cc_archive.file_crc32
+
+    def append_then_crc32(session_path):
+        # 删除前的复核期间会话被追加：内容与zip成员不再一致
+        with open(session_path, 'ab') as f:
+            f.write(b'{"n": 2}\n')
+        return file_crc32(session_path)
+
+    monkeypatch.setattr(cc_archive, "file_crc32", append_then_crc32)
+    stats = archive.archive_project(str(project_dir), {path: entry}, 60, now=1700005000.0)
+    monkeypatch.undo()
+
+    assert stats["sessions"] == 0
+    assert open(path, 'rb').read() == b'{"n": 1}\n{"n": 2}\n'
+    assert not archive.archive_path("-work").exists()
+
+    path, entry = make_session(project_dir, "a.jsonl", b'{"n": 1}\n{"n": 2}\n')
+    stats = archive.archive_project(str(project_dir), {path: entry}, 60, now=1700005000.0)
+    assert stats["sessions"] == 1
+    assert not os.path.exists(path)
+    assert "a.jsonl" in archive.load_metadata("-work")
+
+
+def test_restore_project_brings_sessions_back(tmp_path):
+    project_dir = tmp_path / "projects" / "-work"
+    project_dir.mkdir(parents=True)
+    first, first_entry = make_session(project_dir, "a.jsonl", b'{"n": 1}\n')
+    second, second_entry = make_session(project_dir, "b.jsonl", b'{"n": 2}\n')
+    archive = SessionArchive(tmp_path / "archive")
+    archive.archive_project(str(project_dir), {first: first_entry, second: second_entry}, 60, now=1700005000.0)
+
+    assert archive.restore_project(str(project_dir), ["a.jsonl"]) == 1
+    assert open(first, 'rb').read() == b'{"n": 1}\n'
+    assert os.stat(first).st_mtime == first_entry["mtime"]
+    assert not os.path.exists(second)
+    assert list(archive.load_metadata("-work")) == ["b.jsonl"]
+    with zipfile.ZipFile(archive.archive_path("-work")) as zf:
+        assert zf.namelist() == ["b.jsonl"]
+
+    assert archive.restore_project(str(project_dir)) == 1
+    assert open(second, 'rb').read() == b'{"n": 2}\n'
+    assert not archive.archive_path("-work").exists()
+    assert archive.load_metadata("-work") == {}
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应缓存测试：命中更新访问时间（LRU淘汰），同一个键的并发写入互不干扰
+"""
+
+import threading
+import time
+
+from cc_cache import ResponseCache
+
+
+def test_hit_protects_entry_from_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "cache", max_bytes=250)
+    cache.put("a", 200, {}, b"a" * 100)
+    time.sleep(0.01)
+    cache.put("b", 200, {}, b"b" * 100)
+    time.sleep(0.01)
+    assert cache.get("a") is not None
+    cache.flush()
+
+    # 重新加载后访问时间仍然有效：淘汰最久未访问的b，而不是最早写入的a
+    reloaded = ResponseCache(tmp_path / "cache", max_bytes=250)
+    reloaded.put("c", 200, {}, b"c" * 100)
+
+    assert reloaded.get("a") is not None
+    assert reloaded.get("b") is None
+    assert reloaded.get("c") is not None
+
+
+def test_concurrent_puts_of_one_key(tmp_path):
+    cache = ResponseCache(tmp_path / "cache")
+    start = threading.Barrier(8)
+
+    def put(size):
+        start.wait()
+        for _ in range(20):
+            cache.put("k", 200, {"size": str(size)}, b"x" * size)
+
+    threads = [threading.Thread(target=put, args=(1000 + i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cached = cache.get("k")
+    assert cached is not None
+    _, headers, data = cached
+    assert len(data) == int(headers["size"])
+    assert cache.get_stats()["bytes"] == len(data)
+    assert not list((tmp_path / "cache").glob("*.tmp"))
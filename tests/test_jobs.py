@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务取消测试：关闭时有界等待，取消的项目扫描不丢失索引
+"""
+
+import os
+import threading
+import time
+
+from cc_jobs import Job, JobManager
+from cc_projects import ProjectIndex
+
+
+def test_shutdown_does_not_wait_for_stuck_jobs():
+    manager = JobManager(max_workers=2)
+    release = threading.Event()
+    stuck = manager.submit("stuck", lambda job: release.wait(30))
+    finished = manager.submit("quick", lambda job: True)
+
+    deadline = time.monotonic() + 5
+    while finished.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    start = time.monotonic()
+    clean = manager.shutdown(timeout=0.2)
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert finished.state == Job.DONE
+    assert stuck.cancelled
+    assert not clean and elapsed < 1
+
+
+def wait_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_idle_worker_is_not_counted_twice():
+    manager = JobManager(max_workers=4)
+    # 一个工作线程依次执行多个任务后仍然只有一个空闲线程
+    for _ in range(3):
+        wait_finished(manager.submit("quick", lambda job: True))
+
+    barrier = threading.Barrier(2, timeout=2)
+    jobs = [manager.submit("pair", lambda job: barrier.wait()) for _ in range(2)]
+    for job in jobs:
+        wait_finished(job)
+    manager.shutdown()
+
+    assert [job.state for job in jobs] == [Job.DONE, Job.DONE]
+
+
+class GatedArchive:
+    """不含归档会话的归档：放行前，第一个之后的目录扫描在读取归档时等待"""
+
+    def __init__(self):
+        self.calls = 0
+        self.released = threading.Event()
+
+    def load_metadata(self, project_name):
+        self.calls += 1
+        if self.calls > 1:
+            self.released.wait(5)
+        return {}
+
+
+def test_cancelled_project_scan_keeps_index(project_tree, tmp_path):
+    archive = GatedArchive()
+    index = ProjectIndex(project_tree, tmp_path / "index.json", archive=archive)
+    archive.released.set()
+    assert len(index.get_projects()) == 20
+    archive.released.clear()
+    archive.calls = 0
+
+    def scan(job):
+        def on_batch(projects):
+            # 收到第一个项目时取消：第二个目录可能正在扫描，其余目录还没有开始
+            job.cancel()
+            archive.released.set()
+        return index.get_projects(on_batch=on_batch, max_workers=1, batch_interval=0, cancel_token=job.token)
+
+    manager = JobManager()
+    job = manager.submit("scan", scan)
+    wait_finished(job)
+    manager.shutdown()
+
+    assert job.token.cancelled
+    assert job.state == Job.CANCELLED
+    # 已开始扫描的目录（最多两个）都完成了，其余目录被取消
+    assert archive.calls <= 2
+    assert job.result is not None and len(job.result) == archive.calls
+    # 未扫描的目录没有被当作已删除，也不需要重新解析
+    assert len(index.get_projects()) == 20
+    assert index.last_scan_stats == {"files": 20, "parsed": 0, "removed": 0}
+    assert os.path.exists(tmp_path / "index.json")
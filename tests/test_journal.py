@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试历史日志测试：时间窗口统计、读取期间推迟压缩、替换失败后重试
+"""
+
+import os
+import time
+
+import cc_cli
+import cc_journal
+
+# 以当前时间为基准，避免记录超过保留天数被压缩删除
+BASE = int(time.time()) - 3600
+
+
+def fill(journal, start, count, config_id="a", step=60.0):
+    for i in range(count):
+        status = "通过" if i % 4 else "超时"
+        journal.append(config_id, status, 100.0 + i, "read timeout", timestamp=start + i * step)
+
+
+def test_stats_over_time_window(tmp_path):
+    journal = cc_journal.TestJournal(tmp_path / "journal.jsonl")
+    fill(journal, BASE, 8)
+    journal.append("b", "失败", None, "HTTP 401", timestamp=BASE + 100)
+
+    stats = journal.stats(since=BASE + 4 * 60)
+
+    assert set(stats) == {"a"}
+    assert stats["a"]["total"] == 4
+    assert stats["a"]["ok"] == 3
+    assert stats["a"]["uptime"] == 75.0
+    assert stats["a"]["errors"] == {"超时: read timeout": 1}
+    assert 104.0 < stats["a"]["mean_ms"] < 108.0
+    assert journal.stats(config_ids=["b"])["b"]["errors"] == {"失败: HTTP 401": 1}
+
+
+def test_compaction_waits_for_readers(tmp_path):
+    journal = cc_journal.TestJournal(tmp_path / "journal.jsonl", max_bytes=1000)
+    fill(journal, BASE, 10)
+
+    records = journal.iter_records()
+    first = next(records)
+    # 读取期间超出大小上限：不替换正在读取的文件
+    fill(journal, BASE + 1200, 20)
+    assert os.path.getsize(journal.path) > journal.max_bytes
+    assert len(list(records)) == 29
+    assert first[0] == BASE
+
+    journal.append("a", "通过", 100.0, timestamp=BASE + 3000)
+    assert os.path.getsize(journal.path) <= journal.max_bytes * 3 // 4
+    assert list(journal.iter_records())[-1][0] == BASE + 3000
+
+
+def test_failed_replace_keeps_results_and_retries(tmp_path, monkeypatch):
+    journal = cc_journal.TestJournal(tmp_path / "journal.jsonl", max_bytes=1000)
+    fill(journal, BASE, 10)
+    replace = os.replace
+    calls = []
+
+    def locked_replace(source, target):
+        calls.append(source)
+        if len(calls) == 1:
+            raise PermissionError("file in use")
+        replace(source, target)
+
+    monkeypatch.setattr(cc_journal.os, "replace", locked_replace)
+    fill(journal, BASE + 1200, 20)
+
+    assert len(calls) >= 2
+    assert os.path.getsize(journal.path) <= journal.max_bytes
+    assert not os.path.exists(str(journal.path) + ".tmp")
+    assert list(journal.iter_records())[-1][0] == BASE + 1200 + 19 * 60
+
+
+def test_cli_stats(config_manager, monkeypatch, capsys):
+    config_manager.add_config("主线路", "https://api.example.com", "sk-test", "")
+    config_id = config_manager.store.ids()[0]
+    config_manager.test_journal.append(config_id, "通过", 120.0)
+    config_manager.test_journal.append(config_id, "失败", None, "HTTP 500")
+    monkeypatch.setattr(cc_cli, "SimpleConfigManager", lambda: config_manager)
+
+    assert cc_cli.main(["stats", "主线路"]) == 0
+
+    output = capsys.readouterr().out
+    assert "主线路  可用率 50.0% (1/2)" in output
+    assert "失败: HTTP 500" in output
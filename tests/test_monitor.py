@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自动切换测试：只比较同一测试模式的耗时，切换需要足够的优势并连续确认
+"""
+
+from cc_monitor import AutoSwitcher
+
+
+class FakeConfigManager:
+    def __init__(self, configs, active_id):
+        self.configs = configs
+        self.active_id = active_id
+
+    def get_all_configs(self):
+        return list(self.configs.values())
+
+    def get_active_id(self):
+        return self.active_id
+
+    def get_config(self, config_id):
+        return self.configs.get(config_id)
+
+
+def measured(config_id, total_ms, stream=False, status="通过"):
+    return {"id": config_id, "name": config_id, "test_status": status,
+            "latency": {"dns_ms": 0.0, "connect_ms": 0.0, "tls_ms": 0.0, "total_ms": total_ms, "stream": stream}}
+
+
+def test_streaming_results_are_not_ranked_against_non_streaming():
+    manager = FakeConfigManager({"slow": measured("slow", 8000), "streamed": measured("streamed", 300, stream=True)},
+                                "slow")
+    switcher = AutoSwitcher(manager, threshold_ms=5000, confirmations=1)
+
+    assert switcher.rank(stream=False) == [(8000, "slow")]
+    assert switcher.evaluate() == (None, "当前配置已是最快的配置")
+
+
+def test_switch_needs_margin_and_consecutive_wins():
+    configs = {"active": measured("active", 6000), "close": measured("close", 5500)}
+    manager = FakeConfigManager(configs, "active")
+    switcher = AutoSwitcher(manager, threshold_ms=5000, margin=0.2, confirmations=2)
+
+    # 只快不到20%：不切换
+    assert switcher.evaluate()[0] is None
+
+    configs["fast"] = measured("fast", 2000)
+    assert switcher.evaluate()[0] is None
+    assert switcher.evaluate()[0] == "fast"
+
+    # 当前配置失败时立即切换
+    configs["active"] = measured("active", 6000, status="超时")
+    assert switcher.evaluate()[0] == "fast"
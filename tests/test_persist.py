@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟合并写入测试：合并窗口内的修改只写一次，写入失败不破坏原文件
+"""
+
+import json
+import time
+
+import cc_persist
+from cc_persist import WriteBehindJSONFile
+
+
+def test_changes_within_delay_are_written_once(tmp_path):
+    data = {"value": 0}
+    writer = WriteBehindJSONFile(tmp_path / "data.json", lambda: dict(data), delay=0.2)
+    for value in range(1, 6):
+        data["value"] = value
+        writer.mark_dirty()
+    assert writer.dirty and writer.write_count == 0
+
+    deadline = time.monotonic() + 5
+    while writer.write_count == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    assert writer.write_count == 1
+    assert json.loads((tmp_path / "data.json").read_text(encoding='utf-8')) == {"value": 5}
+    assert writer.flush() is True and writer.write_count == 1
+
+
+def test_failed_replace_keeps_old_file_and_retries(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    data = {"value": 1}
+    writer = WriteBehindJSONFile(path, lambda: dict(data), delay=60)
+    writer.mark_dirty()
+    assert writer.flush() is True
+
+    def failing_replace(source, target):
+        raise PermissionError("file in use")
+
+    data["value"] = 2
+    writer.mark_dirty()
+    monkeypatch.setattr(cc_persist.os, "replace", failing_replace)
+    assert writer.flush() is False
+    monkeypatch.undo()
+
+    # 原文件保持完整，修改仍待写入
+    assert json.loads(path.read_text(encoding='utf-8')) == {"value": 1}
+    assert writer.dirty
+    assert writer.flush() is True
+    assert json.loads(path.read_text(encoding='utf-8')) == {"value": 2}
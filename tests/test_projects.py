@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+项目索引增量更新测试：完整扫描之前不报告变化，避免用部分项目替换下拉框
+"""
+
+import json
+
+from cc_jobs import CancelToken
+from cc_projects import ProjectIndex
+
+
+def test_update_dirs_waits_for_a_complete_scan(project_tree, tmp_path):
+    index = ProjectIndex(project_tree, tmp_path / "index.json")
+    token = CancelToken()
+    token.cancel()
+    assert len(index.get_projects(max_workers=1, cancel_token=token)) <= 1
+
+    # 首次扫描被取消：项目列表不完整，监视器不应替换下拉框
+    changed, projects = index.update_dirs([project_tree / "-work3"])
+    assert not changed
+
+    assert len(index.get_projects()) == 20
+    session = project_tree / "-work3" / "s.jsonl"
+    with open(session, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"timestamp": "2024-02-01T00:00:00Z"}) + "\n")
+    changed, projects = index.update_dirs([project_tree / "-work3"])
+    assert changed
+    assert len(projects) == 20
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地故障转移代理测试：代理指向本地模拟上游
+"""
+
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from cc_cache import ResponseCache
+from cc_proxy import FailoverProxy
+
+
+def add_config(manager, name, upstream, token):
+    manager.add_config(name, upstream.url, token, "claude-test")
+    return manager.store.find_id(name)
+
+
+@pytest.fixture
+def start_proxy(config_manager):
+    """启动指向模拟上游的代理（随机端口）"""
+    proxies = []
+
+    def start(**kwargs):
+        proxy = FailoverProxy(config_manager, port=0, timeout=5, **kwargs)
+        success, message = proxy.start()
+        assert success, message
+        proxies.append(proxy)
+        return proxy
+
+    yield start
+    for proxy in proxies:
+        proxy.stop()
+
+
+def post(proxy, body, bearer=False, path="/v1/messages", token=None):
+    """向代理发送请求（与Claude一样使用本地代理令牌），返回(响应, 连接)"""
+    token = proxy.auth_token if token is None else token
+    conn = http.client.HTTPConnection(proxy.host, proxy.port, timeout=5)
+    headers = {"Content-Type": "application/json"}
+    if bearer:
+        headers["Authorization"] = f"Bearer {token}"
+    else:
+        headers["x-api-key"] = token
+    conn.request("POST", path, body=json.dumps(body), headers=headers)
+    return conn.getresponse(), conn
+
+
+MESSAGE = {"model": "claude-test", "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}
+
+
+def test_failover_on_5xx(config_manager, make_upstream, start_proxy):
+    failing, healthy = make_upstream(), make_upstream()
+    failing.responses = [failing.json_response(503, {"type": "error"})]
+    healthy.responses = [healthy.json_response(200, {"type": "message", "id": "ok"})]
+    config_manager.switch_config(add_config(config_manager, "A", failing, "token-a"))
+    add_config(config_manager, "B", healthy, "token-b")
+    proxy = start_proxy()
+
+    response, conn = post(proxy, MESSAGE)
+    body = json.loads(response.read())
+    conn.close()
+
+    assert response.status == 200
+    assert body["id"] == "ok"
+    assert response.getheader("X-CC-APISwitch-Config") == "B"
+    assert len(failing.requests) == 1 and len(healthy.requests) == 1
+    assert proxy.stats["retries"] == 1
+
+
+def test_relays_last_error_when_every_upstream_fails(config_manager, make_upstream, start_proxy):
+    upstream = make_upstream()
+    upstream.responses = [upstream.json_response(529, {"type": "error", "error": {"message": "overloaded"}})]
+    config_manager.switch_config(add_config(config_manager, "A", upstream, "token-a"))
+    proxy = start_proxy()
+
+    response, conn = post(proxy, MESSAGE)
+    body = json.loads(response.read())
+    conn.close()
+
+    assert response.status == 529
+    assert body["error"]["message"] == "overloaded"
+
+
+def test_injects_config_token(config_manager, make_upstream, start_proxy):
+    upstream = make_upstream()
+    config_manager.switch_config(add_config(config_manager, "A", upstream, "secret-a"))
+    proxy = start_proxy()
+
+    response, conn = post(proxy, MESSAGE)
+    response.read()
+    response, _ = post(proxy, MESSAGE, bearer=True)
+    response.read()
+    conn.close()
+
+    api_key_headers, bearer_headers = upstream.requests[0][2], upstream.requests[1][2]
+    assert api_key_headers["x-api-key"] == "secret-a"
+    assert "authorization" not in api_key_headers
+    assert bearer_headers["authorization"] == "Bearer secret-a"
+    assert "x-api-key" not in bearer_headers
+
+
+def test_rejects_requests_without_proxy_token(config_manager, make_upstream, start_proxy):
+    upstream = make_upstream()
+    config_manager.switch_config(add_config(config_manager, "A", upstream, "secret-a"))
+    proxy = start_proxy()
+
+    wrong, conn = post(proxy, MESSAGE, token="cc-apiswitch-proxy")
+    wrong_body = json.loads(wrong.read())
+    conn.close()
+    conn = http.client.HTTPConnection(proxy.host, proxy.port, timeout=5)
+    conn.request("POST", "/v1/messages", body=json.dumps(MESSAGE), headers={"Content-Type": "text/plain"})
+    missing = conn.getresponse()
+    missing.read()
+    conn.close()
+
+    assert wrong.status == 401 and wrong_body["error"]["type"] == "authentication_error"
+    assert missing.status == 401
+    assert upstream.requests == []
+    # 令牌每个安装随机生成并保存，Claude的settings.json中写入的是同一个令牌
+    assert len(proxy.auth_token) >= 32
+    assert config_manager.get_setting("proxy_auth_token") == proxy.auth_token
+    config_manager.proxy_url = proxy.url
+    config_manager.switch_config(config_manager.get_active_id())
+    settings = json.loads(config_manager.settings_file.read_text(encoding='utf-8'))
+    assert settings["ANTHROPIC_AUTH_TOKEN"] == proxy.auth_token
+    assert settings["ANTHROPIC_BASE_URL"] == proxy.url
+
+
+def test_sse_passthrough_streams_each_event(config_manager, make_upstream, start_proxy):
+    upstream = make_upstream()
+    frames = [b"event: message_start\ndata: {\"n\": 1}\n\n", b"event: message_stop\ndata: {\"n\": 2}\n\n"]
+    upstream.responses = [(200, {"Content-Type": "text/event-stream"}, frames)]
+    upstream.stream_gate = threading.Event()
+    config_manager.switch_config(add_config(config_manager, "A", upstream, "token-a"))
+    proxy = start_proxy()
+
+    upstream.stream_gate.set()
+    response, conn = post(proxy, dict(MESSAGE, stream=True))
+    assert response.getheader("Content-Type") == "text/event-stream"
+    # 上游在客户端收到第一个事件之后才发送第二个事件
+    assert response.readline() == b"event: message_start\n"
+    upstream.stream_gate.set()
+    rest = response.read()
+    conn.close()
+
+    assert rest == b"data: {\"n\": 1}\n\n" + frames[1]
+
+
+def test_cache_hit_and_miss(config_manager, make_upstream, start_proxy, tmp_path):
+    upstream = make_upstream()
+    upstream.responses = [upstream.json_response(200, {"type": "message", "id": "cached"})]
+    config_manager.switch_config(add_config(config_manager, "A", upstream, "token-a"))
+    cache = ResponseCache(cache_dir=tmp_path / "cache")
+    proxy = start_proxy(cache=cache)
+
+    deterministic = dict(MESSAGE, temperature=0)
+    first, conn = post(proxy, deterministic)
+    first_body = first.read()
+    # 响应转发完成后才写入缓存
+    deadline = time.monotonic() + 5
+    while cache.stats["stores"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    second, _ = post(proxy, deterministic)
+    second_body = second.read()
+    # 非确定性请求不缓存
+    sampled, _ = post(proxy, dict(MESSAGE, temperature=1))
+    sampled.read()
+    conn.close()
+
+    assert first.getheader("X-CC-APISwitch-Cache") is None
+    assert second.getheader("X-CC-APISwitch-Cache") == "HIT"
+    assert second_body == first_body
+    assert len(upstream.requests) == 2
+    assert cache.stats["hits"] == 1 and cache.stats["stores"] == 1
+
+
+def test_hedge_relays_last_response_when_every_candidate_fails(config_manager, make_upstream, start_proxy):
+    slow, hedge = make_upstream(), make_upstream()
+    slow.delay = 0.5
+    slow.responses = [slow.json_response(503, {"type": "error", "error": {"message": "slow"}})]
+    hedge.responses = [hedge.json_response(529, {"type": "error", "error": {"message": "overloaded"}})]
+    config_manager.switch_config(add_config(config_manager, "A", slow, "token-a"))
+    add_config(config_manager, "B", hedge, "token-b")
+    proxy = start_proxy(hedge_enabled=True, hedge_min_delay_ms=50, hedge_default_delay_ms=50)
+
+    response, conn = post(proxy, MESSAGE)
+    body = json.loads(response.read())
+    conn.close()
+
+    # 对冲请求先失败，首选配置最后返回：与普通故障转移一样转发最后一个上游响应
+    assert proxy.stats["hedges"] == 1
+    assert response.status == 503
+    assert body["error"]["message"] == "slow"
+    assert response.getheader("X-CC-APISwitch-Config") == "A"
+
+
+def test_hedge_delay_fallbacks(config_manager, start_proxy):
+    proxy = start_proxy(hedge_min_delay_ms=100, hedge_default_delay_ms=800)
+
+    assert proxy.hedge_delay_ms({"name": "untested"}) == 800
+    assert proxy.hedge_delay_ms({"name": "tested", "latency": {"ttfb_ms": 350}}) == 350
+    assert proxy.hedge_delay_ms({"name": "fast", "latency": {"ttfb_ms": 20}}) == 100
+
+
+def test_bodiless_responses_keep_connection_usable(config_manager, make_upstream, start_proxy):
+    upstream = make_upstream()
+    upstream.responses = [(204, {}, b""), (200, {"Content-Type": "application/json"}, b'{"id": "head"}'),
+                          upstream.json_response(200, {"type": "message", "id": "after"})]
+    config_manager.switch_config(add_config(config_manager, "A", upstream, "token-a"))
+    proxy = start_proxy()
+
+    # 没有响应体的响应不能带分块编码结束块，否则同一连接上的下一个响应会错位
+    no_content, conn = post(proxy, MESSAGE)
+    assert no_content.status == 204 and no_content.read() == b""
+    conn.request("HEAD", "/v1/models", headers={"x-api-key": proxy.auth_token})
+    head = conn.getresponse()
+    assert head.status == 200 and head.read() == b""
+    assert head.getheader("Transfer-Encoding") is None
+    conn.request("POST", "/v1/messages", body=json.dumps(MESSAGE),
+                 headers={"Content-Type": "application/json", "x-api-key": proxy.auth_token})
+    after = conn.getresponse()
+    body = json.loads(after.read())
+    conn.close()
+
+    assert body["id"] == "after"
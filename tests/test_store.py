@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置存储测试：id和名称索引、改名、活跃配置
+"""
+
+from cc_store import ConfigStore
+
+
+def test_assigns_ids_and_indexes_names():
+    changes = []
+    data = {"configs": [{"name": "a"}, {"name": "b", "id": "fixed"}, {"name": "c", "id": "fixed"}]}
+    store = ConfigStore(data, on_change=lambda: changes.append(1))
+
+    ids = store.ids()
+    # 缺失或重复的id重新生成，并保存一次
+    assert ids[1] == "fixed" and len(set(ids)) == 3
+    assert changes == [1]
+    assert [store.find_id(name) for name in ("a", "b", "c")] == ids
+    assert store.index_of(ids[2]) == 2
+    assert store.get("missing") is None and store.find_id("missing") is None
+
+    success, _, new_id = store.add({"name": "d"})
+    assert success and store.find_id("d") == new_id and store.index_of(new_id) == 3
+    assert store.add({"name": "d"})[0] is False
+
+    store.delete([ids[0]])
+    assert store.find_id("a") is None
+    assert store.index_of(new_id) == 2
+
+
+def test_rename_keeps_active_config_and_rejects_conflicts():
+    store = ConfigStore({"configs": [{"name": "a"}, {"name": "b"}]})
+    a_id, b_id = store.ids()
+    assert store.set_active(a_id) is True
+    assert store.set_active(a_id) is False
+
+    assert store.update(a_id, {"name": "b"}) == (False, "名称已存在")
+    assert store.update(a_id, {"name": "renamed", "id": "ignored"}) == (True, "配置更新成功")
+
+    assert store.find_id("a") is None
+    assert store.find_id("renamed") == a_id
+    assert store.get(a_id) == {"name": "renamed", "id": a_id}
+    assert store.active_name == "renamed"
+    assert store.active_id == a_id
+
+    # 返回的是副本，修改不影响存储
+    copy = store.get(b_id) or {}
+    copy["name"] = "changed"
+    assert store.find_id("b") == b_id
+
+    store.delete([a_id])
+    assert store.active_id is None
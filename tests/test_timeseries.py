@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟时间序列测试：环形存档的汇总和覆盖、趋势取值、保存后恢复
+"""
+
+from cc_timeseries import LatencyTimeSeriesStore, RoundRobinArchive
+
+BASE = 1700000000 // 3600 * 3600  # 整点，便于按分钟和小时分段
+
+
+def test_round_robin_rollup_and_overwrite():
+    archive = RoundRobinArchive(step=60, slots=3)
+    for second, value in ((0, 100.0), (10, 300.0), (50, 200.0), (70, 50.0)):
+        archive.add(BASE + second, value)
+
+    rows = archive.rows(now=BASE + 70)
+    # [段起点, 最小, 平均, 最大, P95, 样本数]，最后一行是未结束的当前段
+    assert [row[0] for row in rows] == [BASE, BASE + 60]
+    assert rows[0][1:4] == [100.0, 200.0, 300.0]
+    assert rows[0][5] == 3
+    assert 200.0 <= rows[0][4] <= 300.0
+    assert rows[1][1:4] == [50.0, 50.0, 50.0]
+
+    # 3个周期后第一段的槽位被覆盖，只保留slots个已结束的段
+    for minute in range(2, 5):
+        archive.add(BASE + minute * 60, 10.0 * minute)
+    assert sorted(row[0] for row in archive.to_json_data()["rows"]) == [BASE + 60, BASE + 120, BASE + 180]
+    rows = archive.rows(now=BASE + 4 * 60)
+    assert [row[0] for row in rows] == [BASE + 60, BASE + 120, BASE + 180, BASE + 240]
+
+
+def test_trend_uses_minute_rollups_and_survives_reload(tmp_path):
+    path = tmp_path / "series.json"
+    store = LatencyTimeSeriesStore(path, delay=60)
+    for minute, value in enumerate((100.0, 200.0, 300.0)):
+        store.add("a", value, timestamp=BASE + minute * 60)
+        store.add("a", value + 100.0, timestamp=BASE + minute * 60 + 30)
+
+    now = BASE + 150
+    assert store.trend("a", now=now) == [150.0, 250.0, 350.0]
+    assert store.trend("a", width=2, now=now) == [250.0, 350.0]
+    assert store.trend("missing", now=now) == []
+    rollups = store.rollups("a", now=now)
+    store.flush()
+
+    reloaded = LatencyTimeSeriesStore(path, delay=60)
+    assert reloaded.rollups("a", now=now) == rollups
+    assert len(reloaded.raw_samples("a", now=now)) == 6
+
+
+def test_trend_falls_back_to_hour_rollups(tmp_path):
+    store = LatencyTimeSeriesStore(tmp_path / "series.json", delay=60)
+    store.add("a", 100.0, timestamp=BASE)
+    store.add("a", 300.0, timestamp=BASE + 2 * 86400)
+
+    # 两个样本相隔2天：1分钟汇总（保留1天）只剩一段，改用1小时汇总
+    assert store.rollups("a", now=BASE + 2 * 86400) == [[BASE + 2 * 86400, 300.0, 300.0, 300.0, 300.0, 1]]
+    assert store.trend("a", now=BASE + 2 * 86400) == [100.0, 300.0]